@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
+import time
 
 from openfisca_core.taxbenefitsystems import TaxBenefitSystem
 from openfisca_core.variables.variable import Variable
 
 from openfisca_nsw_base import entities
 
+from openfisca_nsw_safeguard import parameter_snapshot, variable_manifest
+from openfisca_nsw_safeguard.parameter_tables import declared_enum_keys, validate_enum_keys
+
 # from openfisca_nsw_people import entities
 
 COUNTRY_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,18 +20,74 @@ COUNTRY_DIR = os.path.dirname(os.path.abspath(__file__))
 # ecosystem expect a CountryTaxBenefitSystem class to be exposed in the __init__ module of a country package.
 
 class CountryTaxBenefitSystem(TaxBenefitSystem):
-    def __init__(self):
+    # When variables are registered lazily, maps the variables not imported yet to their file
+    variable_files = None
+    # The EnumKeys declared by the variable files loaded, whose keys were checked against the parameters
+    validated_enum_keys = frozenset()
+
+    def __init__(self, lazy_variables = None):
         
         # We initialize our tax and benefit system with the general constructor
         super(CountryTaxBenefitSystem, self).__init__(entities.entities)
         # We add to our tax and benefit system all the variables
-        self.add_variables_from_directory(os.path.join(COUNTRY_DIR, 'variables'))
+        # In lazy mode, a variable file is only imported when one of its variables is first requested
+        variables_path = os.path.join(COUNTRY_DIR, 'variables')
+        if lazy_variables is None:
+            lazy_variables = variable_manifest.lazy_variables_enabled()
+        if lazy_variables:
+            self.variable_files = variable_manifest.load_manifest(variables_path)
+        if self.variable_files is None:
+            self.add_variables_from_directory(variables_path)
+            if lazy_variables:
+                variable_manifest.write_manifest(self, variables_path)
         # We add to our tax and benefit system all the legislation parameters defined in the  parameters files
         param_path = os.path.join(COUNTRY_DIR, 'parameters')
         self.load_parameters(param_path)
+        # We check that the keys enums stand for exist in the tables they index
+        self.validated_enum_keys = validate_enum_keys(self.parameters, declared_enum_keys(self.variables.values()))
 
         # We define which variable, parameter and simulation example will be used in the OpenAPI specification
         self.open_api_config = {
-            "variable_example": "active_kids__child_meets_criteria",
-            "parameter_example": "active_kids.min_age",
+            "variable_example": "HVAC1_PDRSAug24_ESC_calculation",
+            "parameter_example": "PDRS.table_A24_regional_network_factor",
             }
+
+    def load_parameters(self, path_to_yaml_dir):
+        # Parsing the parameter files dominates start up, so we load the parameter tree
+        # from its binary snapshot unless a parameter file changed since it was built
+        start = time.perf_counter()
+        parameters = parameter_snapshot.load_parameters(path_to_yaml_dir)
+        # Reported by the metrics of the web API
+        self.parameters_load_time = time.perf_counter() - start
+
+        if self.preprocess_parameters is not None:
+            parameters = self.preprocess_parameters(parameters)
+
+        self.parameters = parameters
+
+    def get_variable(self, variable_name, check_existence = False):
+        if self.variable_files and variable_name in self.variable_files:
+            self.load_variable_file(self.variable_files[variable_name])
+        return super(CountryTaxBenefitSystem, self).get_variable(variable_name, check_existence)
+
+    def load_variable_file(self, file_path):
+        # The file is struck off the pending ones first, as registering a variable looks it up
+        for variable_name in [name for name, path in self.variable_files.items() if path == file_path]:
+            del self.variable_files[variable_name]
+        loaded = set(self.variables)
+        self.add_variables_from_file(file_path)
+        if self.parameters is not None:
+            new_variables = [variable for name, variable in self.variables.items() if name not in loaded]
+            self.validated_enum_keys = validate_enum_keys(
+                self.parameters, declared_enum_keys(new_variables), self.validated_enum_keys)
+
+    def load_all_variables(self):
+        # Registers the variables a lazy tax and benefit system has not imported yet
+        for file_path in sorted(set((self.variable_files or {}).values())):
+            self.load_variable_file(file_path)
+
+    def clone(self):
+        new = super(CountryTaxBenefitSystem, self).clone()
+        if self.variable_files is not None:
+            new.variable_files = self.variable_files.copy()
+        return new
@@ -0,0 +1,591 @@
+""" Batch runner computing the certificates of many implementations of an
+    activity at once.
+
+    The web API computes one implementation per request. For a file of
+    thousands of installations, the runner reads the rows in chunks of
+    `--chunk-size`, builds a single vectorized simulation per chunk and
+    streams the outputs of the activity to the output file, so that memory
+    stays bounded by the chunk size whatever the size of the input:
+
+    Example::
+        python -m openfisca_nsw_safeguard.batch --activity HVAC1_PDRSAug24 \\
+            --input installs.parquet --output certificates.csv
+
+    Input columns are named after the variables of the activity, with or
+    without the activity prefix, e.g. `HVAC1_PDRSAug24_cooling_capacity_input`
+    or `cooling_capacity_input`. Enum columns hold item names, as in the web
+    API, and empty cells take the default value of their variable. Any other
+    column, such as an installation identifier, is copied to the output as
+    is.
+
+    The outputs are the `*_ESC_calculation` and `*_PRC_calculation` of the
+    activity and its final eligibility, unless `--variables` says otherwise.
+    CSV is read and written with the standard library. Parquet requires
+    `pyarrow`.
+
+    `--workers N` computes chunks on N processes forked from the runner once
+    the tax and benefit system is loaded (see `sharding`), and still writes
+    them in input order. Prefixes with no certificate calculation, such as
+    `ESS_HEER_lighting`, can be run by listing their `--variables`.
+
+    Audits where many rows are ineligible can pass `--skip-ineligible`. Some
+    outputs declare, as the `zero-unless` metadata of their variable, the
+    boolean variable their formula returns zero without, e.g. the ESCs of
+    HVAC1 and the heating benchmark. That variable is computed for every row
+    first, and the output, with the savings it reads, only for the rows it is
+    true for. The other outputs are computed for every row, so the results
+    are those of a run without the option.
+
+    `--profile PATH` records the time spent in each formula and parameter
+    lookup (see `profiler`): a report of the slowest goes to the standard
+    error, and the collapsed stacks, for a flame graph, to PATH.
+
+    Files mixing implementations from before and after a rule change can be
+    run as a whole with `--route-by`, naming the column of implementation
+    dates: `--activity` then names a family of rule versions, e.g. `HVAC1`,
+    each row is computed by the version in force on its date (see
+    `rule_versions`), and the outputs are named without the version prefix,
+    e.g. `ESC_calculation`, along with the `rule_version` of the row.
+"""
+
+import argparse
+import collections
+import csv
+import datetime
+import itertools
+import logging
+import os
+import sys
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.indexed_enums import Enum
+from openfisca_core.simulations import SimulationBuilder
+
+from openfisca_nsw_safeguard.dependency_graph import activity_variable_names, find_activities, load_dependency_graph
+from openfisca_nsw_safeguard.profiler import Profile
+from openfisca_nsw_safeguard.rule_versions import RuleVersionError, canonical_name, family_of, route, rule_families
+from openfisca_nsw_safeguard.sharding import available_cpus, map_ordered
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+TRUE_STRINGS = ('1', 'true', 'yes', 'y', 't')
+FALSE_STRINGS = ('0', 'false', 'no', 'n', 'f', '')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def variable_names(tax_benefit_system):
+    """ Names of every variable, including those a lazy tax and benefit
+        system has not imported yet.
+    """
+    return set(tax_benefit_system.variables).union(getattr(tax_benefit_system, 'variable_files', None) or ())
+
+
+def list_activities(tax_benefit_system):
+    """ Activities with an ESC or PRC calculation, e.g. 'HVAC1_PDRSAug24'.
+    """
+    return find_activities(variable_names(tax_benefit_system))
+
+
+def activity_variables(tax_benefit_system, activity):
+    """ Names of the variables of `activity`, excluding those of the
+        activities it prefixes, e.g. HVAC1_PDRSAug24 for HVAC1.
+    """
+    return activity_variable_names(variable_names(tax_benefit_system), activity)
+
+
+def output_variables(tax_benefit_system, activity):
+    """ The certificates and final eligibility of `activity`.
+    """
+    names = activity_variables(tax_benefit_system, activity)
+    certificates = [
+        activity + suffix for suffix in ('_ESC_calculation', '_PRC_calculation')
+        if activity + suffix in names
+        ]
+    return certificates + [name for name in names if name.endswith('final_activity_eligibility')]
+
+
+def user_input_variables(tax_benefit_system, activity):
+    """ Names of the variables of `activity` marked as user inputs.
+    """
+    return [
+        name for name in activity_variables(tax_benefit_system, activity)
+        if (tax_benefit_system.get_variable(name).metadata or {}).get('variable-type') == 'user-input'
+        ]
+
+
+def required_inputs(outputs):
+    """ Names of the inputs the formulas of `outputs` read, directly or not.
+    """
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+
+    graph = load_dependency_graph(os.path.join(COUNTRY_DIR, 'variables'))
+    return sorted(set(name for output in outputs if output in graph.nodes for name in graph.manifest(output)['inputs']))
+
+
+def map_columns(tax_benefit_system, activity, columns, outputs = ()):
+    """ Maps the input columns naming a variable of `activity` to that
+        variable. Returns the mapping and the other columns.
+    """
+    names = set(activity_variables(tax_benefit_system, activity))
+    mapping = {}
+    other_columns = []
+    for column in columns:
+        for name in (column, '{}_{}'.format(activity, column)):
+            if name in names:
+                if name in mapping.values():
+                    raise BatchError("Several columns set the variable '{}'.".format(name))
+                mapping[column] = name
+                break
+        else:
+            other_columns.append(column)
+    inputs = set(required_inputs(outputs))
+    missing = sorted(inputs - set(mapping.values()))
+    if missing:
+        log.info('No column for %s, which take their default value.', ', '.join(missing))
+    unused = sorted(column for column, name in mapping.items() if name not in inputs)
+    if outputs and unused:
+        log.info('The outputs do not read %s.', ', '.join(unused))
+    return mapping, other_columns
+
+
+def column_array(variable, values):
+    """ Converts the cells of a column, strings or typed values, to an array
+        of `variable`. Empty cells take the default value of the variable.
+    """
+    default = variable.default_value
+    if variable.value_type == Enum:
+        default = default.name
+    cells = [default if value is None or value == '' else value for value in values]
+    if variable.value_type == Enum:
+        names = np.array([getattr(cell, 'name', cell) for cell in cells], dtype=str)
+        unknown = ~np.isin(names, list(variable.possible_values.__members__))
+        if unknown.any():
+            raise BatchError("'{}' is not an item of '{}', for the variable '{}'.".format(
+                names[unknown][0], variable.possible_values.__name__, variable.name))
+        return names
+    if variable.value_type == bool:
+        return np.array([_parse_bool(variable, cell) for cell in cells], dtype=bool)
+    if variable.value_type == datetime.date:
+        return np.array(cells, dtype='datetime64[D]')
+    try:
+        return np.array(cells, dtype=variable.dtype if variable.value_type != int else float).astype(variable.dtype)
+    except ValueError:
+        raise BatchError("Column of '{}' holds values that are not of type {}.".format(
+            variable.name, variable.value_type.__name__))
+
+
+def _parse_bool(variable, cell):
+    if not isinstance(cell, str):
+        return bool(cell)
+    value = cell.strip().lower()
+    if value in TRUE_STRINGS:
+        return True
+    if value in FALSE_STRINGS:
+        return False
+    raise BatchError("'{}' is not a boolean, for the variable '{}'.".format(cell, variable.name))
+
+
+def output_array(variable, values):
+    """ `values` of `variable` as written to the output, enums as item names.
+    """
+    if variable.value_type == Enum:
+        return np.asarray(values.decode_to_str())
+    return np.asarray(values)
+
+
+def output_gates(tax_benefit_system, outputs):
+    """ Maps the `outputs` declaring a `zero-unless` variable in their
+        metadata to that variable: their formula returns their default value
+        wherever it is false, so `--skip-ineligible` need not compute them
+        there.
+    """
+    gates = {}
+    for name in outputs:
+        gate = (tax_benefit_system.get_variable(name).metadata or {}).get('zero-unless')
+        if gate is not None:
+            gates[name] = gate
+    return gates
+
+
+def compute_chunk(tax_benefit_system, inputs, count, outputs, period, gates = None, profile = None):
+    """ Computes `outputs` for `count` rows in a single simulation. `inputs`
+        maps variable names to the cells of their column.
+
+        `gates` maps outputs to a boolean variable they are zero without
+        (see `output_gates`). Each gate is computed first, and the outputs
+        it gates only for the rows where it is true. The other rows get the
+        default value of the outputs, which is what their formula returns.
+        With a `profile`, the calculations are recorded in it (see
+        `profiler`).
+    """
+    simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, count)
+    if profile is not None:
+        profile.attach(simulation)
+    for name, cells in inputs.items():
+        variable = tax_benefit_system.get_variable(name, check_existence = True)
+        simulation.set_input(name, period, column_array(variable, cells))
+    results = {}
+    gated_outputs = collections.defaultdict(list)
+    for name, gate in (gates or {}).items():
+        gated_outputs[gate].append(name)
+    for gate, names in gated_outputs.items():
+        rows = np.flatnonzero(simulation.calculate(gate, period))
+        if len(rows) < count:
+            results.update(_compute_masked(tax_benefit_system, simulation, rows, count, names, period, profile))
+    return {
+        name: results[name] if name in results else
+            output_array(tax_benefit_system.get_variable(name), simulation.calculate(name, period))
+        for name in outputs
+        }
+
+
+def _compute_masked(tax_benefit_system, simulation, rows, count, outputs, period, profile):
+    # Default simulations give each group entity its own person, so `rows` index every entity
+    masked_simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, len(rows))
+    if profile is not None:
+        profile.attach(masked_simulation)
+    for population in simulation.populations.values():
+        for name, holder in population._holders.items():
+            masked_holder = masked_simulation.get_holder(name)
+            for known_period in holder.get_known_periods():
+                masked_holder.put_in_cache(holder.get_array(known_period)[rows], known_period)
+    results = {}
+    for name in outputs:
+        variable = tax_benefit_system.get_variable(name)
+        values = simulation.get_holder(name).get_array(period)
+        if values is not None:
+            # Computed along with the gate
+            results[name] = output_array(variable, values)
+            continue
+        values = output_array(variable, variable.default_array(count))
+        if len(rows):
+            masked_values = output_array(variable, masked_simulation.calculate(name, period))
+            values = values.astype(np.result_type(values, masked_values))
+            values[rows] = masked_values
+        results[name] = values
+    return results
+
+
+def version_routes(tax_benefit_system, activity, outputs = None, skip_ineligible = False):
+    """ The outputs of every version of the family of `activity`, as dicts
+        of canonical names and variables of the version, and their gates if
+        `skip_ineligible` (see `output_gates`). `outputs` are canonical names.
+    """
+    family = family_of(tax_benefit_system.parameters, activity)
+    if family is None:
+        raise BatchError("'{}' has a single rule version, it cannot be routed.".format(activity))
+    routes = {}
+    for version in rule_families(tax_benefit_system.parameters)[family]:
+        names = {canonical_name(version, name): name for name in activity_variables(tax_benefit_system, version)}
+        if outputs:
+            version_outputs = {output: names[output] for output in outputs if output in names}
+        else:
+            version_outputs = {canonical_name(version, name): name for name in output_variables(tax_benefit_system, version)}
+        gates = output_gates(tax_benefit_system, version_outputs.values()) if skip_ineligible else {}
+        routes[version] = version_outputs, gates
+    unknown = sorted(set(outputs or ()).difference(*(version_outputs for version_outputs, _ in routes.values())))
+    if unknown:
+        raise BatchError("No version of {} has the output {}.".format(family, ', '.join(unknown)))
+    return family, routes
+
+
+def compute_routed_chunk(tax_benefit_system, family, routes, columns, count, route_by, period, profile = None):
+    """ Computes each of `count` rows with the version of `family` in force
+        on its date, in the `route_by` column. `columns` maps column names
+        to their cells, and `routes` each version to the mapping of its
+        input columns, its outputs and their gates.
+
+        Outputs are named after their canonical name, and are None for rows
+        whose version does not compute them.
+    """
+    versions = _route(tax_benefit_system, family, columns[route_by])
+    results = {
+        output: np.full(count, None, dtype = object)
+        for _, version_outputs, _ in routes.values() for output in version_outputs
+        }
+    for version in np.unique(versions):
+        mapping, version_outputs, gates = routes[version]
+        rows = np.flatnonzero(versions == version)
+        inputs = {name: np.asarray(columns[column], dtype = object)[rows] for column, name in mapping.items()}
+        version_results = compute_chunk(tax_benefit_system, inputs, len(rows), list(version_outputs.values()), period,
+            gates, profile)
+        for output, name in version_outputs.items():
+            results[output][rows] = version_results[name].tolist()
+    results['rule_version'] = versions
+    return results
+
+
+def _route(tax_benefit_system, family, dates):
+    try:
+        return route(tax_benefit_system.parameters, family, dates)
+    except RuleVersionError as error:
+        raise BatchError(str(error))
+
+
+def read_csv_chunks(path, chunk_size):
+    """ Yields the rows of a CSV file as dicts of columns, `chunk_size` rows
+        at a time.
+    """
+    with open(path, newline = '') as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if columns is None:
+            return
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _csv_columns(path, columns, rows)
+                rows = []
+        if rows:
+            yield _csv_columns(path, columns, rows)
+
+
+def _row_count(chunk):
+    return len(next(iter(chunk.values())))
+
+
+def _csv_columns(path, columns, rows):
+    for row in rows:
+        if len(row) != len(columns):
+            raise BatchError("A row of '{}' has {} cells, for {} columns.".format(path, len(row), len(columns)))
+    return {column: cells for column, cells in zip(columns, zip(*rows))}
+
+
+def read_parquet_chunks(path, chunk_size):
+    """ Yields the rows of a Parquet file as dicts of columns, `chunk_size`
+        rows at a time.
+    """
+    parquet = _import_parquet()
+    for batch in parquet.ParquetFile(path).iter_batches(batch_size = chunk_size):
+        yield {name: column.to_pylist() for name, column in zip(batch.schema.names, batch.columns)}
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise BatchError('Reading or writing Parquet files requires pyarrow: pip install pyarrow')
+    return parquet
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS
+
+
+class CSVWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline = '')
+        self.writer = csv.writer(self.file)
+        self.columns = None
+
+    def write(self, columns):
+        if self.columns is None:
+            self.columns = list(columns)
+            self.writer.writerow(self.columns)
+        self.writer.writerows(zip(*(_csv_cells(columns[column]) for column in self.columns)))
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def _csv_cells(values):
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        return [repr(float(value)) for value in values]
+    return values.tolist()
+
+
+class ParquetWriter:
+
+    def __init__(self, path):
+        self.parquet = _import_parquet()
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, columns):
+        import pyarrow
+
+        if self.writer is None:
+            table = pyarrow.table({column: _arrow_values(values) for column, values in columns.items()})
+            # Later chunks are cast to the schema of the first one
+            self.schema = table.schema
+            self.writer = self.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            table = pyarrow.table(
+                {column: _arrow_values(columns[column]) for column in self.schema.names},
+                schema = self.schema,
+                )
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _arrow_values(values):
+    return values if isinstance(values, np.ndarray) else list(values)
+
+
+def open_writer(path):
+    """ The writer of `path`, Parquet or CSV after its extension. A path of
+        '-' stands for the standard output, as CSV.
+    """
+    return (ParquetWriter if path != '-' and is_parquet(path) else CSVWriter)(path)
+
+
+def run_batch(tax_benefit_system, activity, input_path, output_path, chunk_size = DEFAULT_CHUNK_SIZE,
+        outputs = None, period = None, workers = 1, skip_ineligible = False, route_by = None, profile = None):
+    """ Computes `outputs` for every row of `input_path` and writes them,
+        along with the input columns naming no variable, to `output_path`.
+        Returns the number of rows computed.
+
+        With several `workers`, chunks are computed by forked processes
+        sharing the tax and benefit system, and written in input order.
+        With `skip_ineligible`, the outputs declaring a gate are only
+        computed for the rows it is true for (see `compute_chunk`). With a
+        `route_by` column, rows are computed by the version of `activity` in
+        force on their date (see `compute_routed_chunk`). With a `profile`,
+        which needs a single worker, the calculations of every chunk are
+        recorded in it.
+    """
+    if profile is not None and workers != 1:
+        raise BatchError('Profiles are recorded by a single worker, run with --workers 1.')
+    if route_by is None:
+        if not activity_variables(tax_benefit_system, activity):
+            raise BatchError("No variable belongs to the activity '{}'.".format(activity))
+        outputs = outputs or output_variables(tax_benefit_system, activity)
+        if not outputs:
+            raise BatchError("'{}' has no ESC or PRC calculation, list the variables to output.".format(activity))
+        unknown = sorted(set(outputs) - variable_names(tax_benefit_system))
+        if unknown:
+            raise BatchError("No variable is named {}.".format(', '.join(unknown)))
+        gates = output_gates(tax_benefit_system, outputs) if skip_ineligible else {}
+        gated = bool(gates)
+    else:
+        family, routes = version_routes(tax_benefit_system, activity, outputs, skip_ineligible)
+        gated = any(gates for _, gates in routes.values())
+    if skip_ineligible and not gated:
+        raise BatchError("No output of '{}' declares a variable it is zero without, there are no rows to skip.".format(
+            activity))
+    period = periods.period(period or str(datetime.date.today().year))
+    read_chunks = read_parquet_chunks if is_parquet(input_path) else read_csv_chunks
+    chunks = read_chunks(input_path, chunk_size)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        open_writer(output_path).close()
+        return 0
+    if route_by is None:
+        mapping, other_columns = map_columns(tax_benefit_system, activity, first_chunk, list(outputs) + list(gates.values()))
+
+        def compute(item):
+            count, inputs = item
+            return compute_chunk(tax_benefit_system, inputs, count, outputs, period, gates = gates, profile = profile)
+    else:
+        if route_by not in first_chunk:
+            raise BatchError("The input has no '{}' column to route rows by.".format(route_by))
+        routes = {
+            version: (
+                map_columns(tax_benefit_system, version, first_chunk,
+                    list(version_outputs.values()) + list(gates.values()))[0],
+                version_outputs,
+                gates,
+                )
+            for version, (version_outputs, gates) in routes.items()
+            }
+        # Workers get the columns themselves, each version reading its own
+        mapping = {column: column for column in first_chunk if column == route_by or any(
+            column in version_mapping for version_mapping, _, _ in routes.values())}
+        other_columns = [column for column in first_chunk if column not in mapping or column == route_by]
+
+        def compute(item):
+            count, columns = item
+            return compute_routed_chunk(tax_benefit_system, family, routes, columns, count, route_by, period, profile)
+    if other_columns:
+        log.info('Copying %s to the output, as they name no variable of %s.', ', '.join(other_columns), activity)
+
+    def items(chunks):
+        # Only the columns of variables are sent to workers, the others wait in the parent
+        for chunk in chunks:
+            kept_columns.append({column: chunk[column] for column in other_columns})
+            yield _row_count(chunk), {name: chunk[column] for column, name in mapping.items()}
+
+    kept_columns = collections.deque()
+    if workers != 1:
+        # Imports the files of every variable the outputs depend on, and compiles the tables
+        # they read, once in the parent rather than in every worker, for each version the first chunk is routed to
+        rows = [0] if route_by is None else np.unique(_route(tax_benefit_system, family, first_chunk[route_by]),
+            return_index = True)[1]
+        compute((len(rows), {name: np.asarray(first_chunk[column], dtype = object)[rows] for column, name in mapping.items()}))
+
+    row_count = 0
+    # Opened once the inputs are checked, so that errors leave no empty output
+    writer = open_writer(output_path)
+    try:
+        chunks = itertools.chain([first_chunk], chunks)
+        for results in map_ordered(compute, items(chunks), workers = workers):
+            columns = kept_columns.popleft()
+            columns.update(results)
+            writer.write(columns)
+            row_count += len(next(iter(results.values())))
+            log.info('%s rows computed.', row_count)
+    finally:
+        writer.close()
+    return row_count
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.batch',
+        description = 'Computes the certificates of every implementation of an activity in a CSV or Parquet file.',
+        )
+    parser.add_argument('--activity', required = True, help = 'activity to compute, e.g. HVAC1_PDRSAug24')
+    parser.add_argument('--input', required = True, help = 'CSV or Parquet file, one implementation per row')
+    parser.add_argument('--output', default = '-', help = 'CSV or Parquet file to write, standard output by default')
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = 'rows per simulation')
+    parser.add_argument('--period', help = 'period of the simulation, the current year by default')
+    parser.add_argument('--variables', nargs = '+', help = 'variables to output instead of the certificates and eligibility')
+    parser.add_argument('--workers', type = int, default = 1,
+        help = 'processes computing chunks in parallel, 0 for one per CPU')
+    parser.add_argument('--skip-ineligible', action = 'store_true',
+        help = 'skip the savings of the rows whose certificates are zero anyway')
+    parser.add_argument('--route-by', metavar = 'COLUMN',
+        help = 'compute each row with the rule version of the activity in force on its date, in COLUMN')
+    parser.add_argument('--profile', metavar = 'PATH',
+        help = 'write the collapsed stacks of the calculations to PATH, and the time of each variable to stderr')
+    parser.add_argument('-v', '--verbose', action = 'store_true', help = 'log progress')
+    args = parser.parse_args(args)
+    logging.basicConfig(level = logging.INFO if args.verbose else logging.WARNING, stream = sys.stderr)
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be positive')
+    if args.workers < 0:
+        parser.error('--workers must be positive, or 0')
+
+    from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+
+    tax_benefit_system = CountryTaxBenefitSystem(lazy_variables = True)
+    profile = Profile() if args.profile else None
+    try:
+        run_batch(tax_benefit_system, args.activity, args.input, args.output, args.chunk_size,
+            outputs = args.variables, period = args.period, workers = args.workers or available_cpus(),
+            skip_ineligible = args.skip_ineligible, route_by = args.route_by, profile = profile)
+    except BatchError as error:
+        parser.exit(1, 'error: {}\n'.format(error))
+    if profile is not None:
+        profile.write_collapsed_stacks(args.profile)
+        print(profile.report(), file = sys.stderr)  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
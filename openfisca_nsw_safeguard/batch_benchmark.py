@@ -0,0 +1,106 @@
+""" Benchmark of the batch runner over an increasing number of workers.
+
+    Generates random implementations of an activity, then times
+    `run_batch` on them with 1, 2, 4... workers up to the number of CPUs,
+    and reports the throughput and speed up of each run:
+
+    Example::
+        python -m openfisca_nsw_safeguard.batch_benchmark --activity F7_PDRSAug24 --rows 500000
+
+    The tax and benefit system is loaded once, before the timings, as in a
+    batch run. The random inputs exercise every branch the formulas take on
+    arrays, but they are not realistic implementations: compare speed ups,
+    not certificates.
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from openfisca_core.indexed_enums import Enum
+
+from openfisca_nsw_safeguard.batch import DEFAULT_CHUNK_SIZE, run_batch, user_input_variables
+from openfisca_nsw_safeguard.sharding import available_cpus
+
+# NSW postcodes across climate zones and network areas
+POSTCODES = (2000, 2074, 2340, 2480, 2580, 2650, 2795, 2880)
+
+
+def random_column(variable, count, random):
+    """ Random cells of a CSV column setting `variable`.
+    """
+    if variable.value_type == Enum:
+        return random.choice([item.name for item in variable.possible_values], count)
+    if variable.value_type == bool:
+        return random.choice(['true', 'false'], count)
+    if 'postcode' in variable.name.lower():
+        return random.choice(POSTCODES, count)
+    if variable.value_type == int:
+        return random.randint(0, 100, count)
+    if variable.value_type == float:
+        return random.uniform(0, 100, count).round(3)
+    return np.full(count, '')
+
+
+def write_random_implementations(tax_benefit_system, activity, path, rows, seed = 0):
+    random = np.random.RandomState(seed)
+    names = user_input_variables(tax_benefit_system, activity)
+    with open(path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['row'] + names)
+        for start in range(0, rows, DEFAULT_CHUNK_SIZE):
+            count = min(DEFAULT_CHUNK_SIZE, rows - start)
+            columns = [random_column(tax_benefit_system.get_variable(name), count, random) for name in names]
+            writer.writerows(zip(range(start, start + count), *columns))
+
+
+def worker_counts(max_workers):
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max_workers]
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.batch_benchmark',
+        description = 'Times the batch runner on random implementations of an activity, over an increasing number of workers.',
+        )
+    parser.add_argument('--activity', default = 'HVAC1_PDRSAug24', help = 'activity to compute')
+    parser.add_argument('--rows', type = int, default = 200000, help = 'number of random implementations')
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = 'rows per simulation')
+    parser.add_argument('--max-workers', type = int, default = available_cpus(), help = 'largest number of workers timed')
+    parser.add_argument('--period', default = '2024', help = 'period of the simulation')
+    args = parser.parse_args(args)
+
+    from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+
+    tax_benefit_system = CountryTaxBenefitSystem(lazy_variables = True)
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'implementations.csv')
+        write_random_implementations(tax_benefit_system, args.activity, input_path, args.rows)
+        print('{} rows of {}, chunks of {} rows, {} CPUs'.format(  # noqa: T001
+            args.rows, args.activity, args.chunk_size, available_cpus()))
+        print('{:>8} {:>10} {:>12} {:>9} {:>11}'.format(  # noqa: T001
+            'workers', 'seconds', 'rows/s', 'speed up', 'efficiency'))
+        reference = None
+        for workers in worker_counts(args.max_workers):
+            output_path = os.path.join(directory, 'certificates-{}.csv'.format(workers))
+            start = time.perf_counter()
+            run_batch(tax_benefit_system, args.activity, input_path, output_path, args.chunk_size,
+                period = args.period, workers = workers)
+            seconds = time.perf_counter() - start
+            reference = reference or seconds
+            print('{:>8} {:>10.2f} {:>12.0f} {:>8.2f}x {:>10.0%}'.format(  # noqa: T001
+                workers, seconds, args.rows / seconds, reference / seconds, reference / seconds / workers))
+            os.remove(output_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+""" Helpers shared by the on-disk caches of this package (parameter snapshots,
+    generated manifests and the like).
+
+    Every cache file is keyed by a content hash of the source files it was
+    built from, so a stale file is never read: it simply stops being found.
+    Files are written atomically, which lets several workers started at the
+    same time build the same cache without corrupting it.
+
+    The cache directory defaults to `~/.cache/openfisca_nsw_safeguard` and can
+    be moved with the `OPENFISCA_NSW_SAFEGUARD_CACHE_DIR` environment variable.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+CACHE_DIR_ENV = 'OPENFISCA_NSW_SAFEGUARD_CACHE_DIR'
+
+
+def cache_directory(*parts):
+    """ Returns (and creates if needed) a directory of the package cache.
+    """
+    root = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+        'openfisca_nsw_safeguard')
+    directory = os.path.join(root, *parts)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def distribution_version(name):
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        import importlib_metadata as metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def openfisca_core_version():
+    return distribution_version('OpenFisca-Core')
+
+
+@functools.lru_cache(maxsize=None)
+def openfisca_core_build():
+    """ Identifies the OpenFisca-Core code installed: the commit it was
+        installed from, or else a hash of its Python files.
+
+        OpenFisca-Core is installed from a git URL, whose version string
+        stays the same from one commit to the next.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        import importlib_metadata as metadata
+    try:
+        direct_url = json.loads(metadata.distribution('OpenFisca-Core').read_text('direct_url.json') or '{}')
+    except (metadata.PackageNotFoundError, ValueError):
+        direct_url = {}
+    commit = direct_url.get('vcs_info', {}).get('commit_id')
+    if commit:
+        return 'commit-{}'.format(commit)
+    import openfisca_core
+    directory = os.path.dirname(openfisca_core.__file__)
+    return 'files-{}'.format(content_hash(list_files(directory, {'.py'}), root=directory))
+
+
+def environment_salt():
+    """ Identifies the interpreter and OpenFisca-Core build, whose upgrade
+        must invalidate any pickled OpenFisca object.
+    """
+    return 'python-{}.{};openfisca-core-{};{}'.format(
+        sys.version_info[0], sys.version_info[1], openfisca_core_version(), openfisca_core_build())
+
+
+def list_files(directory, extensions):
+    """ Lists, sorted, the files under `directory` with one of `extensions`.
+    """
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in files:
+            if os.path.splitext(file_name)[1] in extensions:
+                found.append(os.path.join(root, file_name))
+    return sorted(found)
+
+
+def content_hash(paths, root=None, salt=''):
+    """ Hashes the relative path and the content of every file in `paths`.
+    """
+    digest = hashlib.sha256(salt.encode('utf-8'))
+    for path in paths:
+        name = os.path.relpath(path, root) if root else path
+        digest.update(name.encode('utf-8'))
+        digest.update(b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def write_atomic(path, data):
+    """ Writes `data` to `path` so that readers never see a partial file.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
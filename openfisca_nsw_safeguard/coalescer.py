@@ -0,0 +1,198 @@
+""" Micro-batching of concurrent `/calculate` requests.
+
+    The estimator sends many near-simultaneous requests, each with a single
+    building, asking for the same outputs. Formulas are vectorized over
+    entities, so computing 500 buildings in one simulation costs little
+    more than computing one, while 500 simulations cost 500 times the
+    overhead of building and running a simulation.
+
+    `CalculationCoalescer.calculate` holds a situation for up to `window`
+    seconds, stacks it with the situations received meanwhile into a single
+    simulation, and hands back its own part of the results:
+
+    Example::
+        coalescer = CalculationCoalescer(tax_benefit_system, handlers.calculate, window = 0.005)
+        # in every request thread
+        result = coalescer.calculate(input_data)
+
+    Only situations with the same variables set and requested, at the same
+    periods, are stacked together: in a simulation, an entity without a
+    value for a variable set on other entities gets its default value
+    rather than its formula. Entity ids are prefixed with the position of
+    their situation, so ids may repeat across situations. If the stacked
+    simulation fails, each situation is computed on its own, so that
+    errors reach the request that caused them.
+
+    Requests are only concurrent in a worker serving several threads, e.g.
+    gunicorn's `--threads`.
+"""
+
+import threading
+
+# Separates the position of a situation from the entity ids it defines. Not '/',
+# which separates the parts of the paths of requested values.
+ID_SEPARATOR = '#'
+
+
+class _Batch:
+
+    def __init__(self):
+        self.situations = []
+        self.outcomes = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class CalculationCoalescer:
+
+    def __init__(self, tax_benefit_system, calculate, window = 0.005, max_batch = 500):
+        """
+        :param tax_benefit_system: The system the situations are defined for.
+        :param calculate: Computes a situation, e.g. `openfisca_web_api.handlers.calculate` bound to `tax_benefit_system`.
+        :param window: Seconds the first situation of a batch waits for others.
+        :param max_batch: Number of situations a batch is computed at, without waiting for the end of the window.
+        """
+        self.calculate_situation = calculate
+        self.window = window
+        self.max_batch = max_batch
+        self.entities = {entity.plural: entity for entity in tax_benefit_system.entities}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    def calculate(self, situation):
+        """ Result of `calculate(situation)`, computed along with the
+            similar situations received within the window.
+        """
+        key = self.signature(situation)
+        if key is None:
+            return self.calculate_situation(situation)
+        with self.lock:
+            self.requests += 1
+            batch = self.pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self.pending[key] = _Batch()
+            position = len(batch.situations)
+            batch.situations.append(situation)
+            if len(batch.situations) >= self.max_batch:
+                del self.pending[key]
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self.lock:
+                if self.pending.get(key) is batch:
+                    del self.pending[key]
+                self.batches += 1
+            try:
+                self._compute(batch)
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+        outcome = batch.outcomes[position]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def signature(self, situation):
+        """ The variables a situation sets and requests, at which periods, or
+            None if it cannot be stacked with others.
+        """
+        if not isinstance(situation, dict) or not set(situation) <= set(self.entities):
+            return None
+        parts = set()
+        for plural, instances in situation.items():
+            if not isinstance(instances, dict):
+                return None
+            role_keys = _role_keys(self.entities[plural])
+            for instance in instances.values():
+                if not isinstance(instance, dict):
+                    return None
+                for name, values in instance.items():
+                    if name in role_keys:
+                        continue
+                    if not isinstance(values, dict):
+                        return None
+                    parts.update((plural, name, period, value is None) for period, value in values.items())
+        return frozenset(parts)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'fallbacks': self.fallbacks,
+            }
+
+    def _compute(self, batch):
+        situations = batch.situations
+        if len(situations) == 1:
+            batch.outcomes = [_outcome(self.calculate_situation, situations[0])]
+            return
+        try:
+            result = self.calculate_situation(stack_situations(situations, self.entities))
+            batch.outcomes = [fill_requested_values(situation, result, position)
+                for position, situation in enumerate(situations)]
+        except Exception:
+            with self.lock:
+                self.fallbacks += 1
+            batch.outcomes = [_outcome(self.calculate_situation, situation) for situation in situations]
+
+
+def _outcome(function, situation):
+    try:
+        return function(situation)
+    except Exception as error:
+        return error
+
+
+def _role_keys(entity):
+    if entity.is_person:
+        return set()
+    return set(role.key for role in entity.roles).union(role.plural for role in entity.roles if role.plural)
+
+
+def _stacked_id(position, entity_id):
+    return '{}{}{}'.format(position, ID_SEPARATOR, entity_id)
+
+
+def stack_situations(situations, entities):
+    """ A single situation holding the entities of every one of
+        `situations`, their ids prefixed by the position of their situation.
+    """
+    stacked = {}
+    for position, situation in enumerate(situations):
+        for plural, instances in situation.items():
+            role_keys = _role_keys(entities[plural])
+            stacked_instances = stacked.setdefault(plural, {})
+            for entity_id, instance in instances.items():
+                stacked_instance = {}
+                for name, value in instance.items():
+                    if name in role_keys:
+                        # Members are listed by id, or by a single id for roles with one member
+                        value = _stacked_id(position, value) if isinstance(value, str) \
+                            else [_stacked_id(position, member) for member in value]
+                    else:
+                        value = dict(value)
+                    stacked_instance[name] = value
+                stacked_instances[_stacked_id(position, entity_id)] = stacked_instance
+    return stacked
+
+
+def fill_requested_values(situation, stacked_result, position):
+    """ Replaces the values requested in `situation`, None, by their value in
+        the result of the stacked situations.
+    """
+    for plural, instances in situation.items():
+        results = stacked_result[plural]
+        for entity_id, instance in instances.items():
+            instance_results = results[_stacked_id(position, entity_id)]
+            for name, values in instance.items():
+                if not isinstance(values, dict):
+                    continue
+                for period, value in values.items():
+                    if value is None:
+                        values[period] = instance_results[name][period]
+    return situation
@@ -0,0 +1,415 @@
+""" Dependency graph of the variables, extracted statically from their
+    formulas.
+
+    Formulas read variables through string calls such as
+    `buildings('HVAC1_PDRSAug24_rated_AEER_input', period)`, and parameters
+    through attribute chains such as
+    `parameters(period).ESS.HEER.table_D16_2.AEER`. Parsing the variable
+    files (without importing them) recovers, for every variable, the
+    variables and parameters its formulas read. From there, the manifest of
+    an output lists:
+
+    - `inputs`: the variables it depends on that a situation must set, i.e.
+      without formula or marked as user inputs,
+    - `intermediates`: the variables with a formula it depends on,
+    - `evaluation_order`: the intermediates, each after the variables it
+      reads, ending with the output,
+    - `parameters`: the parameter paths read along the way.
+
+    Example::
+        # every activity, as JSON
+        python -m openfisca_nsw_safeguard.dependency_graph --activity HVAC1_PDRSAug24
+
+        graph = load_dependency_graph(os.path.join(COUNTRY_DIR, 'variables'))
+        graph.manifest('HVAC1_PDRSAug24_PRC_calculation')['inputs']
+
+    A formula reading a variable by a name built at run time cannot be
+    followed: its variable is listed in `dynamic` and its manifest may miss
+    dependencies. Names read but defined nowhere are listed in `unknown`.
+
+    The graph is cached on disk next to the variable manifest, keyed by a
+    hash of the variable files.
+"""
+
+import argparse
+import ast
+import json
+import logging
+import os
+import sys
+
+from openfisca_nsw_safeguard.caching import cache_directory, write_atomic
+from openfisca_nsw_safeguard.variable_manifest import list_variable_files, variables_hash
+
+log = logging.getLogger(__name__)
+
+GRAPH_FORMAT = 1
+CERTIFICATE_SUFFIXES = ('_ESC_calculation', '_PRC_calculation')
+
+
+class VariableNode:
+
+    def __init__(self, name, path, variable_type = None, has_formula = False, variables = (), parameters = (),
+            dynamic = False):
+        """
+        :param name: Name of the variable.
+        :param path: File defining the variable, relative to the variable directory.
+        :param variable_type: The 'variable-type' of its metadata, e.g. 'user-input' or 'output'.
+        :param has_formula: Whether the variable has at least one formula.
+        :param variables: Names of the variables its formulas read.
+        :param parameters: Paths of the parameters its formulas read.
+        :param dynamic: Whether its formulas read variables by names built at run time.
+        """
+        self.name = name
+        self.path = path
+        self.variable_type = variable_type
+        self.has_formula = has_formula
+        self.variables = tuple(sorted(set(variables)))
+        self.parameters = tuple(sorted(set(parameters)))
+        self.dynamic = dynamic
+
+    @property
+    def is_input(self):
+        return not self.has_formula or self.variable_type == 'user-input'
+
+    def to_json(self):
+        return {
+            'path': self.path,
+            'variable_type': self.variable_type,
+            'has_formula': self.has_formula,
+            'variables': list(self.variables),
+            'parameters': list(self.parameters),
+            'dynamic': self.dynamic,
+            }
+
+    @staticmethod
+    def from_json(name, data):
+        return VariableNode(name, **data)
+
+
+class DependencyGraph:
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self._readers = None
+
+    @staticmethod
+    def from_directory(directory):
+        nodes = {}
+        for path in list_variable_files(directory):
+            relative_path = os.path.relpath(path, directory).replace(os.sep, '/')
+            for node in parse_variable_file(path, relative_path):
+                nodes[node.name] = node
+        return DependencyGraph(nodes)
+
+    def dependencies(self, name):
+        """ Names of the variables `name` depends on, directly or not, in
+            evaluation order: each after the variables it reads.
+        """
+        order = []
+        visited = {name}
+        # Iterative depth first search, as chains of variables run deeper than the recursion limit allows
+        stack = [(name, iter(self._reads(name)))]
+        while stack:
+            current, reads = stack[-1]
+            for read in reads:
+                if read not in visited:
+                    visited.add(read)
+                    stack.append((read, iter(self._reads(read))))
+                    break
+            else:
+                stack.pop()
+                if current != name:
+                    order.append(current)
+        return order
+
+    def _reads(self, name):
+        node = self.nodes.get(name)
+        # Inputs are set by situations, so what their default formulas read is not needed
+        if node is None or node.is_input:
+            return ()
+        return node.variables
+
+    def dependents(self, names):
+        """ Names of the variables whose value may change with the value of
+            any of `names`: those reading them, directly or not, and those
+            reading variables by dynamic names, which may be any of them.
+        """
+        if self._readers is None:
+            self._readers = {}
+            for node in self.nodes.values():
+                # Default formulas of inputs count, as they run when the input is not set
+                for read in node.variables:
+                    self._readers.setdefault(read, set()).add(node.name)
+        dependents = set(name for name, node in self.nodes.items() if node.dynamic)
+        stack = list(set(names) | dependents)
+        while stack:
+            for reader in self._readers.get(stack.pop(), ()):
+                if reader not in dependents:
+                    dependents.add(reader)
+                    stack.append(reader)
+        return dependents
+
+    def manifest(self, name):
+        """ What computing the variable `name` requires.
+        """
+        dependencies = self.dependencies(name)
+        known = [dependency for dependency in dependencies if dependency in self.nodes]
+        intermediates = [dependency for dependency in known if not self.nodes[dependency].is_input]
+        parameters = set(self.nodes[name].parameters) if name in self.nodes else set()
+        for dependency in intermediates:
+            parameters.update(self.nodes[dependency].parameters)
+        return {
+            'inputs': sorted(dependency for dependency in known if self.nodes[dependency].is_input),
+            'intermediates': sorted(intermediates),
+            'evaluation_order': intermediates + [name],
+            'parameters': sorted(parameters),
+            'dynamic': sorted(dependency for dependency in [name] + intermediates
+                if dependency in self.nodes and self.nodes[dependency].dynamic),
+            'unknown': sorted(dependency for dependency in dependencies if dependency not in self.nodes),
+            }
+
+    def outputs(self):
+        return sorted(name for name, node in self.nodes.items() if node.variable_type == 'output')
+
+    def activity_manifest(self, activity):
+        """ The manifests of the outputs of `activity`, along with the inputs
+            any of them requires.
+        """
+        names = activity_variable_names(self.nodes, activity)
+        outputs = [name for name in self.outputs() if name in names]
+        manifests = {name: self.manifest(name) for name in outputs}
+        return {
+            'inputs': sorted(set(input_name for manifest in manifests.values() for input_name in manifest['inputs'])),
+            'outputs': manifests,
+            }
+
+    def to_json(self):
+        return {name: node.to_json() for name, node in sorted(self.nodes.items())}
+
+
+def find_activities(names):
+    """ Activities with an ESC or PRC calculation among the variable
+        `names`, e.g. 'HVAC1_PDRSAug24'.
+    """
+    return sorted(set(
+        name[:-len(suffix)] for name in names for suffix in CERTIFICATE_SUFFIXES if name.endswith(suffix)
+        ))
+
+
+def activity_variable_names(names, activity):
+    """ Those of the variable `names` belonging to `activity`, excluding
+        those of the activities it prefixes, e.g. HVAC1_PDRSAug24 for HVAC1.
+    """
+    prefix = activity + '_'
+    other_prefixes = tuple(
+        other + '_' for other in find_activities(names) if other != activity and other.startswith(prefix))
+    return sorted(
+        name for name in names
+        if name.startswith(prefix) and not (other_prefixes and name.startswith(other_prefixes))
+        )
+
+
+def parse_variable_file(path, relative_path):
+    """ The `VariableNode` of every variable class defined in a file.
+    """
+    with open(path, 'rb') as f:
+        module = ast.parse(f.read(), filename = path)
+    helpers = {node.name: node for node in module.body if isinstance(node, ast.FunctionDef)}
+    helper_reads = {}
+    nodes = []
+    for definition in module.body:
+        if not isinstance(definition, ast.ClassDef) or not _is_variable_class(definition):
+            continue
+        variables, parameters, dynamic = set(), set(), False
+        formulas = [node for node in definition.body
+            if isinstance(node, ast.FunctionDef) and node.name.startswith('formula')]
+        for formula in formulas:
+            reads = FunctionReads(formula, helpers, helper_reads)
+            variables |= reads.variables
+            parameters |= reads.parameters
+            dynamic = dynamic or reads.dynamic
+        nodes.append(VariableNode(
+            definition.name, relative_path,
+            variable_type = _variable_type(definition),
+            has_formula = bool(formulas),
+            variables = variables,
+            parameters = parameters,
+            dynamic = dynamic,
+            ))
+    return nodes
+
+
+def _is_variable_class(definition):
+    return any(isinstance(base, ast.Name) and base.id == 'Variable' for base in definition.bases)
+
+
+def _variable_type(definition):
+    for node in definition.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'metadata' for target in node.targets):
+            try:
+                return ast.literal_eval(node.value).get('variable-type')
+            except (ValueError, AttributeError):
+                return None
+    return None
+
+
+def _constant_string(node):
+    if isinstance(node, ast.Index):  # Python < 3.9 wraps subscripts
+        node = node.value
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Str):  # Python < 3.8
+        return node.s
+    return None
+
+
+class FunctionReads:
+    """ The variables and parameters a function reads:
+
+        - a call of one of its arguments with a string, e.g.
+          `buildings('name', period)`, reads a variable,
+        - an attribute chain on a call of `parameters`, or on a name assigned
+          one, reads a parameter,
+        - a call of a helper function of the module reads what it reads.
+    """
+
+    def __init__(self, function, helpers = None, helper_reads = None):
+        self.variables = set()
+        self.parameters = set()
+        self.dynamic = False
+        arguments = set(argument.arg for argument in function.args.args)
+        entity_arguments = arguments - {'period', 'parameters'}
+        self.aliases = {}
+        self.parents = {}
+        for node in ast.walk(function):
+            for child in ast.iter_child_nodes(node):
+                self.parents[child] = node
+        paths = set()
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                path = self._parameter_path(node.value)
+                if path is not None:
+                    self.aliases[node.targets[0].id] = path
+        for node in ast.walk(function):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                if node.func.id in entity_arguments and node.args:
+                    name = _constant_string(node.args[0])
+                    if name is None:
+                        self.dynamic = True
+                    else:
+                        self.variables.add(name)
+                elif helpers and node.func.id in helpers and node.func.id != function.name:
+                    self._read_helper(node.func.id, helpers, helper_reads)
+            if isinstance(node, (ast.Attribute, ast.Subscript)) and not self._extended(node):
+                path = self._parameter_path(node)
+                if path:
+                    paths.add(path)
+        # A chain assigned to a name is only read through that name
+        self.parameters |= set(path for path in paths if not any(
+            other.startswith(path + '.') for other in paths))
+
+    def _read_helper(self, name, helpers, helper_reads):
+        if name not in helper_reads:
+            helper_reads[name] = None  # Guards recursive helpers
+            helper_reads[name] = FunctionReads(helpers[name], helpers, helper_reads)
+        reads = helper_reads[name]
+        if reads is not None:
+            self.variables |= reads.variables
+            self.parameters |= reads.parameters
+            self.dynamic = self.dynamic or reads.dynamic
+
+    def _extended(self, node):
+        # Whether the chain goes on past `node`, e.g. `node.attribute` or `node['key']`
+        parent = self.parents.get(node)
+        if isinstance(parent, ast.Attribute):
+            return not isinstance(self.parents.get(parent), ast.Call) or self.parents[parent].func is not parent
+        if isinstance(parent, ast.Subscript) and parent.value is node:
+            return _constant_string(parent.slice) is not None
+        return False
+
+    def _parameter_path(self, node):
+        """ Path of the parameter node `node` evaluates to, '' for the root,
+            or None if it is not a parameter node.
+        """
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id == 'parameters':
+                return ''
+            return None
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id)
+        if isinstance(node, ast.Attribute):
+            # Methods, e.g. `.calc(...)`, are not children of the node
+            parent = self.parents.get(node)
+            if isinstance(parent, ast.Call) and parent.func is node:
+                return self._parameter_path(node.value)
+            return _join(self._parameter_path(node.value), node.attr)
+        if isinstance(node, ast.Subscript):
+            path = self._parameter_path(node.value)
+            key = _constant_string(node.slice)
+            return path if key is None else _join(path, key)
+        return None
+
+
+def _join(path, name):
+    if path is None:
+        return None
+    return '{}.{}'.format(path, name) if path else name
+
+
+def graph_path(digest):
+    return os.path.join(cache_directory('manifests'), 'dependencies-{}.json'.format(digest))
+
+
+def load_dependency_graph(directory):
+    """ The dependency graph of the variables under `directory`, from its
+        cache when no variable file changed since it was built.
+    """
+    digest = variables_hash(directory) + '-{}'.format(GRAPH_FORMAT)
+    try:
+        path = graph_path(digest)
+        with open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        return DependencyGraph({name: VariableNode.from_json(name, node) for name, node in data.items()})
+    except (OSError, ValueError, TypeError):
+        pass
+    graph = DependencyGraph.from_directory(directory)
+    try:
+        write_atomic(graph_path(digest), json.dumps(graph.to_json(), sort_keys = True).encode('utf-8'))
+    except OSError:
+        log.warning('Unable to write the dependency graph.', exc_info = True)
+    return graph
+
+
+def main(args = None):
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.dependency_graph',
+        description = 'Writes what the outputs of each activity require, as JSON.',
+        )
+    parser.add_argument('--activity', action = 'append', help = 'activity to describe, all of them by default')
+    parser.add_argument('--variable', action = 'append', help = 'variable to describe instead of activities')
+    parser.add_argument('--output', help = 'file to write, standard output by default')
+    args = parser.parse_args(args)
+
+    graph = load_dependency_graph(os.path.join(COUNTRY_DIR, 'variables'))
+    if args.variable:
+        unknown = [name for name in args.variable if name not in graph.nodes]
+        if unknown:
+            parser.error('unknown variable {}'.format(', '.join(unknown)))
+        document = {'variables': {name: graph.manifest(name) for name in args.variable}}
+    else:
+        activities = args.activity or find_activities(graph.nodes)
+        document = {'activities': {activity: graph.activity_manifest(activity) for activity in activities}}
+    text = json.dumps(document, indent = 1, sort_keys = True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
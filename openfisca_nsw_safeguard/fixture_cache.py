@@ -0,0 +1,203 @@
+""" Binary cache of the YAML test files.
+
+    The large test files spell every array one value per line, e.g. the 14
+    lamp lengths of each of the 468 cases of
+    `ESS_HEER_lighting_replace_T8_or_T12_w_LED_energy_savings.yaml`, and
+    parsing them is a visible share of the suite. The fixtures of a file are
+    its test cases, with the line each starts at, and the numeric arrays of
+    their inputs and outputs as NumPy arrays. They are pickled to the
+    package cache, keyed by a hash of the content of the file, so that a
+    file is only parsed again once edited.
+
+    `testrun` reads its test files through `load_fixtures`, and the
+    `conftest.py` of the tests makes `openfisca test` read them the same way:
+
+    Example::
+        openfisca test openfisca_nsw_safeguard/tests/ --country-package openfisca_nsw_safeguard
+
+        # build step, e.g. on a CI image
+        python -m openfisca_nsw_safeguard.fixture_cache openfisca_nsw_safeguard/tests/
+
+    Set `OPENFISCA_NSW_SAFEGUARD_FIXTURE_CACHE=0` to always parse the YAML
+    files.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+
+import numpy as np
+
+from openfisca_core.tools.test_runner import Loader, OpenFiscaPlugin, YamlFile, YamlItem, yaml
+
+from openfisca_nsw_safeguard.caching import cache_directory, content_hash, environment_salt, list_files, write_atomic
+
+log = logging.getLogger(__name__)
+
+FIXTURE_CACHE_ENV = 'OPENFISCA_NSW_SAFEGUARD_FIXTURE_CACHE'
+FIXTURE_FORMAT = 1
+TEST_EXTENSIONS = ('.yaml', '.yml')
+
+
+def fixture_cache_enabled():
+    return os.environ.get(FIXTURE_CACHE_ENV, '1').lower() not in ('0', 'false', 'no')
+
+
+def fixture_path(path):
+    """ The cache file of the fixtures of the test file at `path`, named
+        after the file and a hash of its content.
+    """
+    salt = '{};numpy-{};fixtures-{}'.format(environment_salt(), np.__version__, FIXTURE_FORMAT)
+    name = hashlib.sha256(os.path.realpath(path).encode('utf-8')).hexdigest()[:16]
+    digest = content_hash([path], root = os.path.dirname(path), salt = salt)
+    return os.path.join(cache_directory('fixtures'), '{}-{}.pickle'.format(name, digest))
+
+
+def parse_fixtures(path):
+    """ The (line, test) pairs of the YAML file at `path`, its numeric lists
+        of values as arrays.
+    """
+    with open(path, 'rb') as f:
+        loader = Loader(f)
+        try:
+            node = loader.get_single_node()
+            tests = loader.construct_document(node) if node is not None else []
+        finally:
+            loader.dispose()
+    if isinstance(tests, list):
+        nodes = node.value if node is not None else []
+    else:
+        tests, nodes = [tests], [node]
+    return [(node.start_mark.line + 1, _with_arrays(test)) for node, test in zip(nodes, tests)]
+
+
+def _with_arrays(test):
+    if not isinstance(test, dict):
+        return test
+    test = dict(test)
+    # Only the values of variables, and of their periods, as entities may list ids
+    for key in ('input', 'output'):
+        if isinstance(test.get(key), dict):
+            test[key] = {
+                name: {period: _array(values) for period, values in value.items()} if isinstance(value, dict) else _array(value)
+                for name, value in test[key].items()
+                }
+    return test
+
+
+def _array(values):
+    if isinstance(values, list) and values and all(isinstance(value, (bool, int, float)) for value in values):
+        array = np.array(values)
+        if array.dtype.kind in 'biuf':
+            return array
+    return values
+
+
+def write_fixtures(path, fixtures):
+    """ Writes the `fixtures` of the test file at `path`, and removes those
+        of its previous contents.
+    """
+    cache_path = fixture_path(path)
+    write_atomic(cache_path, pickle.dumps(fixtures, protocol = pickle.HIGHEST_PROTOCOL))
+    directory, name = os.path.split(cache_path)
+    prefix = name.split('-')[0] + '-'
+    for stale_name in os.listdir(directory):
+        if stale_name.startswith(prefix) and stale_name != name:
+            try:
+                os.remove(os.path.join(directory, stale_name))
+            except OSError:
+                pass
+    return cache_path
+
+
+def load_fixtures(path):
+    """ The (line, test) pairs of the test file at `path`, from the cache
+        when the file has not changed since they were cached.
+
+        Raises `yaml.YAMLError` if the file is not valid YAML.
+    """
+    if not fixture_cache_enabled():
+        return parse_fixtures(path)
+    try:
+        cache_path = fixture_path(path)
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        log.warning('Unreadable fixtures of "{}", parsing the file instead.'.format(path), exc_info = True)
+    fixtures = parse_fixtures(path)
+    try:
+        write_fixtures(path, fixtures)
+    except OSError:
+        log.warning('Unable to cache the fixtures of "{}".'.format(path), exc_info = True)
+    return fixtures
+
+
+class CachedYamlFile(YamlFile):
+    """ A test file of `openfisca test`, read by `load_fixtures`.
+    """
+
+    def collect(self):
+        try:
+            fixtures = load_fixtures(str(self.fspath))
+        except yaml.YAMLError:
+            # Reported by `openfisca test`
+            yield from super().collect()
+            return
+        for line, test in fixtures:
+            if not self.should_ignore(test):
+                yield YamlItem.from_parent(
+                    self,
+                    name = '',
+                    baseline_tax_benefit_system = self.tax_benefit_system,
+                    test = test,
+                    options = self.options,
+                    )
+
+
+class CachedFixturesPlugin(OpenFiscaPlugin):
+
+    def pytest_collect_file(self, parent, path):
+        if path.ext in TEST_EXTENSIONS:
+            return CachedYamlFile.from_parent(parent, path = path, fspath = path,
+                tax_benefit_system = self.tax_benefit_system,
+                options = self.options)
+
+
+def use_fixture_cache(pluginmanager):
+    """ Makes `openfisca test` read the test files through the fixture cache,
+        replacing its plugin.
+    """
+    if not fixture_cache_enabled():
+        return
+    for plugin in pluginmanager.get_plugins():
+        if type(plugin) is OpenFiscaPlugin:
+            name = pluginmanager.get_name(plugin)
+            pluginmanager.unregister(plugin)
+            pluginmanager.register(CachedFixturesPlugin(plugin.tax_benefit_system, plugin.options), name)
+
+
+def main(args = None):
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.fixture_cache',
+        description = 'Caches the fixtures of the YAML test files.',
+        )
+    parser.add_argument('paths', nargs = '*', default = [os.path.join(COUNTRY_DIR, 'tests')],
+        help = 'test files or directories, the tests of the package by default')
+    args = parser.parse_args(args)
+
+    count = 0
+    for path in args.paths:
+        for test_path in list_files(path, TEST_EXTENSIONS) if os.path.isdir(path) else [path]:
+            write_fixtures(test_path, parse_fixtures(test_path))
+            count += 1
+    print(cache_directory('fixtures'), count)  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
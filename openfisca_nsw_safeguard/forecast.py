@@ -0,0 +1,357 @@
+""" Monte Carlo forecast of the certificates of a pipeline of implementations.
+
+    The certificates a pipeline will earn depend on inputs only known as
+    distributions: the postcode mix, the equipment mix, the ratings. The
+    forecast samples implementations from these distributions, computes
+    their outputs in vectorized chunks, and summarizes each output as it
+    goes: count, sum, mean, standard deviation, extremes, quantiles and a
+    histogram. Samples are dropped once summarized, so memory stays bounded
+    by the chunk size whatever the number of samples:
+
+    Example::
+        python -m openfisca_nsw_safeguard.forecast pipeline.json --samples 10000000 --seed 1 --workers 0
+
+    where `pipeline.json` describes the activity and the distribution of
+    each input:
+
+    Example::
+        {
+          "activity": "HVAC1_PDRSAug24",
+          "period": "2024",
+          "inputs": {
+            "HVAC1_PDRSAug24_PDRS__postcode": {"choice": {"2000": 0.5, "2340": 0.2, "2880": 0.3}},
+            "HVAC1_PDRSAug24_rated_AEER_input": {"normal": [4.6, 0.4], "clip": [3, 7]},
+            "HVAC1_PDRSAug24_cooling_capacity_input": {"triangular": [2, 7, 20]},
+            "HVAC1_PDRSAug24_Activity": "replacement_activity"
+          }
+        }
+
+    A distribution is a constant, or one of `choice` (values to their
+    weights, or a list of equally likely values), `uniform` ([low, high]),
+    `normal` ([mean, standard deviation]) and `triangular` ([low, mode,
+    high]), optionally `clip`ped to [low, high]. Choices of enums are item
+    names.
+
+    The samples of each chunk are drawn from a generator seeded with the
+    seed and the position of the chunk, so a forecast gives the same
+    summary whatever the number of `--workers` computing its chunks (see
+    `sharding`).
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.indexed_enums import Enum
+from openfisca_core.simulations import SimulationBuilder
+
+from openfisca_nsw_safeguard.batch import output_variables
+from openfisca_nsw_safeguard.sharding import available_cpus, map_ordered
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100000
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+HISTOGRAM_BINS = 1024
+DISTRIBUTIONS = ('choice', 'uniform', 'normal', 'triangular')
+
+
+class ForecastError(ValueError):
+    pass
+
+
+class Histogram:
+    """ Histogram of a stream of values, over `bins` bins whose width doubles
+        whenever values fall outside of their range.
+
+        Widths are powers of two, and bins start at multiples of their width,
+        so that doubling merges pairs of bins exactly. Integral values, such
+        as certificates, fall in bins of width 1 as long as they span fewer
+        than `bins` integers.
+    """
+
+    def __init__(self, bins = HISTOGRAM_BINS):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype = np.int64)
+        self.low = None
+        self.width = None
+
+    def add(self, values):
+        values = np.asarray(values, dtype = float)
+        if not values.size:
+            return
+        low, high = values.min(), values.max()
+        if self.low is None:
+            # Bins of integral values are no narrower than 1
+            smallest = 1.0 if np.all(np.floor(values) == values) else 2.0 ** -20
+            self.width = 2.0 ** np.ceil(np.log2(max((high - low) / self.bins, smallest)))
+            self.low = np.floor(low / self.width) * self.width
+        if low < self.low or high >= self.low + self.width * self.bins:
+            self._cover(low, high)
+        indices = ((values - self.low) // self.width).astype(np.int64)
+        self.counts += np.bincount(np.minimum(indices, self.bins - 1), minlength = self.bins)
+
+    def _cover(self, low, high):
+        # Widens and moves the bins to cover both `low` to `high` and the bins holding values
+        filled = np.flatnonzero(self.counts)
+        if len(filled):
+            low = min(low, self.low + self.width * filled[0])
+            high = max(high, self.low + self.width * filled[-1])
+        width = self.width
+        while True:
+            new_low = np.floor(low / width) * width
+            if high < new_low + width * self.bins:
+                break
+            width *= 2
+        counts = np.zeros(self.bins, dtype = np.int64)
+        edges = self.low + self.width * filled
+        np.add.at(counts, ((edges - new_low) // width).astype(np.int64), self.counts[filled])
+        self.counts, self.low, self.width = counts, new_low, width
+
+    def quantile(self, q):
+        """ Approximate `q` quantile, interpolated within its bin.
+        """
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1]
+        if not total:
+            return None
+        rank = q * total
+        index = int(np.searchsorted(cumulative, rank, side = 'left'))
+        before = cumulative[index - 1] if index else 0
+        within = (rank - before) / self.counts[index] if self.counts[index] else 0
+        return float(self.low + self.width * (index + within))
+
+    def to_json(self):
+        """ Edges and counts of the bins between the first and last holding
+            values.
+        """
+        filled = np.flatnonzero(self.counts)
+        if not len(filled):
+            return {'edges': [], 'counts': []}
+        first, last = filled[0], filled[-1] + 1
+        return {
+            'edges': (self.low + self.width * np.arange(first, last + 1)).tolist(),
+            'counts': self.counts[first:last].tolist(),
+            }
+
+
+class StreamingSummary:
+    """ Summary statistics of a stream of values, updated chunk by chunk.
+    """
+
+    def __init__(self, bins = HISTOGRAM_BINS):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.histogram = Histogram(bins)
+
+    def add(self, values):
+        values = np.asarray(values, dtype = float)
+        count = len(values)
+        if not count:
+            return
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        # Chan et al.'s pairwise update, stable over millions of values
+        delta = mean - self.mean
+        total_count = self.count + count
+        self.m2 += m2 + delta ** 2 * self.count * count / total_count
+        self.mean += delta * count / total_count
+        self.count = total_count
+        self.total += values.sum()
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        self.histogram.add(values)
+
+    def to_json(self, quantiles = QUANTILES):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'sum': float(self.total),
+            'mean': float(self.mean),
+            'std': float(np.sqrt(self.m2 / self.count)),
+            'min': float(self.minimum),
+            'max': float(self.maximum),
+            'quantiles': {str(q): self.histogram.quantile(q) for q in quantiles},
+            'histogram': self.histogram.to_json(),
+            }
+
+
+def sample_input(variable, distribution, size, random):
+    """ `size` values of `variable` drawn from `distribution`.
+    """
+    if not isinstance(distribution, dict):
+        return _typed(variable, np.full(size, distribution))
+    kinds = [kind for kind in DISTRIBUTIONS if kind in distribution]
+    if len(kinds) != 1:
+        raise ForecastError("The distribution of '{}' must be a constant or one of {}.".format(
+            variable.name, ', '.join(DISTRIBUTIONS)))
+    kind = kinds[0]
+    arguments = distribution[kind]
+    try:
+        if kind == 'choice':
+            if isinstance(arguments, dict):
+                values, weights = list(arguments), np.array(list(arguments.values()), dtype = float)
+                weights = weights / weights.sum()
+            else:
+                values, weights = list(arguments), None
+            # Drawn by position, as values may mix types or be enum item names
+            values = _typed(variable, np.array(values))[random.choice(len(values), size = size, p = weights)]
+        elif kind == 'uniform':
+            values = random.uniform(*arguments, size = size)
+        elif kind == 'normal':
+            values = random.normal(*arguments, size = size)
+        else:
+            values = random.triangular(*arguments, size = size)
+    except (TypeError, ValueError) as error:
+        raise ForecastError("Invalid {} distribution for '{}': {}".format(kind, variable.name, error))
+    if 'clip' in distribution:
+        values = np.clip(values, *distribution['clip'])
+    return values if kind == 'choice' else _typed(variable, values)
+
+
+def _typed(variable, values):
+    if variable.value_type == Enum:
+        names = values.astype(str)
+        unknown = ~np.isin(names, list(variable.possible_values.__members__))
+        if unknown.any():
+            raise ForecastError("'{}' is not an item of '{}', for the variable '{}'.".format(
+                names[unknown][0], variable.possible_values.__name__, variable.name))
+        return names
+    if variable.value_type == bool and values.dtype.kind == 'U':
+        return np.isin(np.char.lower(values), ('1', 'true', 'yes'))
+    try:
+        return values.astype(variable.dtype)
+    except ValueError:
+        raise ForecastError("'{}' holds values that are not of type {}.".format(
+            variable.name, variable.value_type.__name__))
+
+
+class Forecast:
+
+    def __init__(self, tax_benefit_system, inputs, outputs, period = None, seed = 0, chunk_size = DEFAULT_CHUNK_SIZE):
+        """
+        :param inputs: Distribution of each input, by variable name.
+        :param outputs: Names of the variables to summarize.
+        :param seed: Seed of the samples, which only depend on it and on `chunk_size`.
+        """
+        self.tax_benefit_system = tax_benefit_system
+        self.variables = {}
+        for name in list(inputs) + list(outputs):
+            variable = tax_benefit_system.get_variable(name)
+            if variable is None:
+                raise ForecastError("'{}' is not a variable.".format(name))
+            self.variables[name] = variable
+        if not outputs:
+            raise ForecastError('A forecast needs outputs to summarize.')
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.period = periods.period(period or str(datetime.date.today().year))
+        self.seed = seed
+        self.chunk_size = chunk_size
+        # Draws a few samples, so that invalid distributions fail before forking workers
+        self.sample_chunk(0, 1)
+
+    def sample_chunk(self, index, size):
+        """ The inputs of the `index`th chunk, of `size` samples.
+        """
+        random = np.random.default_rng([self.seed, index])
+        return {
+            name: sample_input(self.variables[name], distribution, size, random)
+            for name, distribution in self.inputs.items()
+            }
+
+    def compute_chunk(self, item):
+        index, size = item
+        simulation = SimulationBuilder().build_default_simulation(self.tax_benefit_system, size)
+        for name, values in self.sample_chunk(index, size).items():
+            simulation.set_input(name, self.period, values)
+        return {name: np.asarray(simulation.calculate(name, self.period)) for name in self.outputs}
+
+    def run(self, samples, workers = 1):
+        """ Summaries of the outputs over `samples` samples.
+        """
+        summaries = {name: StreamingSummary() for name in self.outputs}
+        chunks = [(index, min(self.chunk_size, samples - start))
+            for index, start in enumerate(range(0, samples, self.chunk_size))]
+        done = 0
+        for results in map_ordered(self.compute_chunk, iter(chunks), workers = workers):
+            for name, values in results.items():
+                if self.variables[name].value_type == Enum:
+                    values = values.astype(np.int64)
+                summaries[name].add(values)
+            done += len(next(iter(results.values())))
+            log.info('%s samples computed.', done)
+        return {
+            'period': str(self.period),
+            'samples': samples,
+            'seed': self.seed,
+            'outputs': {name: summary.to_json() for name, summary in summaries.items()},
+            }
+
+
+def forecast_from_spec(tax_benefit_system, spec, seed = 0, chunk_size = DEFAULT_CHUNK_SIZE):
+    """ The `Forecast` described by a JSON spec, of an `activity`, its
+        `inputs` and optionally its `outputs` and `period`.
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('inputs'), dict):
+        raise ForecastError('A forecast spec is an object with the distributions of its inputs.')
+    outputs = spec.get('outputs')
+    if not outputs:
+        if 'activity' not in spec:
+            raise ForecastError('A forecast spec needs an activity or outputs.')
+        outputs = [name for name in output_variables(tax_benefit_system, spec['activity'])
+            if name.endswith('_calculation')]
+    return Forecast(tax_benefit_system, spec['inputs'], outputs, period = spec.get('period'), seed = seed,
+        chunk_size = chunk_size)
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.forecast',
+        description = 'Summarizes the outputs of an activity over inputs sampled from distributions.',
+        )
+    parser.add_argument('spec', help = 'JSON file describing the activity and the distributions of its inputs')
+    parser.add_argument('--samples', type = int, default = 1000000, help = 'number of implementations to sample')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the samples')
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = 'samples per simulation')
+    parser.add_argument('--workers', type = int, default = 1,
+        help = 'processes computing chunks in parallel, 0 for one per CPU')
+    parser.add_argument('--output', help = 'file to write the summary to, standard output by default')
+    parser.add_argument('-v', '--verbose', action = 'store_true', help = 'log progress')
+    args = parser.parse_args(args)
+    logging.basicConfig(level = logging.INFO if args.verbose else logging.WARNING, stream = sys.stderr)
+    if args.samples < 1 or args.chunk_size < 1:
+        parser.error('--samples and --chunk-size must be positive')
+    if args.workers < 0:
+        parser.error('--workers must be positive, or 0')
+
+    from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    tax_benefit_system = CountryTaxBenefitSystem(lazy_variables = True)
+    try:
+        forecast = forecast_from_spec(tax_benefit_system, spec, seed = args.seed, chunk_size = args.chunk_size)
+    except ForecastError as error:
+        parser.exit(1, 'error: {}\n'.format(error))
+    summary = forecast.run(args.samples, workers = args.workers or available_cpus())
+    text = json.dumps(summary, indent = 1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+""" Form schemas of the activities, generated at build time.
+
+    The estimator builds the questionnaire of an activity from the metadata
+    of its variables: which are user inputs, their question, their order,
+    their enum options and default values, and which variables are the
+    outputs. Fetched from `/variable/<name>`, that is one request per
+    variable, hundreds per page load.
+
+    The form schema of an activity gathers all of it in one document:
+
+    Example::
+        {
+            "activity": "HVAC1_PDRSAug24",
+            "questions": [
+                {"id": "HVAC1_PDRSAug24_PDRS__postcode", "valueType": "Int", "defaultValue": 0,
+                 "metadata": {"variable-type": "user-input", "display_question": "Postcode where …", "sorting": 1}},
+                …
+                ],
+            "outputs": [{"id": "HVAC1_PDRSAug24_ESC_calculation", "valueType": "Float", …}, …]
+        }
+
+    Questions are ordered by their `sorting` metadata, and enum questions
+    list their `possibleValues` as in `/variable/<name>`. The schemas are
+    built once and cached on disk, keyed by the versions of this package
+    and of OpenFisca-Core, and by the content of the variable and parameter
+    files, as results are (see `web_api.rules_version`): a stale or missing
+    cache is rebuilt on the next start up.
+
+    Example::
+        # build step
+        python -m openfisca_nsw_safeguard.form_schema
+
+    The web API serves them compressed, with an ETag and Last-Modified
+    date, on `/form-schemas/<activity>`, so that an estimator page loads
+    with one conditional request.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+from openfisca_core.indexed_enums import Enum
+from openfisca_core.variables import VALUE_TYPES
+
+from openfisca_nsw_safeguard.batch import list_activities, output_variables, user_input_variables
+from openfisca_nsw_safeguard.caching import cache_directory, distribution_version, openfisca_core_version, write_atomic
+from openfisca_nsw_safeguard.parameter_snapshot import parameters_hash
+from openfisca_nsw_safeguard.variable_manifest import variables_hash
+
+log = logging.getLogger(__name__)
+
+SCHEMA_FORMAT = 3
+
+
+def schemas_version(directory):
+    """ Identifies the form schemas of the variables under `directory`, with
+        the parameters of this package.
+    """
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+
+    return hashlib.sha256(';'.join([
+        'form-schemas-{}'.format(SCHEMA_FORMAT),
+        distribution_version('openfisca_nsw_safeguard'),
+        openfisca_core_version(),
+        parameters_hash(os.path.join(COUNTRY_DIR, 'parameters')),
+        variables_hash(directory),
+        ]).encode('utf-8')).hexdigest()
+
+
+def schemas_path(version):
+    return os.path.join(cache_directory('form_schemas'), 'form-schemas-{}.json'.format(version))
+
+
+def describe_variable(variable):
+    """ The fields of `variable` the questionnaire needs, named as in
+        `/variable/<name>`.
+    """
+    default = variable.default_value
+    description = {
+        'id': variable.name,
+        'description': variable.label,
+        'valueType': VALUE_TYPES[variable.value_type]['formatted_value_type'],
+        'defaultValue': default.name if isinstance(default, Enum) else default,
+        'metadata': variable.metadata or {},
+        }
+    if isinstance(default, datetime.date):
+        description['defaultValue'] = default.isoformat()
+    if variable.value_type == Enum:
+        description['possibleValues'] = {item.name: item.value for item in variable.possible_values}
+    return description
+
+
+def build_form_schema(tax_benefit_system, activity):
+    """ The form schema of `activity`: its user inputs, in the order they
+        are asked, and its outputs.
+    """
+    questions = [tax_benefit_system.get_variable(name) for name in user_input_variables(tax_benefit_system, activity)]
+    questions.sort(key = lambda variable: (_sorting(variable), variable.name))
+    return {
+        'activity': activity,
+        'questions': [describe_variable(variable) for variable in questions],
+        'outputs': [
+            describe_variable(tax_benefit_system.get_variable(name))
+            for name in output_variables(tax_benefit_system, activity)
+            ],
+        }
+
+
+def _sorting(variable):
+    sorting = (variable.metadata or {}).get('sorting')
+    return sorting if isinstance(sorting, (int, float)) else float('inf')
+
+
+def build_form_schemas(tax_benefit_system):
+    """ The form schemas of every activity with a certificate calculation.
+    """
+    return {activity: build_form_schema(tax_benefit_system, activity) for activity in list_activities(tax_benefit_system)}
+
+
+def write_form_schemas(tax_benefit_system, directory):
+    """ Builds the form schemas and writes them to the cache. Returns them,
+        along with the time they were built.
+    """
+    schemas = {
+        'built': datetime.datetime.now(datetime.timezone.utc).replace(microsecond = 0).isoformat(),
+        'activities': build_form_schemas(tax_benefit_system),
+        }
+    data = json.dumps(schemas, sort_keys = True)
+    try:
+        write_atomic(schemas_path(schemas_version(directory)), data.encode('utf-8'))
+    except OSError:
+        log.warning('Unable to write the form schemas.', exc_info = True)
+    # As they are read from the cache, e.g. with lists rather than tuples
+    return json.loads(data)
+
+
+def load_form_schemas(tax_benefit_system, directory):
+    """ The form schemas of the variables under `directory`, read from the
+        cache, or built from `tax_benefit_system` if they are not cached for
+        the current version.
+    """
+    try:
+        with open(schemas_path(schemas_version(directory)), 'rb') as f:
+            schemas = json.loads(f.read().decode('utf-8'))
+        if 'built' in schemas and 'activities' in schemas:
+            return schemas
+    except (OSError, ValueError):
+        pass
+    return write_form_schemas(tax_benefit_system, directory)
+
+
+def main():
+    from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+
+    directory = os.path.join(COUNTRY_DIR, 'variables')
+    schemas = write_form_schemas(CountryTaxBenefitSystem(), directory)
+    print(schemas_path(schemas_version(directory)), len(schemas['activities']))  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
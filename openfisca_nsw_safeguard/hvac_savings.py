@@ -0,0 +1,163 @@
+""" Savings kernel of the air conditioner activities (HVAC1, HVAC2 and their
+    ESSJun24 / PDRSAug24 versions).
+
+    Every HVAC estimator family computes the same quantities from the same
+    GEMS ratings, only with different tables and variable names. The
+    functions below are the single vectorized implementation of each step,
+    which the variables of every family delegate to:
+
+    Example::
+        class HVAC1_reference_cooling_annual_energy_use(Variable):
+            def formula(buildings, period, parameters):
+                return hvac_savings.energy_use(
+                    buildings('HVAC1_cooling_capacity_input', period),
+                    buildings('HVAC1_equivalent_cooling_hours_input', period),
+                    buildings('HVAC1_baseline_AEER_input', period))
+
+    `HVACSavings` and `HVACPeakDemandSavings` chain the steps in a single pass
+    for the summary variables (`*_annual_energy_savings`,
+    `*_peak_demand_annual_savings`), which used to recompute every step inline.
+    The intermediate variables keep one formula per step, as tests and API
+    clients set them as inputs. The summary variables still read the
+    baselines, equivalent hours and network factors from the tables, so
+    setting an intermediate variable does not change them.
+"""
+
+import numpy as np
+
+from openfisca_nsw_safeguard.parameter_tables import compile_table
+
+# Lifetime of the activity, in years
+LIFETIME = 10
+ELECTRICITY_CERTIFICATE_CONVERSION_FACTOR = 1.06
+SUMMER_PEAK_DEMAND_DURATION = 6
+FIRMNESS_FACTOR = 1
+# PRCs are counted in 0.1 kW of peak demand reduction
+KW_TO_0_1KW = 10
+
+
+def baseline_efficiency(new_installation_table, replacement_table, air_conditioner_type, cooling_capacity, new_installation):
+    """ Baseline AEER or ACOP of the activity, from the table of new
+        installations or of replacements.
+
+    :param new_installation_table: Parameter node keyed by air conditioner type then cooling capacity, e.g. `ESS.HEER.table_D16_2.AEER`.
+    :param replacement_table: Same, for replacements, e.g. `ESS.HEER.table_D16_3.AEER`.
+    :param air_conditioner_type: Keys of the first axis, e.g. `EnumKeyedValues`.
+    :param cooling_capacity: Keys of the second axis, e.g. `BinnedValues`.
+    :param new_installation: Whether each activity is a new installation rather than a replacement.
+    """
+    new_installation_efficiency = compile_table(new_installation_table).lookup(air_conditioner_type, cooling_capacity)
+    replacement_efficiency = compile_table(replacement_table).lookup(air_conditioner_type, cooling_capacity)
+    return np.where(new_installation, new_installation_efficiency, replacement_efficiency)
+
+
+def equivalent_hours(table, climate_zone):
+    """ Equivalent cooling or heating hours of each certificate climate zone
+        (1 hot, 2 average, 3 cold), e.g. from
+        `ESS.HEER.table_D16_1.equivalent_cooling_hours`.
+    """
+    climate_zone_str = np.select([climate_zone == 1, climate_zone == 2, climate_zone == 3],
+                                 ['hot_zone', 'average_zone', 'cold_zone'])
+    return table[climate_zone_str]
+
+
+def energy_use(capacity, equivalent_hours, efficiency):
+    """ Annual energy use (kWh) of an air conditioner of `capacity` (kW) run
+        for `equivalent_hours` a year, at an AEER or ACOP of `efficiency`.
+        Zero where the efficiency is zero, i.e. unknown.
+    """
+    capacity_hours = capacity * equivalent_hours
+    unknown = (efficiency == 0) | (capacity_hours == 0)
+    return np.where(unknown, 0, capacity_hours / np.where(unknown, 1, efficiency))
+
+
+def reported_or_estimated_use(reported_use, estimated_use):
+    """ The TCEC or THEC reported in the GEMS registry, or the estimated
+        annual energy use where none is reported.
+    """
+    return np.where(reported_use > 0, reported_use, estimated_use)
+
+
+def deemed_electricity_savings(reference_cooling, cooling, reference_heating, heating):
+    """ Deemed activity electricity savings (MWh) over the lifetime of the
+        activity.
+    """
+    return ((reference_cooling - cooling) + (reference_heating - heating)) * (LIFETIME / 1000)
+
+
+def energy_savings_certificates(electricity_savings, heating_capacity, exceeds_cooling_benchmark, exceeds_heating_benchmark):
+    """ Number of ESCs. Air conditioners with a heating capacity must exceed
+        both benchmarks. Those without one get ESCs only where they exceed the
+        heating benchmark but not the cooling one, as the estimator always did.
+    """
+    no_heating_capacity = heating_capacity == 0
+    eligible = exceeds_heating_benchmark & np.where(
+        no_heating_capacity, np.logical_not(exceeds_cooling_benchmark), exceeds_cooling_benchmark)
+    certificates = np.floor(electricity_savings * ELECTRICITY_CERTIFICATE_CONVERSION_FACTOR)
+    return positive_part(np.where(eligible, certificates, 0))
+
+
+def baseline_input_power(cooling_capacity, baseline_AEER):
+    """ Baseline input power (kW), zero where the baseline AEER is unknown.
+    """
+    unknown = (baseline_AEER == 0) | (cooling_capacity == 0)
+    return np.where(unknown, 0, cooling_capacity / np.where(unknown, 1, baseline_AEER))
+
+
+def peak_demand_savings(baseline_power, baseline_peak_adjustment_factor, input_power):
+    """ Peak demand savings (kW) of the activity.
+    """
+    return (
+        baseline_power * baseline_peak_adjustment_factor
+        - input_power * baseline_peak_adjustment_factor * FIRMNESS_FACTOR
+        )
+
+
+def peak_demand_reduction_capacity(peak_savings):
+    """ Peak demand reduction capacity (kW) over the lifetime of the activity.
+    """
+    return peak_savings * SUMMER_PEAK_DEMAND_DURATION * LIFETIME
+
+
+def peak_reduction_certificates(reduction_capacity, network_loss_factor, exceeds_cooling_benchmark):
+    """ Number of PRCs. Air conditioners must exceed the cooling benchmark.
+    """
+    certificates = np.floor(reduction_capacity * network_loss_factor * KW_TO_0_1KW)
+    return positive_part(np.where(exceeds_cooling_benchmark, certificates, 0))
+
+
+def positive_part(values):
+    return np.where(values > 0, values, 0)
+
+
+class HVACSavings:
+    """ Energy savings of an air conditioner activity, every step computed
+        once from the ratings of the air conditioner.
+    """
+
+    def __init__(self, cooling_capacity, heating_capacity, equivalent_cooling_hours, equivalent_heating_hours,
+            rated_AEER, rated_ACOP, baseline_AEER, baseline_ACOP, TCEC, THEC, regional_network_factor):
+        self.cooling_annual_energy_use = energy_use(cooling_capacity, equivalent_cooling_hours, rated_AEER)
+        self.heating_annual_energy_use = energy_use(heating_capacity, equivalent_heating_hours, rated_ACOP)
+        self.reference_cooling_annual_energy_use = energy_use(cooling_capacity, equivalent_cooling_hours, baseline_AEER)
+        self.reference_heating_annual_energy_use = energy_use(heating_capacity, equivalent_heating_hours, baseline_ACOP)
+        self.TCEC_or_annual_cooling = reported_or_estimated_use(TCEC, self.cooling_annual_energy_use)
+        self.THEC_or_annual_heating = reported_or_estimated_use(THEC, self.heating_annual_energy_use)
+        self.deemed_activity_electricity_savings = deemed_electricity_savings(
+            self.reference_cooling_annual_energy_use, self.TCEC_or_annual_cooling,
+            self.reference_heating_annual_energy_use, self.THEC_or_annual_heating)
+        self.electricity_savings = self.deemed_activity_electricity_savings * regional_network_factor
+        self.annual_energy_savings = positive_part(self.electricity_savings)
+
+
+class HVACPeakDemandSavings:
+    """ Peak demand savings of an air conditioner activity, every step
+        computed once from the ratings of the air conditioner.
+    """
+
+    def __init__(self, cooling_capacity, baseline_AEER, baseline_peak_adjustment_factor, input_power):
+        self.baseline_input_power = baseline_input_power(cooling_capacity, baseline_AEER)
+        self.peak_demand_savings_activity = peak_demand_savings(
+            self.baseline_input_power, baseline_peak_adjustment_factor, input_power)
+        self.peak_demand_reduction_capacity = peak_demand_reduction_capacity(self.peak_demand_savings_activity)
+        self.peak_demand_annual_savings = positive_part(self.peak_demand_reduction_capacity)
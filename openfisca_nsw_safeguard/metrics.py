@@ -0,0 +1,297 @@
+""" Metrics of the web API, in the text exposition format of Prometheus.
+
+    The web API runs as several gunicorn workers, each counting its own
+    requests. `Metrics` keeps the counters and latency histograms of a
+    worker. Once started, it writes them to a file of a directory the
+    workers share, every `flush_interval` seconds and when the worker
+    exits. `/metrics` reads the files of every worker and sums them, so
+    that a collector scraping any worker gets the totals of the server:
+
+    Example::
+        OPENFISCA_NSW_SAFEGUARD_METRICS=1 \\
+            gunicorn --workers 3 --bind 0.0.0.0:8000 'openfisca_nsw_safeguard.web_api:create_app()'
+        curl localhost:8000/metrics
+
+    Requests are counted by route and status, with a histogram of their
+    latency. `/calculate` requests are also counted by the output variables
+    they ask for, with the latency of the requests asking for each, and the
+    rows it was computed for. Gauges report, for each live worker, its
+    memory and the time its parameters took to load. When enabled, the
+    result cache, micro-batching and sessions report their counters, and
+    the hit ratio of the cache is derived from the totals.
+
+    Counters of the workers that exit, e.g. restarted by gunicorn, stay in
+    the totals until the server restarts: the files live in a subdirectory
+    named after the process that started the workers, which is removed once
+    that process is gone.
+"""
+
+import atexit
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+
+from openfisca_nsw_safeguard.caching import write_atomic
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Type and help of each metric
+METRICS = {
+    'openfisca_http_requests_total': ('counter', 'Requests, by route and status.'),
+    'openfisca_http_request_duration_seconds': ('histogram', 'Latency of the requests, by route.'),
+    'openfisca_calculate_variable_requests_total': ('counter', 'Calculate requests asking for each variable.'),
+    'openfisca_calculate_variable_duration_seconds': ('histogram', 'Latency of the calculate requests asking for each variable.'),
+    'openfisca_calculate_rows_total': ('counter', 'Entities each variable was asked for in calculate requests.'),
+    'openfisca_result_cache_hits_total': ('counter', 'Calculate requests answered by the result cache.'),
+    'openfisca_result_cache_misses_total': ('counter', 'Calculate requests the result cache did not hold.'),
+    'openfisca_result_cache_hit_ratio': ('gauge', 'Share of the cacheable calculate requests answered by the cache.'),
+    'openfisca_calculate_batched_requests_total': ('counter', 'Calculate requests computed in batches.'),
+    'openfisca_calculate_batches_total': ('counter', 'Simulations computing batches of calculate requests.'),
+    'openfisca_sessions_open': ('gauge', 'Calculation sessions open, by worker.'),
+    'openfisca_parameters_load_seconds': ('gauge', 'Time the parameters took to load, by worker.'),
+    'openfisca_worker_resident_memory_bytes': ('gauge', 'Resident memory, by worker.'),
+    'openfisca_worker_max_resident_memory_bytes': ('gauge', 'Peak resident memory, by worker.'),
+    }
+
+
+def metrics_directory(root):
+    """ The directory of the workers of this server under `root`, named
+        after their parent process. Removes those of servers that are gone.
+    """
+    server = os.getppid()
+    for name in os.listdir(root) if os.path.isdir(root) else ():
+        if name.isdigit() and int(name) != server and not _is_alive(int(name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors = True)
+    directory = os.path.join(root, str(server))
+    os.makedirs(directory, exist_ok = True)
+    return directory
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def memory_gauges():
+    """ The current and peak resident memory of this process, in bytes.
+    """
+    gauges = []
+    try:
+        with open('/proc/self/statm') as f:
+            gauges.append(('openfisca_worker_resident_memory_bytes', {}, int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')))
+    except (OSError, ValueError, IndexError):
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    gauges.append(('openfisca_worker_max_resident_memory_bytes', {}, max_rss * (1 if sys.platform == 'darwin' else 1024)))
+    return gauges
+
+
+class Metrics:
+
+    def __init__(self, directory = None, flush_interval = 1.0, worker = None, clock = time.monotonic):
+        """
+        :param directory: Directory shared by the workers, each keeping its own metrics in memory without it.
+        :param flush_interval: Seconds between the writes of the metrics of the worker.
+        :param worker: Identifies the worker, its process id by default.
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.worker = str(worker or os.getpid())
+        self.default_worker = worker is None
+        # The process counting these metrics
+        self.pid = os.getpid()
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.counters = {}
+        # Counts of each bucket, the last one above every bound, then the sum of the values
+        self.histograms = {}
+        # Functions returning (name, labels, value) tuples, read on every flush
+        self.collectors = [memory_gauges]
+        self.flushed = None
+        # Set when the flushing thread should stop
+        self.stopped = threading.Event()
+        self.started = False
+
+    def increment(self, name, labels = None, value = 1):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels = None):
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+            histogram[bucket] += 1
+            histogram[-1] += value
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        """ The metrics of this worker, as written to its file.
+        """
+        collected = [(name, labels, value) for collector in self.collectors for name, labels, value in collector()]
+        with self.lock:
+            return {
+                'worker': self.worker,
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()]
+                + [[name, labels, value] for name, labels, value in collected if METRICS[name][0] == 'counter'],
+                'histograms': [[name, dict(labels), list(counts)] for (name, labels), counts in self.histograms.items()],
+                'gauges': [[name, labels, value] for name, labels, value in collected if METRICS[name][0] == 'gauge'],
+                }
+
+    def flush(self, force = False):
+        """ Writes the metrics of this worker, if `flush_interval` has passed
+            since the last write.
+        """
+        if self.directory is None:
+            return
+        now = self.clock()
+        if not force and self.flushed is not None and now - self.flushed < self.flush_interval:
+            return
+        self.flushed = now
+        self._write(self.snapshot())
+
+    def start(self):
+        """ Flushes the metrics every `flush_interval` seconds on a thread,
+            and at exit. Starts once per process, so that a worker forked from
+            the process creating the metrics starts its own thread.
+        """
+        pid = os.getpid()
+        if self.directory is None or (self.started and self.pid == pid):
+            return
+        with self.lock:
+            if self.started and self.pid == pid:
+                return
+            if self.pid != pid:
+                # Forked: the counts so far are those of the parent, whose thread did not follow
+                self.pid = pid
+                self.counters, self.histograms = {}, {}
+                if self.default_worker:
+                    self.worker = str(pid)
+            self.started = True
+            self.stopped = threading.Event()
+        threading.Thread(target = self._flush_periodically, name = 'metrics-flush', daemon = True).start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """ Stops the flushing thread, and writes the metrics a last time.
+        """
+        self.stopped.set()
+        self._flush_safely()
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            self._flush_safely()
+
+    def _flush_safely(self):
+        try:
+            self.flush(force = True)
+        except OSError:
+            log.warning('Unable to write the metrics.', exc_info = True)
+
+    def _write(self, snapshot):
+        write_atomic(os.path.join(self.directory, '{}.json'.format(self.worker)), json.dumps(snapshot).encode('utf-8'))
+
+    def worker_snapshots(self):
+        """ The snapshots of every worker, this one's being current.
+        """
+        snapshots = [self.snapshot()]
+        if self.directory is None:
+            return snapshots
+        self.flushed = self.clock()
+        self._write(snapshots[0])
+        for name in sorted(os.listdir(self.directory)):
+            worker, extension = os.path.splitext(name)
+            if extension != '.json' or worker == self.worker:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    snapshot = json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError):
+                continue
+            if not (worker.isdigit() and _is_alive(int(worker))):
+                # The totals keep the counts of workers that exited, but not their gauges
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+    def exposition(self):
+        """ The metrics of every worker, summed, in the text exposition
+            format.
+        """
+        counters = {}
+        histograms = {}
+        gauges = {}
+        for snapshot in self.worker_snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = _key(name, labels)
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts in snapshot['histograms']:
+                key = _key(name, labels)
+                histograms[key] = [total + count for total, count in zip(histograms.get(key, [0] * len(counts)), counts)]
+            for name, labels, value in snapshot['gauges']:
+                gauges[_key(name, dict(labels, worker = snapshot['worker']))] = value
+        hits = counters.get(('openfisca_result_cache_hits_total', ()))
+        misses = counters.get(('openfisca_result_cache_misses_total', ()))
+        if hits is not None and misses is not None:
+            gauges[('openfisca_result_cache_hit_ratio', ())] = hits / (hits + misses) if hits + misses else 0.0
+
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), value in sorted(gauges.items()):
+            samples.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), counts in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), counts):
+                cumulative += count
+                lines.append(_sample(name + '_bucket', labels + (('le', _number(bound)),), cumulative))
+            lines.append(_sample(name + '_sum', labels, counts[-1]))
+            lines.append(_sample(name + '_count', labels, cumulative))
+        lines = []
+        for name in sorted(samples):
+            kind, description = METRICS[name]
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            lines.extend(samples[name])
+        return '\n'.join(lines) + '\n'
+
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError("'{}' is not a metric.".format(name))
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def _sample(name, labels, value):
+    if not labels:
+        return '{} {}'.format(name, _number(value))
+    escaped = ('{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, label in labels)
+    return '{}{{{}}} {}'.format(name, ','.join(escaped), _number(value))
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
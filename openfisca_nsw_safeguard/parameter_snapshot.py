@@ -0,0 +1,128 @@
+""" Binary snapshots of the parameter tree.
+
+    Parsing the ~150 YAML files under `parameters/` is most of the start up
+    time of the tax and benefit system. A snapshot is the fully built
+    `ParameterNode` tree pickled to disk, keyed by a hash of every YAML file
+    it was built from and by the OpenFisca-Core build that parsed them.
+    Loading a snapshot takes a fraction of the parse, and the YAML files are
+    only read again when one of them changes.
+
+    Example::
+        # build step, e.g. after `pip install` on deployment
+        python -m openfisca_nsw_safeguard.parameter_snapshot
+
+        # at start up (done by `CountryTaxBenefitSystem`)
+        from openfisca_nsw_safeguard.parameter_snapshot import load_parameters
+        parameters = load_parameters('/path/to/parameters')
+
+    Set `OPENFISCA_NSW_SAFEGUARD_PARAMETER_SNAPSHOT=0` to always parse the
+    YAML files.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+
+from openfisca_core.parameters import ParameterNode
+
+from openfisca_nsw_safeguard.caching import (
+    cache_directory, content_hash, environment_salt, list_files, write_atomic)
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_ENV = 'OPENFISCA_NSW_SAFEGUARD_PARAMETER_SNAPSHOT'
+SNAPSHOT_FORMAT = 1
+PARAMETER_FILE_EXTENSIONS = {'.yaml', '.yml'}
+
+
+def parameters_hash(directory):
+    """ Hash of every parameter file in `directory`, and of the environment
+        the snapshot would be unpickled in.
+    """
+    paths = list_files(directory, PARAMETER_FILE_EXTENSIONS)
+    salt = '{};snapshot-{}'.format(environment_salt(), SNAPSHOT_FORMAT)
+    return content_hash(paths, root=directory, salt=salt)
+
+
+def tree_key(directory):
+    """ Identifies the parameter directory a snapshot is built from, as
+        several trees share the cache directory.
+    """
+    return hashlib.sha256(os.path.abspath(directory).encode('utf-8')).hexdigest()[:16]
+
+
+def snapshot_path(directory, digest):
+    return os.path.join(cache_directory('parameters'), '{}-{}.pickle'.format(tree_key(directory), digest))
+
+
+def snapshots_enabled():
+    return os.environ.get(SNAPSHOT_ENV, '1').lower() not in ('0', 'false', 'no')
+
+
+def write_snapshot(parameters, directory, digest):
+    """ Writes the snapshot of `parameters`, built from `directory`, and
+        removes the snapshots of previous versions of its parameter files.
+        The snapshots of other parameter directories are kept.
+    """
+    path = snapshot_path(directory, digest)
+    write_atomic(path, pickle.dumps(parameters, protocol=pickle.HIGHEST_PROTOCOL))
+    snapshots = os.path.dirname(path)
+    prefix = '{}-'.format(tree_key(directory))
+    for name in os.listdir(snapshots):
+        stale_path = os.path.join(snapshots, name)
+        if name.startswith(prefix) and name.endswith('.pickle') and stale_path != path:
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+    return path
+
+
+def load_parameters(directory):
+    """ Returns the `ParameterNode` of `directory`, from its snapshot when the
+        parameter files have not changed since it was built.
+
+        A missing or stale snapshot falls back to parsing the YAML files, and
+        a new snapshot is written for the next start up.
+    """
+    if not snapshots_enabled():
+        return ParameterNode('', directory_path=directory)
+
+    digest = parameters_hash(directory)
+    try:
+        path = snapshot_path(directory, digest)
+    except OSError:
+        log.warning('Unable to create the parameter snapshot directory.', exc_info=True)
+        return ParameterNode('', directory_path=directory)
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            log.warning('Unreadable parameter snapshot "{}", parsing the parameter files instead.'.format(path), exc_info=True)
+
+    parameters = ParameterNode('', directory_path=directory)
+    try:
+        write_snapshot(parameters, directory, digest)
+    except OSError:
+        log.warning('Unable to write the parameter snapshot "{}".'.format(path), exc_info=True)
+    return parameters
+
+
+def main():
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+
+    parser = argparse.ArgumentParser(description='Build the binary snapshot of the parameter tree.')
+    parser.add_argument('directory', nargs='?', default=os.path.join(COUNTRY_DIR, 'parameters'),
+                        help='parameter directory (default: the parameters of this package)')
+    args = parser.parse_args()
+
+    parameters = ParameterNode('', directory_path=args.directory)
+    print(write_snapshot(parameters, args.directory, parameters_hash(args.directory)))  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+""" Convenience // we expose the parameter table helpers here so their import statements
+    are simpler.
+
+    Example::
+        # in /variables/example_variable.py
+
+        from openfisca_nsw_safeguard.parameter_tables import compile_bins, compile_table
+"""
+
+from openfisca_nsw_safeguard.parameter_tables.bins import Bins, BinnedValues, compile_bins
+from openfisca_nsw_safeguard.parameter_tables.compiled_table import CompiledTable, compile_table
+from openfisca_nsw_safeguard.parameter_tables.enum_keys import EnumKeyedValues, EnumKeys, declared_enum_keys, validate_enum_keys
+from openfisca_nsw_safeguard.parameter_tables.postcodes import build_postcode_index, nsw_postcodes, postcode_array, postcode_lookup
+
+
+__all__ = [
+    'BinnedValues',
+    'Bins',
+    'CompiledTable',
+    'EnumKeyedValues',
+    'EnumKeys',
+    'build_postcode_index',
+    'compile_bins',
+    'compile_table',
+    'declared_enum_keys',
+    'nsw_postcodes',
+    'postcode_array',
+    'postcode_lookup',
+    'validate_enum_keys',
+    ]
@@ -0,0 +1,98 @@
+""" Bins of the continuous inputs indexing parameter tables.
+
+    Formulas used to map a lamp circuit power or an air conditioner cooling
+    capacity to the key of a table with an `np.select` cascade, copied in
+    every formula using the table. The bins now live next to the table they
+    index, e.g. `ESS.HEER.table_D16_bins.cooling_capacity`:
+
+    - `lower_edges` maps the label of each bin, a key of the table, to the
+      lower edge of the bin,
+    - `lower_edge_included` tells whether a value equal to an edge falls in
+      the bin starting or in the bin ending at it.
+
+    `compile_bins` sorts the edges once per parameter instant, after which
+    binning an array is a single `np.searchsorted`. Binned values plug
+    directly into a compiled table:
+
+    Example::
+        cooling_capacity_bins = compile_bins(parameters(period).ESS.HEER.table_D16_bins.cooling_capacity)
+        baseline_AEER = compile_table(parameters(period).ESS.HEER.table_D16_2.AEER).lookup(
+            aircon, cooling_capacity_bins(cooling_capacity))
+
+    Values below the first edge fall in no bin, and raise a
+    `ParameterNotFoundError` when looked up in a table.
+"""
+
+import numpy as np
+
+from openfisca_core.parameters import ParameterNodeAtInstant
+
+from openfisca_nsw_safeguard.parameter_tables.parameter_cache import ParameterCache
+
+_compiled_bins = ParameterCache()
+
+
+class Bins:
+
+    def __init__(self, name, labels, lower_edges, lower_edge_included = True):
+        """
+        :param name: Name of the bins parameter node.
+        :param labels: Label of each bin, in increasing order of edges.
+        :param lower_edges: Lower edge of each bin, strictly increasing.
+        :param lower_edge_included: Whether a value equal to a lower edge falls in the bin.
+        """
+        lower_edges = np.asarray(lower_edges, dtype=float)
+        if len(labels) != len(lower_edges) or not len(labels):
+            raise ValueError("Bins '{}' need one lower edge per label.".format(name))
+        if np.any(np.diff(lower_edges) <= 0):
+            raise ValueError("The lower edges of bins '{}' are not strictly increasing.".format(name))
+        self.name = name
+        self.labels = tuple(labels)
+        self.lower_edges = lower_edges
+        self.lower_edge_included = lower_edge_included
+
+    @staticmethod
+    def from_node(node):
+        children = node._children
+        if not isinstance(children.get('lower_edges'), ParameterNodeAtInstant) \
+                or 'lower_edge_included' not in children:
+            raise ValueError(
+                "Parameter node '{}' does not define bins, as it has no 'lower_edges' and 'lower_edge_included'."
+                .format(node._name))
+        edges = children['lower_edges']._children
+        labels = sorted(edges, key = lambda label: edges[label])
+        return Bins(node._name, labels, [edges[label] for label in labels], bool(children['lower_edge_included']))
+
+    def digitize(self, values):
+        """ Index of the bin of each value, -1 for values below the first edge.
+        """
+        side = 'right' if self.lower_edge_included else 'left'
+        return np.searchsorted(self.lower_edges, values, side = side) - 1
+
+    def __call__(self, values):
+        return BinnedValues(self, values)
+
+
+class BinnedValues:
+    """ Values along with the index of their bin, as accepted by
+        `CompiledTable.lookup` in place of an array of keys.
+    """
+
+    def __init__(self, bins, values):
+        self.bins = bins
+        self.values = np.asarray(values)
+        self.indices = bins.digitize(self.values)
+
+    def keys(self):
+        """ Label of the bin of each value. Values in no bin are kept as is,
+            cast to strings.
+        """
+        labels = np.array(self.bins.labels)
+        return np.where(self.indices >= 0, labels[self.indices], self.values.astype(str))
+
+
+def compile_bins(node):
+    """ Returns the `Bins` of a node at instant, sorting its edges on the
+        first call for that node.
+    """
+    return _compiled_bins.get(node, Bins.from_node)
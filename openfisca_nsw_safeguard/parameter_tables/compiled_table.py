@@ -0,0 +1,186 @@
+""" Dense arrays compiled from nested parameter tables.
+
+    Tables such as `ESS.HEER.table_E5_1.residential_savings_factor` are
+    nested parameter nodes keyed by strings, e.g.
+    `[number_of_lamps][size_of_existing_lamp][new_lamp_output][new_lamp_LCP]`.
+    Indexing them with arrays goes through OpenFisca's fancy indexing, which
+    rebuilds a record array of the node and compares every key of every level
+    with every row.
+
+    `compile_table` turns such a node into a `CompiledTable`: the leaf values
+    as a dense N-dimensional array, plus the keys of each axis. The compiled
+    table is cached for as long as the node at instant lives, i.e. it is
+    built once per parameter instant. Values are then gathered in a single
+    integer-index lookup:
+
+    Example::
+        table = compile_table(parameters(period).ESS.HEER.table_E5_1.residential_savings_factor)
+        savings_factor = table.lookup(number_of_lamps, size_of_existing_lamp, new_lamp_output, new_lamp_LCP)
+
+    As with fancy indexing, a key missing from the table raises a
+    `ParameterNotFoundError`.
+"""
+
+import numpy as np
+
+from openfisca_core.errors import ParameterNotFoundError
+from openfisca_core.indexed_enums import Enum, EnumArray
+from openfisca_core.parameters import ParameterNodeAtInstant
+
+from openfisca_nsw_safeguard.parameter_tables.bins import BinnedValues
+from openfisca_nsw_safeguard.parameter_tables.enum_keys import EnumKeyedValues
+from openfisca_nsw_safeguard.parameter_tables.parameter_cache import ParameterCache
+
+_compiled_tables = ParameterCache()
+
+
+class CompiledTable:
+
+    def __init__(self, name, axes, values, instant_str):
+        """
+        :param name: Name of the compiled parameter node.
+        :param axes: Keys of each axis of the table, in the order of `values`.
+        :param values: Leaf values, an array of shape `tuple(len(keys) for keys in axes)`.
+        :param instant_str: Instant the node was taken at, in the format `YYYY-MM-DD`.
+        """
+        self.name = name
+        self.axes = tuple(tuple(keys) for keys in axes)
+        self.values = values
+        self.instant_str = instant_str
+        self._sorted_keys = []
+        self._key_positions = []
+        self._enum_positions = {}
+        for keys in self.axes:
+            keys = np.array(keys)
+            order = np.argsort(keys, kind='stable')
+            self._sorted_keys.append(keys[order])
+            self._key_positions.append(order)
+
+    @staticmethod
+    def from_node(node):
+        """ Compiles a `ParameterNodeAtInstant` whose children all share the
+            same keys at each level, down to numeric leaves.
+        """
+        axes = []
+        level = node
+        while isinstance(level, ParameterNodeAtInstant):
+            if not level._children:
+                raise ValueError("Cannot compile parameter node '{}', as it is empty.".format(level._name))
+            axes.append(tuple(level._children))
+            level = next(iter(level._children.values()))
+
+        values = np.empty(tuple(len(keys) for keys in axes), dtype=float)
+        for position in np.ndindex(values.shape):
+            leaf = node
+            for axis, index in enumerate(position):
+                key = axes[axis][index]
+                if not isinstance(leaf, ParameterNodeAtInstant) or key not in leaf._children:
+                    raise ValueError(
+                        "Cannot compile parameter node '{}', as '{}' is missing from '{}'. "
+                        "Its children must be homogenous.".format(
+                            node._name, key, getattr(leaf, '_name', leaf)))
+                leaf = leaf._children[key]
+            if isinstance(leaf, ParameterNodeAtInstant) or not isinstance(leaf, (int, float)):
+                raise ValueError(
+                    "Cannot compile parameter node '{}', as its leaves are not all numbers at the same depth.".format(
+                        node._name))
+            values[position] = leaf
+
+        return CompiledTable(node._name, axes, values, node._instant_str)
+
+    @property
+    def ndim(self):
+        return len(self.axes)
+
+    def index(self, axis, keys):
+        """ Positions of `keys` along `axis`, -1 for keys missing from it.
+
+            `keys` can be a string, an array of strings, an `EnumArray` (matched
+            by item name), `EnumKeyedValues` (matched by declared key),
+            `BinnedValues` (matched by bin label), or any array that is matched
+            once cast to strings.
+        """
+        if isinstance(keys, BinnedValues):
+            positions = np.append(self.index(axis, np.array(keys.bins.labels)), -1)
+            return positions[keys.indices]
+        if isinstance(keys, EnumKeyedValues):
+            return self._positions_of(axis, keys.enum_keys, keys.enum_keys.keys)[keys.codes]
+        if isinstance(keys, EnumArray):
+            possible_values = keys.possible_values
+            return self._positions_of(axis, possible_values, [item.name for item in possible_values])[np.asarray(keys)]
+        keys = _as_str_keys(keys)
+        sorted_keys = self._sorted_keys[axis]
+        found_at = np.searchsorted(sorted_keys, keys)
+        found_at = np.minimum(found_at, len(sorted_keys) - 1)
+        return np.where(sorted_keys[found_at] == keys, self._key_positions[axis][found_at], -1)
+
+    def take(self, *indices):
+        """ Gathers the values at the integer positions `indices`, one array
+            (or scalar) per axis.
+        """
+        if len(indices) != self.ndim:
+            raise TypeError("Parameter table '{}' has {} axes, {} indices given.".format(
+                self.name, self.ndim, len(indices)))
+        indices = np.broadcast_arrays(*[np.asarray(index) for index in indices])
+        for axis, index in enumerate(indices):
+            missing = (index < 0) | (index >= len(self.axes[axis]))
+            if missing.any():
+                raise ParameterNotFoundError(self._missing_name(axis, index[missing].flat[0]), self.instant_str)
+        result = self.values[tuple(indices)]
+        if np.isnan(result).any():
+            raise ParameterNotFoundError(self.name, self.instant_str)
+        return result
+
+    def lookup(self, *keys):
+        """ Gathers the values at `keys`, one array (or scalar) of keys per
+            axis.
+        """
+        if len(keys) != self.ndim:
+            raise TypeError("Parameter table '{}' has {} axes, {} keys given.".format(
+                self.name, self.ndim, len(keys)))
+        indices = [self.index(axis, axis_keys) for axis, axis_keys in enumerate(keys)]
+        for axis, (index, axis_keys) in enumerate(zip(indices, keys)):
+            missing = index < 0
+            if np.any(missing):
+                unexpected_key = np.broadcast_to(_as_str_keys(axis_keys), np.shape(index))[missing].flat[0]
+                raise ParameterNotFoundError('.'.join([self.name, str(unexpected_key)]), self.instant_str)
+        return self.take(*indices)
+
+    def _positions_of(self, axis, enum, keys):
+        # Axis position of each item of an enum, plus -1 for codes matching no item
+        positions = self._enum_positions.get((axis, enum))
+        if positions is None:
+            keys = np.array([key if key is not None else '' for key in keys] + [''])
+            positions = self.index(axis, keys)
+            self._enum_positions[(axis, enum)] = positions
+        return positions
+
+    def _missing_name(self, axis, index):
+        return '.'.join([self.name, '<axis {} position {}>'.format(axis, index)])
+
+
+def _as_str_keys(keys):
+    """ Casts keys to strings the way OpenFisca's fancy indexing does.
+    """
+    if isinstance(keys, str):
+        return np.array(keys)
+    if isinstance(keys, (BinnedValues, EnumKeyedValues)):
+        return keys.keys()
+    if isinstance(keys, Enum):
+        return np.array(keys.name)
+    if isinstance(keys, EnumArray):
+        names = np.array([item.name for item in keys.possible_values])
+        return names[np.asarray(keys)]
+    keys = np.asarray(keys)
+    if keys.dtype == object and keys.size and isinstance(keys.flat[0], Enum):
+        return np.array([item.name for item in keys.flat]).reshape(keys.shape)
+    if not np.issubdtype(keys.dtype, np.str_):
+        return keys.astype(str)
+    return keys
+
+
+def compile_table(node):
+    """ Returns the `CompiledTable` of a node at instant, compiling it on the
+        first call for that node.
+    """
+    return _compiled_tables.get(node, CompiledTable.from_node)
@@ -0,0 +1,164 @@
+""" Parameter table keys of the items of an `Enum`.
+
+    Formulas used to turn an `EnumArray` input into an array of table keys
+    with an `np.select` per item, before indexing the table with strings.
+    `EnumKeys` declares once, next to the enum, which key each item stands
+    for and which tables the enum indexes:
+
+    Example::
+        class HVAC1_AC_Type(Enum):
+            non_ducted_split_system = 'Non-ducted split system'
+            ...
+
+        HVAC1_AC_TYPE_KEYS = EnumKeys(HVAC1_AC_Type, tables = [
+            ('ESS.HEER.table_D16_2.AEER', 0),
+            ('ESS.HEER.table_D16_3.AEER', 0),
+            ])
+
+        # in a formula
+        aircon = HVAC1_AC_TYPE_KEYS(buildings('HVAC1_Air_Conditioner_type', period))
+        baseline_AEER = compile_table(parameters(period).ESS.HEER.table_D16_2.AEER).lookup(aircon, ...)
+
+    A compiled table maps the enum items to its axis positions once, so the
+    lookup is an integer gather on the enum codes.
+
+    Items are keyed by their name, unless `keys` says otherwise. The tax and
+    benefit system checks the keys declared by its variable files against
+    the tables at load time, so a renamed key or enum item fails at start up
+    rather than when a request hits it.
+"""
+
+import sys
+
+import numpy as np
+
+from openfisca_core.indexed_enums import Enum, EnumArray
+from openfisca_core.parameters import ParameterNode, ParameterNodeAtInstant
+
+
+class EnumKeys:
+
+    def __init__(self, enum, keys = None, tables = ()):
+        """
+        :param enum: The `Enum` whose items index the tables.
+        :param keys: Maps item names to table keys, where they differ. An item mapped to None has no key.
+        :param tables: Pairs of a parameter path, e.g. 'ESS.HEER.table_D16_2.AEER', and the axis of that table the enum indexes.
+        """
+        keys = keys or {}
+        unknown_items = set(keys) - set(enum.__members__)
+        if unknown_items:
+            raise ValueError("'{}' has no item {}.".format(enum.__name__, ', '.join(sorted(unknown_items))))
+        self.enum = enum
+        self.keys = tuple(keys.get(item.name, item.name) for item in enum)
+        self.tables = tuple(tables)
+        self._codes_by_name = {item.name: item.index for item in enum}
+        item_values = np.array([item.value for item in enum])
+        order = np.argsort(item_values)
+        self._sorted_item_values = item_values[order]
+        self._sorted_item_codes = np.array([item.index for item in enum])[order]
+        self._remaps = {}
+
+    def codes(self, values):
+        """ Item index of each value, -1 for values matching no item.
+
+            `values` can be an `EnumArray` of this enum or of an enum with the
+            same item names, an array of enum items, or an array of item
+            values such as `'Non-ducted split system'`.
+        """
+        if isinstance(values, EnumArray):
+            return self._remap(values.possible_values)[np.asarray(values)]
+        values = np.asarray(values)
+        if values.dtype == object and values.size and isinstance(values.flat[0], Enum):
+            by_name = self._codes_by_name
+            return np.array([by_name.get(item.name, -1) for item in values.flat], dtype=int).reshape(values.shape)
+        item_values = self._sorted_item_values
+        found_at = np.minimum(np.searchsorted(item_values, values), len(item_values) - 1)
+        return np.where(item_values[found_at] == values, self._sorted_item_codes[found_at], -1)
+
+    def __call__(self, values):
+        return EnumKeyedValues(self, self.codes(values))
+
+    def _remap(self, possible_values):
+        remap = self._remaps.get(possible_values)
+        if remap is None:
+            remap = np.array([self._codes_by_name.get(item.name, -1) for item in possible_values], dtype=int)
+            self._remaps[possible_values] = remap
+        return remap
+
+    def validate(self, parameters):
+        """ Raises a ValueError if a key is missing from a table the enum
+            indexes, at any instant the table changes.
+        """
+        expected_keys = set(key for key in self.keys if key is not None)
+        for path, axis in self.tables:
+            node = parameters
+            for name in path.split('.'):
+                node = getattr(node, 'children', {}).get(name)
+                if node is None:
+                    raise ValueError("'{}' indexes the parameter '{}', which does not exist.".format(
+                        self.enum.__name__, path))
+            for instant in sorted(_instants(node)):
+                missing = expected_keys - set(_axis_keys(node(instant), axis))
+                if missing:
+                    raise ValueError(
+                        "The keys {} of '{}' are missing from axis {} of the parameter '{}' at {}.".format(
+                            ', '.join(sorted(missing)), self.enum.__name__, axis, path, instant))
+
+
+class EnumKeyedValues:
+    """ Enum item codes, as accepted by `CompiledTable.lookup` in place of an
+        array of keys.
+    """
+
+    def __init__(self, enum_keys, codes):
+        self.enum_keys = enum_keys
+        self.codes = codes
+
+    def keys(self):
+        """ Table key of each value, '' for values without a key.
+        """
+        keys = np.array([key or '' for key in self.enum_keys.keys] + [''])
+        return keys[self.codes]
+
+
+def _instants(node):
+    # Instants at which a value of the parameter node changes
+    if not isinstance(node, ParameterNode):
+        return set(value.instant_str for value in getattr(node, 'values_list', []))
+    instants = set()
+    for child in node.children.values():
+        instants |= _instants(child)
+    return instants
+
+
+def _axis_keys(node_at_instant, axis):
+    level = node_at_instant
+    for _ in range(axis):
+        if not isinstance(level, ParameterNodeAtInstant) or not level._children:
+            return ()
+        level = next(iter(level._children.values()))
+    return tuple(level._children) if isinstance(level, ParameterNodeAtInstant) else ()
+
+
+def declared_enum_keys(variables):
+    """ The `EnumKeys` declared by the modules defining `variables`.
+
+        Tax and benefit systems execute their variable files as modules of
+        their own, so each finds the declarations of the files it loaded.
+    """
+    modules = set(sys.modules.get(type(variable).__module__) for variable in variables)
+    return [
+        value
+        for module in modules if module is not None
+        for value in vars(module).values() if isinstance(value, EnumKeys)
+        ]
+
+
+def validate_enum_keys(parameters, enum_keys, validated = frozenset()):
+    """ Validates the `enum_keys` not in `validated` against the parameter
+        tree, and returns the set of validated ones.
+    """
+    pending = [keys for keys in enum_keys if keys not in validated]
+    for keys in pending:
+        keys.validate(parameters)
+    return frozenset(validated).union(pending)
@@ -0,0 +1,43 @@
+""" Values derived from parameters at instant, kept for as long as the
+    parameter object they were derived from lives.
+
+    `TaxBenefitSystem.get_parameters_at_instant` caches the parameter tree of
+    every instant it is asked for, so a table compiled from a node at instant
+    is built once per instant and dropped with the node.
+
+    Parameter nodes and scales define `__eq__` and are not hashable, so they
+    are keyed by identity. Simulations with `trace` enabled wrap every node
+    they hand to formulas in a new `TracingParameterNodeAtInstant`: values
+    are derived from, and kept for, the node it wraps.
+"""
+
+import weakref
+
+from openfisca_core.tracers import TracingParameterNodeAtInstant
+
+
+class ParameterCache:
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, parameter, build):
+        """ Returns the value cached for `parameter`, calling `build(parameter)`
+            to compute it on the first call.
+        """
+        if isinstance(parameter, TracingParameterNodeAtInstant):
+            parameter = parameter.parameter_node_at_instant
+        key = id(parameter)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is parameter:
+            return entry[1]
+        value = build(parameter)
+        self._entries[key] = (weakref.ref(parameter), value)
+        weakref.finalize(parameter, self._entries.pop, key, None)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,82 @@
+""" Postcode index of the tables keyed by postcode bracket.
+
+    Tables such as `PDRS.table_A24_regional_network_factor` are single amount
+    scales, whose `calc` digitizes every postcode against hundreds of
+    brackets. As Australian postcodes are four digit integers, the index
+    evaluates each table once over every postcode from 0 to 9999 and turns
+    lookups into a single gather:
+
+    Example::
+        rnf = parameters(period).PDRS.table_A24_regional_network_factor
+        regional_network_factor = postcode_lookup(rnf, postcode)
+
+    The evaluated arrays are cached per instant, alongside the parameters.
+    Postcodes outside of the index, or not integral, are looked up with
+    `calc`, so `postcode_lookup(scale, postcode)` always equals
+    `scale.calc(postcode)`.
+"""
+
+import numpy as np
+
+from openfisca_nsw_safeguard.parameter_tables.parameter_cache import ParameterCache
+
+POSTCODE_COUNT = 10000
+
+# The tables keyed by postcode, indexed together by `build_postcode_index`
+POSTCODE_TABLES = (
+    'PDRS.table_A24_regional_network_factor',
+    'PDRS.table_network_loss_factor_by_postcode',
+    'ESS.ESS_general.table_A24_regional_network_factor',
+    'ESS.ESS_general.table_A25_metro_levy_area',
+    'ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode',
+    'ESS.ESS_general.table_A27_4_climate_zone_by_postcode',
+    )
+
+_postcode_arrays = ParameterCache()
+
+
+def _evaluate_postcodes(scale):
+    values = scale.calc(np.arange(POSTCODE_COUNT))
+    values.flags.writeable = False
+    return values
+
+
+def postcode_array(scale):
+    """ Values of `scale` for every postcode from 0 to 9999.
+    """
+    return _postcode_arrays.get(scale, _evaluate_postcodes)
+
+
+def postcode_lookup(scale, postcode):
+    """ Equivalent to `scale.calc(postcode)`, for a scale keyed by postcode.
+    """
+    values = postcode_array(scale)
+    postcode = np.asarray(postcode)
+    indexed = (postcode >= 0) & (postcode < POSTCODE_COUNT)
+    if postcode.dtype.kind == 'f':
+        indexed &= np.floor(postcode) == postcode
+    if indexed.all():
+        return values[postcode.astype(int)]
+    result = np.empty(postcode.shape, dtype=values.dtype)
+    result[indexed] = values[postcode[indexed].astype(int)]
+    result[~indexed] = scale.calc(postcode[~indexed])
+    return result
+
+
+def nsw_postcodes(parameters_at_instant):
+    """ The postcodes served by a NSW network, i.e. with a network loss
+        factor, in ascending order.
+    """
+    return np.flatnonzero(postcode_array(parameters_at_instant.PDRS.table_network_loss_factor_by_postcode))
+
+
+def build_postcode_index(parameters_at_instant):
+    """ Evaluates every table of `POSTCODE_TABLES` defined at this instant, so
+        that later lookups never pay for it.
+    """
+    for path in POSTCODE_TABLES:
+        node = parameters_at_instant
+        for name in path.split('.'):
+            node = getattr(node, '_children', {}).get(name)
+        if node is not None:
+            postcode_array(node)
@@ -0,0 +1,223 @@
+""" Profiler of the formulas and parameters a calculation goes through.
+
+    A slow calculation spends its time in a few of the hundreds of formulas
+    its outputs depend on, or in the parameter lookups they make, but
+    Python's profilers only see numpy and OpenFisca's internals. A `Profile`
+    records, for every variable a simulation calculates:
+
+    - its calls, and how many of them ran its formula rather than reading
+      the value already computed,
+    - its total and self wall time, the latter excluding the variables and
+      parameters it reads,
+    - the rows and bytes of the arrays it returned,
+
+    and, for every parameter read by a formula, e.g.
+    `ESS.HEER.table_E5_1`, its calls, time and rows.
+
+    Example::
+        profile = Profile()
+        simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, 10000)
+        profile.attach(simulation)
+        simulation.calculate('HVAC1_PDRSAug24_ESC_calculation', '2024')
+        print(profile.report())
+        profile.write_collapsed_stacks('hvac1.folded')
+
+    The collapsed stacks, one line per path of the dependency tree with its
+    self time in microseconds, are the input of flame graph tools, e.g.
+    `flamegraph.pl hvac1.folded > hvac1.svg` or speedscope.
+
+    The batch runner profiles its chunks with `--profile`, as the YAML test
+    runner does its cases (see `testrun`), and the web API serves the
+    profile of a `/calculate` request on `POST /profile` when
+    `OPENFISCA_NSW_SAFEGUARD_PROFILE` is set.
+"""
+
+import collections
+import time
+
+import numpy as np
+
+from openfisca_core.tracers import SimpleTracer, TracingParameterNodeAtInstant
+
+PARAMETERS_PREFIX = 'parameters.'
+
+
+class Stats:
+
+    __slots__ = ('calls', 'computed', 'total_time', 'self_time', 'rows', 'bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.computed = 0
+        self.total_time = 0.0
+        self.self_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profile:
+
+    def __init__(self):
+        self.variables = collections.defaultdict(Stats)
+        self.parameters = collections.defaultdict(Stats)
+        # Self time of each path of the dependency tree, from the variable calculated first
+        self.stacks = collections.Counter()
+
+    def attach(self, simulation):
+        """ Records the calculations of `simulation` in the profile.
+        """
+        tracer = ProfilingTracer(self)
+        # Formulas get their parameters from `trace_parameters_at_instant` once `trace` is set
+        simulation.trace = True
+        simulation.tracer = tracer
+        get_parameters_at_instant = simulation.tax_benefit_system.get_parameters_at_instant
+        simulation.trace_parameters_at_instant = lambda instant: ProfilingParameterNodeAtInstant(
+            get_parameters_at_instant(instant), tracer)
+        run_formula = simulation._run_formula
+
+        def profiled_run_formula(variable, population, period):
+            tracer.stack[-1]['computed'] = True
+            return run_formula(variable, population, period)
+
+        simulation._run_formula = profiled_run_formula
+        return simulation
+
+    def collapsed_stacks(self):
+        """ Lines of `path;of;the;tree microseconds`, as read by flame graph
+            tools.
+        """
+        lines = []
+        for path, seconds in sorted(self.stacks.items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds > 0:
+                lines.append('{} {}'.format(';'.join(path), microseconds))
+        return lines
+
+    def write_collapsed_stacks(self, path):
+        with open(path, 'w') as f:
+            f.writelines(line + '\n' for line in self.collapsed_stacks())
+
+    def to_dict(self, limit = None):
+        """ The stats of the variables and parameters, by decreasing self
+            time, and the collapsed stacks.
+        """
+        return {
+            'variables': [dict(name = name, **stats.to_dict()) for name, stats in _by_self_time(self.variables)[:limit]],
+            'parameters': [dict(name = name, **stats.to_dict()) for name, stats in _by_self_time(self.parameters)[:limit]],
+            'collapsedStacks': self.collapsed_stacks(),
+            }
+
+    def report(self, limit = 30):
+        """ Tables of the `limit` variables and parameters taking the most
+            self time.
+        """
+        lines = ['{:<72} {:>7} {:>8} {:>10} {:>10} {:>10} {:>12}'.format(
+            'variable', 'calls', 'computed', 'total ms', 'self ms', 'rows', 'bytes')]
+        for name, stats in _by_self_time(self.variables)[:limit]:
+            lines.append('{:<72} {:>7} {:>8} {:>10.3f} {:>10.3f} {:>10} {:>12}'.format(
+                name, stats.calls, stats.computed, stats.total_time * 1e3, stats.self_time * 1e3, stats.rows, stats.bytes))
+        lines.append('')
+        lines.append('{:<72} {:>7} {:>10} {:>10}'.format('parameter', 'calls', 'ms', 'rows'))
+        for name, stats in _by_self_time(self.parameters)[:limit]:
+            lines.append('{:<72} {:>7} {:>10.3f} {:>10}'.format(name, stats.calls, stats.self_time * 1e3, stats.rows))
+        return '\n'.join(lines)
+
+
+def _by_self_time(stats):
+    return sorted(stats.items(), key = lambda item: (-item[1].self_time, item[0]))
+
+
+class ProfilingTracer(SimpleTracer):
+    """ Records the calculations of a simulation in a `Profile`, keeping the
+        stack of the calculations in progress as OpenFisca's tracers do.
+    """
+
+    def __init__(self, profile):
+        super().__init__()
+        self.profile = profile
+        # Time spent looking up the nodes leading to the next parameter value
+        self.lookup_time = 0.0
+        self.parameter = None
+
+    def record_calculation_start(self, variable, period):
+        self.stack.append({
+            'name': variable,
+            'period': period,
+            'start': time.perf_counter(),
+            'children_time': 0.0,
+            'computed': False,
+            'value': None,
+            })
+        self.lookup_time = 0.0
+
+    def record_calculation_result(self, value):
+        self.stack[-1]['value'] = value
+
+    def record_calculation_end(self):
+        path = tuple(frame['name'] for frame in self.stack)
+        frame = self.stack.pop()
+        total_time = time.perf_counter() - frame['start']
+        self_time = total_time - frame['children_time']
+        stats = self.profile.variables[frame['name']]
+        stats.calls += 1
+        stats.total_time += total_time
+        stats.self_time += self_time
+        if frame['computed']:
+            stats.computed += 1
+            value = frame['value']
+            if isinstance(value, np.ndarray):
+                stats.rows += len(value)
+                stats.bytes += value.nbytes
+        self.profile.stacks[path] += self_time
+        if self.stack:
+            self.stack[-1]['children_time'] += total_time
+        self.lookup_time = 0.0
+
+    def record_parameter_access(self, parameter, period, value):
+        self.parameter = parameter, value
+
+    def record_lookup(self, seconds):
+        """ Counts `seconds` of a parameter lookup, along with the lookups of
+            the nodes leading to it, against the parameter whose value it
+            returned.
+        """
+        self.lookup_time += seconds
+        if self.parameter is None or not self.stack:
+            return
+        name, value = self.parameter
+        self.parameter = None
+        stats = self.profile.parameters[name]
+        stats.calls += 1
+        stats.total_time += self.lookup_time
+        stats.self_time += self.lookup_time
+        stats.rows += np.size(value)
+        stats.bytes += getattr(value, 'nbytes', 0)
+        self.profile.stacks[tuple(frame['name'] for frame in self.stack) + (PARAMETERS_PREFIX + name,)] += self.lookup_time
+        self.stack[-1]['children_time'] += self.lookup_time
+        self.lookup_time = 0.0
+
+
+class ProfilingParameterNodeAtInstant(TracingParameterNodeAtInstant):
+    """ Parameters as formulas read them, timing each lookup.
+    """
+
+    def __getattr__(self, key):
+        start = time.perf_counter()
+        child = self.get_traced_child(getattr(self.parameter_node_at_instant, key), key)
+        self.tracer.record_lookup(time.perf_counter() - start)
+        return child
+
+    def __getitem__(self, key):
+        start = time.perf_counter()
+        child = self.get_traced_child(self.parameter_node_at_instant[key], key)
+        self.tracer.record_lookup(time.perf_counter() - start)
+        return child
+
+    def get_traced_child(self, child, key):
+        child = super().get_traced_child(child, key)
+        if isinstance(child, TracingParameterNodeAtInstant):
+            return ProfilingParameterNodeAtInstant(child.parameter_node_at_instant, self.tracer)
+        return child
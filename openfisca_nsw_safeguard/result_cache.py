@@ -0,0 +1,253 @@
+""" Cache of calculation results, keyed by their canonical input.
+
+    The estimator forms resubmit the same answers as users step back and
+    forth between questions, and each submission used to build and compute
+    a whole simulation. `ResultCache` maps a request to its response:
+
+    - `canonical_json` turns a request body into a canonical form, with
+      sorted keys and integral floats written as integers, so that two
+      submissions of the same situation share a key,
+    - `ResultCache.key` hashes it along with the version of this package,
+      of OpenFisca-Core and the hashes of the parameter and variable files,
+      so that results never outlive the rules they were computed with,
+    - entries are kept in a bounded in-process LRU store, and expire after
+      `ttl` seconds,
+    - with a `directory`, entries are also kept on disk, where the workers
+      of a server share them.
+
+    Example::
+        cache = ResultCache(max_entries = 1024, ttl = 3600, directory = cache_directory('results'))
+        key = cache.key(request_body)
+        response = cache.get(key)
+        if response is None:
+            response = compute(request_body)
+            cache.set(key, response)
+
+    Hits, misses, evictions and expirations are counted in `stats()`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from openfisca_nsw_safeguard.caching import write_atomic
+
+log = logging.getLogger(__name__)
+
+KEY_FORMAT = 1
+
+
+def canonical_json(body):
+    """ The canonical form of a JSON document, or None if `body` is not
+        JSON.
+    """
+    try:
+        document = json.loads(body)
+    except (TypeError, ValueError):
+        return None
+    return json.dumps(_canonical(document), sort_keys = True, separators = (',', ':'), ensure_ascii = False)
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class MemoryStore:
+    """ Bounded LRU store, whose entries expire `ttl` seconds after they are
+        set.
+    """
+
+    def __init__(self, max_entries, ttl, clock = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if self.clock() >= expires_at:
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl = None):
+        self.entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+    def prune(self):
+        """ Removes the expired entries, from the least recently used, for
+            stores whose entries all live `ttl` seconds.
+        """
+        now = self.clock()
+        while self.entries:
+            key, (expires_at, value) = next(iter(self.entries.items()))
+            if now < expires_at:
+                break
+            del self.entries[key]
+            self.expirations += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskStore:
+    """ Store shared by the processes using the same `directory`. Entries
+        expire `ttl` seconds after they are set, and the least recently used
+        are removed beyond `max_entries`.
+
+        The modification time of an entry records when it was set, and its
+        access time when it was last used.
+    """
+
+    # Pruning lists the directory, so it is only done every so many writes
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_entries, ttl, clock = time.time):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """ The value of `key` and the seconds it has left to live, or None.
+        """
+        path = self.path(key)
+        now = self.clock()
+        try:
+            set_at = os.stat(path).st_mtime
+            if now - set_at >= self.ttl:
+                self.expirations += self._remove(path)
+                return None
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path, (now, set_at))
+        except OSError:
+            return None
+        return value, self.ttl - (now - set_at)
+
+    def set(self, key, value):
+        try:
+            write_atomic(self.path(key), value)
+        except OSError:
+            log.warning('Unable to write the cached result "%s".', key, exc_info = True)
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """ Removes the expired entries, then the least recently used beyond
+            `max_entries`.
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_mtime, path))
+        entries.sort(reverse = True)
+        now = self.clock()
+        for position, (_, set_at, path) in enumerate(entries):
+            if now - set_at >= self.ttl:
+                self.expirations += self._remove(path)
+            elif position >= self.max_entries:
+                self.evictions += self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return 0
+        return 1
+
+
+class ResultCache:
+
+    def __init__(self, max_entries = 1024, ttl = 3600, directory = None, version = ''):
+        """
+        :param max_entries: Number of entries kept in memory, and on disk.
+        :param ttl: Seconds an entry is kept for.
+        :param directory: Directory of the store shared by processes, if any.
+        :param version: Identifies the rules results are computed with, e.g. the hashes of the parameter and variable files.
+        """
+        self.memory = MemoryStore(max_entries, ttl)
+        self.disk = DiskStore(directory, max_entries, ttl) if directory else None
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, body, namespace = ''):
+        """ Key of a request body, or None if it is not JSON and so cannot be
+            cached.
+        """
+        canonical = canonical_json(body)
+        if canonical is None:
+            return None
+        digest = hashlib.sha256('{};{};{};'.format(KEY_FORMAT, self.version, namespace).encode('utf-8'))
+        digest.update(canonical.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            value = self.memory.get(key)
+            if value is None and self.disk is not None:
+                entry = self.disk.get(key)
+                if entry is not None:
+                    value, ttl = entry
+                    self.memory.set(key, value, ttl)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self.memory.set(key, value)
+            if self.disk is not None:
+                self.disk.set(key, value)
+
+    def stats(self):
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.memory.evictions,
+            'expirations': self.memory.expirations,
+            'entries': len(self.memory),
+            'max_entries': self.memory.max_entries,
+            'ttl': self.memory.ttl,
+            }
+        if self.disk is not None:
+            stats['disk_evictions'] = self.disk.evictions
+            stats['disk_expirations'] = self.disk.expirations
+        return stats
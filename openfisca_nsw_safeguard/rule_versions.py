@@ -0,0 +1,87 @@
+""" Routing implementations to the rule version in force on their date.
+
+    Rule changes are modelled as parallel variable trees, one per version of
+    an activity, e.g. `HVAC1`, `HVAC1_ESSJun24` and `HVAC1_PDRSAug24`. Which
+    tree applies to an implementation depends on its date, which callers had
+    to work out for themselves, one activity name per rule change.
+
+    The `rule_versions` parameter is the registry of those trees: for each
+    family of versions, its metadata lists the versions, and its value on a
+    date is the position of the version in force then. The versions of a
+    family name their variables alike after their prefix, so that an output
+    has a canonical name shared by every version, e.g. `ESC_calculation` for
+    `HVAC1_ESC_calculation` and `HVAC1_PDRSAug24_ESC_calculation`.
+
+    Example::
+        route(tax_benefit_system.parameters, 'HVAC1', ['2024-05-20', '2024-09-02'])
+        # array(['HVAC1_ESSJun24', 'HVAC1_PDRSAug24'], dtype=object)
+
+    The batch runner routes each row of a file this way with `--route-by`
+    (see `batch`). The versioned variables stay the ones computed: only the
+    trees of the versions a file needs are imported by a lazy tax and
+    benefit system.
+
+    A date whose metadata has `commencement_confirmed: false` is not yet
+    checked against the amending rule. Implementations it would route are
+    refused rather than computed by a version that may not be in force.
+"""
+
+import numpy as np
+
+REGISTRY = 'rule_versions'
+
+
+class RuleVersionError(ValueError):
+    pass
+
+
+def rule_families(parameters):
+    """ The versions of each family in the registry, oldest first, e.g.
+        {'HVAC2': ['HVAC2', 'HVAC2_PDRSAug24'], …}.
+    """
+    return {family: list(parameter.metadata['versions']) for family, parameter in parameters.children[REGISTRY].children.items()}
+
+
+def family_of(parameters, activity):
+    """ The family `activity` is a version of, or None if it has a single
+        version.
+    """
+    for family, versions in rule_families(parameters).items():
+        if activity == family or activity in versions:
+            return family
+    return None
+
+
+def canonical_name(version, name):
+    """ The name of the variable `name` of `version`, shared by the other
+        versions of its family, e.g. 'ESC_calculation'.
+    """
+    return name[len(version):].lstrip('_')
+
+
+def route(parameters, family, dates):
+    """ The version of `family` in force on each of `dates`, dates or
+        `YYYY-MM-DD` strings.
+    """
+    parameter = parameters.children[REGISTRY].children.get(family)
+    if parameter is None:
+        raise RuleVersionError("'{}' has no rule versions.".format(family))
+    try:
+        dates = np.array([date if date not in (None, '') else 'NaT' for date in dates], dtype = 'datetime64[D]')
+    except ValueError as error:
+        raise RuleVersionError('Implementation dates must be dates, {}'.format(error))
+    if np.isnat(dates).any():
+        raise RuleVersionError('Every implementation of {} needs its date to choose a rule version.'.format(family))
+    # values_list holds the values from the latest to the earliest
+    values = parameter.values_list[::-1]
+    starts = np.array([value.instant_str for value in values], dtype = 'datetime64[D]')
+    positions = np.searchsorted(starts, dates, side = 'right') - 1
+    if (positions < 0).any():
+        raise RuleVersionError('{} has no rule version before {}.'.format(family, values[0].instant_str))
+    for position in np.unique(positions):
+        if (values[position].metadata or {}).get('commencement_confirmed') is False:
+            raise RuleVersionError(
+                'The commencement of {} version {} on {} is not confirmed, implementations from then cannot be routed.'
+                .format(family, parameter.metadata['versions'][values[position].value], values[position].instant_str))
+    versions = np.array(parameter.metadata['versions'], dtype = object)
+    return versions[np.array([value.value for value in values])[positions]]
@@ -0,0 +1,206 @@
+""" Calculation sessions, recomputing only what an answer changes.
+
+    The estimator asks the questions of an activity one at a time, and
+    recalculates the outputs after every answer. Computed from scratch, each
+    recalculation runs every formula the outputs depend on, although one
+    answer only changes the variables that read it.
+
+    A `CalculationSession` keeps the simulation of a single implementation
+    between answers. `update` sets the changed inputs, forgets the values
+    of the variables depending on them in the dependency graph (see
+    `dependency_graph`), and recomputes the outputs: every other value is
+    reused as is.
+
+    Example::
+        sessions = SessionStore(tax_benefit_system)
+        session, outputs = sessions.open('HVAC1_PDRSAug24', period = '2024')
+        session.update({'HVAC1_PDRSAug24_cooling_capacity_input': 7.1})
+        session.update({'HVAC1_PDRSAug24_PDRS__postcode': 2340})
+
+    Values are given as in the web API: numbers, booleans, dates as
+    `YYYY-MM-DD` and enum item names. A value of None unsets an input, which
+    takes its default value again.
+
+    `SessionStore` bounds the number of open sessions, closing the least
+    recently used beyond `max_sessions`, and closes sessions left idle for
+    `ttl` seconds.
+"""
+
+import datetime
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.simulations import SimulationBuilder
+
+from openfisca_nsw_safeguard.batch import activity_variables, output_array, output_variables
+from openfisca_nsw_safeguard.dependency_graph import load_dependency_graph
+from openfisca_nsw_safeguard.result_cache import MemoryStore
+
+
+class SessionError(ValueError):
+    pass
+
+
+class CalculationSession:
+
+    def __init__(self, tax_benefit_system, graph, outputs, period, session_id = None):
+        """
+        :param tax_benefit_system: The system the session computes with.
+        :param graph: The `DependencyGraph` of the variables of the system.
+        :param outputs: Names of the variables computed after every update.
+        :param period: Period the inputs are set and the outputs computed for.
+        """
+        self.tax_benefit_system = tax_benefit_system
+        self.graph = graph
+        self.outputs = list(outputs)
+        self.period = periods.period(period)
+        self.id = session_id or uuid.uuid4().hex
+        self.inputs = {}
+        self.lock = threading.Lock()
+        self.updates = 0
+        self.invalidated = 0
+        for name in self.outputs:
+            self._variable(name)
+        self.simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, 1)
+
+    def update(self, inputs = None):
+        """ Sets `inputs`, a dict of variable names and values, and returns
+            the outputs. Only the variables depending on the changed inputs
+            are recomputed.
+        """
+        with self.lock:
+            changes = {}
+            for name, value in (inputs or {}).items():
+                variable = self._variable(name)
+                if value is not None:
+                    try:
+                        value = variable.check_set_value(value)
+                    except ValueError as error:
+                        raise SessionError(str(error))
+                if name not in self.inputs and value is None:
+                    continue
+                if name in self.inputs and value is not None and self.inputs[name] == value:
+                    continue
+                changes[name] = value
+            if changes:
+                self._apply(changes)
+            self.updates += 1
+            return self._results()
+
+    def _apply(self, changes):
+        invalidated = self.graph.dependents(changes)
+        # Variables set by the session keep their value, whatever they would compute
+        invalidated.difference_update(self.inputs)
+        invalidated.update(name for name, value in changes.items() if value is None)
+        for name in invalidated:
+            if name not in self.tax_benefit_system.variables:
+                continue
+            holder = self.simulation.get_variable_population(name)._holders.get(name)
+            if holder is not None and holder.get_known_periods():
+                holder.delete_arrays()
+                self.invalidated += 1
+        for name, value in changes.items():
+            if value is None:
+                del self.inputs[name]
+            else:
+                self.inputs[name] = value
+                self.simulation.set_input(name, self.period, np.array([value]))
+
+    def results(self):
+        """ The outputs, computed for the current inputs.
+        """
+        with self.lock:
+            return self._results()
+
+    def _results(self):
+        return {
+            name: output_array(self._variable(name), self.simulation.calculate(name, self.period)).tolist()[0]
+            for name in self.outputs
+            }
+
+    def _variable(self, name):
+        variable = self.tax_benefit_system.get_variable(name)
+        if variable is None:
+            raise SessionError("'{}' is not a variable.".format(name))
+        return variable
+
+    def stats(self):
+        return {
+            'id': self.id,
+            'period': str(self.period),
+            'inputs': len(self.inputs),
+            'updates': self.updates,
+            'invalidated': self.invalidated,
+            }
+
+
+class SessionStore:
+
+    def __init__(self, tax_benefit_system, max_sessions = 1000, ttl = 900, clock = None, graph = None):
+        """
+        :param tax_benefit_system: The system sessions compute with.
+        :param max_sessions: Number of sessions kept open, the least recently used being closed first.
+        :param ttl: Seconds a session is kept open without being used.
+        :param graph: The `DependencyGraph` of the variables, loaded from the variable files by default.
+        """
+        if graph is None:
+            from openfisca_nsw_safeguard import COUNTRY_DIR
+
+            graph = load_dependency_graph(os.path.join(COUNTRY_DIR, 'variables'))
+        self.tax_benefit_system = tax_benefit_system
+        self.graph = graph
+        self.sessions = MemoryStore(max_sessions, ttl) if clock is None else MemoryStore(max_sessions, ttl, clock)
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def open(self, activity = None, outputs = None, period = None, inputs = None):
+        """ Opens a session computing `outputs`, by default the certificates
+            and final eligibility of `activity`, and sets its `inputs`.
+            Returns the session and its outputs.
+        """
+        if outputs is None:
+            if activity is None:
+                raise SessionError('A session needs an activity or outputs.')
+            if not activity_variables(self.tax_benefit_system, activity):
+                raise SessionError("No variable belongs to the activity '{}'.".format(activity))
+            outputs = output_variables(self.tax_benefit_system, activity)
+        if not outputs:
+            raise SessionError('A session needs outputs to compute.')
+        try:
+            period = periods.period(period or str(datetime.date.today().year))
+        except ValueError as error:
+            raise SessionError(str(error))
+        session = CalculationSession(self.tax_benefit_system, self.graph, outputs, period)
+        results = session.update(inputs)
+        with self.lock:
+            self.sessions.prune()
+            self.sessions.set(session.id, session)
+            self.opened += 1
+        return session, results
+
+    def get(self, session_id):
+        """ The session `session_id`, or None if it is closed or expired.
+            Using a session keeps it open for another `ttl` seconds.
+        """
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.set(session_id, session)
+            return session
+
+    def close(self, session_id):
+        with self.lock:
+            return self.sessions.entries.pop(session_id, None) is not None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'open': len(self.sessions),
+                'opened': self.opened,
+                'evictions': self.sessions.evictions,
+                'expirations': self.sessions.expirations,
+                }
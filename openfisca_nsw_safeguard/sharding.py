@@ -0,0 +1,95 @@
+""" Ordered map over forked worker processes.
+
+    Loading the tax and benefit system takes seconds and hundreds of
+    megabytes, so workers must not load their own. `map_ordered` forks its
+    workers from the parent once the system is loaded: they share its
+    parameters, variables and compiled tables copy-on-write, and only the
+    items and results cross process boundaries.
+
+    Example::
+        tax_benefit_system = CountryTaxBenefitSystem()
+
+        def compute(chunk):
+            return compute_chunk(tax_benefit_system, chunk, ...)
+
+        for results in map_ordered(compute, chunks, workers = 8):
+            writer.write(results)
+
+    Results are yielded in the order of the items, and at most
+    `max_pending` items are in flight, so memory stays bounded whatever the
+    number of items. `workers = 1` maps in process, without forking.
+
+    Forking requires a POSIX platform.
+"""
+
+import collections
+import gc
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# The function mapped by a worker, inherited from the parent when forking
+_worker_function = None
+
+
+def fork_available():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def available_cpus():
+    """ Number of CPUs this process may run on.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _set_worker_function(function):
+    global _worker_function
+    _worker_function = function
+
+
+def _call_worker_function(item):
+    return _worker_function(item)
+
+
+def map_ordered(function, items, workers = None, max_pending = None):
+    """ Yields `function(item)` for every item of `items`, in order,
+        computed by `workers` forked processes (one per CPU by default).
+
+        `function` needs not be picklable, as workers inherit it. Items and
+        results must be.
+    """
+    workers = workers or available_cpus()
+    if workers == 1:
+        for item in items:
+            yield function(item)
+        return
+    if not fork_available():
+        raise RuntimeError('Running on several workers requires forking processes, which this platform does not support.')
+    max_pending = max_pending or 2 * workers
+
+    # Objects tracked by the garbage collector before forking are never collected by workers,
+    # which would otherwise touch, and so copy, every page holding the tax and benefit system
+    gc.collect()
+    gc.freeze()
+    executor = ProcessPoolExecutor(
+        max_workers = workers,
+        mp_context = multiprocessing.get_context('fork'),
+        initializer = _set_worker_function,
+        initargs = (function,),
+        )
+    pending = collections.deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(_call_worker_function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # On error, the items not started yet are dropped
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+        gc.unfreeze()
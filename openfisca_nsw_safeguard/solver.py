@@ -0,0 +1,173 @@
+""" Inverse queries: the least value of an input reaching a target output.
+
+    "Which rated AEER earns at least 10 ESCs for this installation?" has no
+    closed form: certificates are rounded down, and eligibility conditions
+    zero them below thresholds. `solve` searches for it instead, for many
+    implementations at once:
+
+    Example::
+        solve(tax_benefit_system,
+            output = 'HVAC1_PDRSAug24_ESC_calculation',
+            variable = 'HVAC1_PDRSAug24_rated_AEER_input',
+            target = 10,
+            low = 0, high = 10,
+            inputs = {
+                'HVAC1_PDRSAug24_cooling_capacity_input': [7.1, 12.5, 20.0],
+                'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+                },
+            period = '2024',
+            )
+
+    Each row keeps an interval whose lower bound misses the target and whose
+    upper bound reaches it. Every round evaluates `probes` points inside the
+    interval of every row still searching, in a single simulation, and
+    narrows each interval to the probes around the first one reaching the
+    target, until it is no wider than `tolerance`. A row also stops once a
+    round leaves its interval as wide as it was, as happens when floats
+    cannot split it any further, and every row stops after `max_rounds`
+    rounds. `tolerance` may not be below a billionth of `high - low`.
+
+    The upper bound is returned, so a returned value always reaches the
+    target: steps in the output, such as rounding or eligibility
+    thresholds, are bracketed like any other value.
+
+    The search assumes that, above the least value reaching the target,
+    every value reaches it too, i.e. that the output does not decrease with
+    the input. Rows whose `high` misses the target have no solution; those
+    whose `low` reaches it are solved by `low`.
+
+    Once enabled (see `web_api`), the web API serves inverse queries on
+    `POST /solve`, with the same arguments as a JSON object.
+"""
+
+import datetime
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.simulations import SimulationBuilder
+
+from openfisca_nsw_safeguard.batch import BatchError, column_array
+
+DEFAULT_PROBES = 7
+DEFAULT_TOLERANCE = 0.001
+# Least tolerance, relative to the search interval
+MIN_RELATIVE_TOLERANCE = 1e-9
+MAX_ROUNDS = 64
+# Implementations solved at once
+MAX_ROWS = 10000
+
+
+class SolverError(ValueError):
+    pass
+
+
+def solve(tax_benefit_system, output, variable, target, low, high, inputs = None, period = None,
+        tolerance = None, probes = DEFAULT_PROBES, max_rows = MAX_ROWS, max_rounds = MAX_ROUNDS):
+    """ The least value of `variable` between `low` and `high` for which
+        `output` reaches `target`, for each row of `inputs`. `inputs` maps
+        variable names to a value, or to a list of values, one per row.
+        `tolerance` defaults to 1 for integer variables.
+
+        Returns the value of each row, None for rows whose `high` misses the
+        target, and the output at that value.
+    """
+    try:
+        period = periods.period(period or str(datetime.date.today().year))
+    except ValueError as error:
+        raise SolverError(str(error))
+    output_variable = _variable(tax_benefit_system, output)
+    searched = _variable(tax_benefit_system, variable)
+    if output_variable.value_type not in (int, float) or searched.value_type not in (int, float):
+        raise SolverError("Both '{}' and '{}' must be numbers.".format(output, variable))
+    if not low < high:
+        raise SolverError("The search interval must have 'low' below 'high'.")
+    integral = searched.value_type == int
+    tolerance = (1 if integral else DEFAULT_TOLERANCE) if tolerance is None else tolerance
+    if tolerance <= 0 or probes < 1:
+        raise SolverError('The tolerance and the number of probes must be positive.')
+    if tolerance < (high - low) * MIN_RELATIVE_TOLERANCE:
+        raise SolverError('The tolerance must be at least {} of the search interval, {}.'.format(
+            MIN_RELATIVE_TOLERANCE, (high - low) * MIN_RELATIVE_TOLERANCE))
+
+    columns, count = _input_columns(tax_benefit_system, inputs or {}, variable, max_rows)
+    rows = np.arange(count)
+
+    def evaluate(rows, values):
+        return _evaluate(tax_benefit_system, columns, rows, variable, values, output, period)
+
+    lower = np.full(count, float(low))
+    upper = np.full(count, float(high))
+    bounds = evaluate(np.concatenate([rows, rows]), np.concatenate([lower, upper]))
+    solved_by_low = bounds[:count] >= target
+    solvable = bounds[count:] >= target
+    searching = solvable & ~solved_by_low
+    for _ in range(max_rounds):
+        if not searching.any():
+            break
+        active = np.flatnonzero(searching)
+        widths = upper[active] - lower[active]
+        fractions = np.arange(1, probes + 1) / (probes + 1)
+        points = lower[active, None] + (upper[active] - lower[active])[:, None] * fractions
+        if integral:
+            # Integer points strictly inside the interval, repeated when it holds fewer than `probes`
+            points = np.clip(np.round(points), lower[active, None] + 1, upper[active, None] - 1)
+        reached = evaluate(np.repeat(active, probes), points.ravel()).reshape(len(active), probes) >= target
+        any_reached = reached.any(axis = 1)
+        first = np.where(any_reached, reached.argmax(axis = 1), probes)
+        positions = np.arange(len(active))
+        upper[active] = np.where(any_reached, points[positions, np.minimum(first, probes - 1)], upper[active])
+        lower[active] = np.where(first > 0, points[positions, np.maximum(first - 1, 0)], lower[active])
+        narrowed = upper[active] - lower[active]
+        searching[active] = (narrowed > tolerance) & (narrowed < widths)
+
+    values = np.where(solved_by_low, lower, upper)
+    outputs = evaluate(rows[solvable], values[solvable])
+    results = np.full(count, np.nan)
+    results[solvable] = outputs
+    return {
+        'output': output,
+        'variable': variable,
+        'target': target,
+        'values': [(int(value) if integral else float(value)) if ok else None for value, ok in zip(values, solvable)],
+        'outputs': [float(value) if ok else None for value, ok in zip(results, solvable)],
+        }
+
+
+def _input_columns(tax_benefit_system, inputs, searched_variable, max_rows):
+    lengths = set(len(value) for value in inputs.values() if isinstance(value, (list, tuple)))
+    if len(lengths) > 1:
+        raise SolverError('Inputs listing a value per row must all list as many values.')
+    count = lengths.pop() if lengths else 1
+    if count > max_rows:
+        raise SolverError('{} rows are more than the {} allowed.'.format(count, max_rows))
+    columns = {}
+    try:
+        for name, value in inputs.items():
+            if name == searched_variable:
+                continue
+            cells = value if isinstance(value, (list, tuple)) else [value] * count
+            columns[name] = column_array(_variable(tax_benefit_system, name), cells)
+    except BatchError as error:
+        raise SolverError(str(error))
+    return columns, count
+
+
+def _evaluate(tax_benefit_system, columns, rows, variable, values, output, period):
+    """ `output` for the given `rows` of the inputs, `variable` set to
+        `values`, in a single simulation.
+    """
+    if not len(rows):
+        return np.zeros(0)
+    simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, len(rows))
+    for name, column in columns.items():
+        simulation.set_input(name, period, column[rows])
+    simulation.set_input(variable, period, values)
+    return simulation.calculate(output, period)
+
+
+def _variable(tax_benefit_system, name):
+    variable = tax_benefit_system.get_variable(name)
+    if variable is None:
+        raise SolverError("'{}' is not a variable.".format(name))
+    return variable
@@ -0,0 +1,188 @@
+""" What-if sweeps: the outputs of an implementation over ranges of inputs.
+
+    Questions such as "how many ESCs if the rated AEER were 4.0, 4.1 … 6.0,
+    in every NSW postcode" take one `/calculate` request per combination.
+    `sweep` expands the axes into a single simulation, one row per
+    combination, and returns the outputs as a grid indexed like the axes:
+
+    Example::
+        sweep(tax_benefit_system,
+            outputs = ['HVAC2_PDRSAug24_ESC_calculation'],
+            inputs = {'HVAC2_PDRSAug24_cooling_capacity_input': 7.1},
+            axes = [
+                {'variable': 'HVAC2_PDRSAug24_rated_AEER_input', 'range': {'start': 4.0, 'stop': 6.0, 'step': 0.1}},
+                {'variable': 'HVAC2_PDRSAug24_PDRS__postcode', 'all': True},
+                ],
+            period = '2024',
+            )
+
+    An axis lists its `values`, or spans a `range` whose `stop` is included,
+    or takes `all` the values of its variable: the items of an enum, both
+    booleans, or the NSW postcodes for a postcode. Inputs and values are
+    given as in the web API, enums as item names. Combinations that cannot
+    be computed, such as a postcode whose climate zone an activity does not
+    cover, have None outputs, and the first errors are reported. They are
+    found by computing the failing rows again in halves, in at most
+    `max_simulations` simulations: the rows left then are not computed.
+
+    The web API serves sweeps on `POST /sweep`, with the same arguments as a
+    JSON object, once enabled (see `web_api`).
+"""
+
+import datetime
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.indexed_enums import Enum
+from openfisca_core.simulations import SimulationBuilder
+
+from openfisca_nsw_safeguard.batch import BatchError, column_array, output_array
+from openfisca_nsw_safeguard.parameter_tables import nsw_postcodes
+
+# Rows of a single sweep, i.e. the product of the lengths of its axes
+MAX_ROWS = 100000
+# Simulations of a single sweep, including those computing failing rows again
+MAX_SIMULATIONS = 64
+MAX_REPORTED_ERRORS = 10
+
+
+class SweepError(ValueError):
+    pass
+
+
+def sweep(tax_benefit_system, outputs, axes, inputs = None, period = None, max_rows = MAX_ROWS,
+        max_simulations = MAX_SIMULATIONS):
+    """ `outputs` for every combination of the values of `axes`, the other
+        variables set to `inputs`. Returns the values of each axis and, for
+        each output, nested lists indexed by the position of the values on
+        each axis, in the order of `axes`, along with the errors of the
+        combinations that could not be computed.
+    """
+    if not outputs:
+        raise SweepError('A sweep needs outputs to compute.')
+    if not axes:
+        raise SweepError('A sweep needs at least one axis.')
+    try:
+        period = periods.period(period or str(datetime.date.today().year))
+    except ValueError as error:
+        raise SweepError(str(error))
+    expanded = [expand_axis(tax_benefit_system, axis, period) for axis in axes]
+    names = [name for name, _ in expanded]
+    if len(set(names)) < len(names):
+        raise SweepError('Each variable can only be swept along one axis.')
+    shape = tuple(len(values) for _, values in expanded)
+    count = int(np.prod(shape))
+    if count > max_rows:
+        raise SweepError('The sweep has {} combinations, more than the {} allowed.'.format(count, max_rows))
+
+    columns = {}
+    try:
+        for name, value in (inputs or {}).items():
+            if name not in names:
+                columns[name] = np.repeat(column_array(_variable(tax_benefit_system, name), [value]), count)
+        stride = count
+        for name, values in expanded:
+            # Axes vary from the slowest to the fastest, as in a C-ordered array of `shape`
+            stride //= len(values)
+            positions = np.arange(count) // stride % len(values)
+            columns[name] = column_array(_variable(tax_benefit_system, name), values)[positions]
+    except BatchError as error:
+        raise SweepError(str(error))
+    results = {name: np.empty(count, dtype = object) for name in outputs}
+    errors = []
+    _compute_rows(tax_benefit_system, columns, np.arange(count), outputs, period, results, errors, [max_simulations])
+    return {
+        'period': str(period),
+        'axes': [{'variable': name, 'values': list(values)} for name, values in expanded],
+        'outputs': {name: values.reshape(shape).tolist() for name, values in results.items()},
+        'errors': [
+            {'position': [int(index) for index in np.unravel_index(row, shape)], 'error': message}
+            for row, message in errors[:MAX_REPORTED_ERRORS]
+            ],
+        }
+
+
+def _compute_rows(tax_benefit_system, columns, rows, outputs, period, results, errors, budget):
+    """ Computes `outputs` for `rows` in one simulation. If it fails, e.g. as
+        a parameter table has no value for some combinations, halves of the
+        rows are computed separately, down to the rows that fail on their own,
+        whose outputs are left to None. `budget` holds the number of
+        simulations left, past which rows are left to None untried.
+    """
+    if budget[0] <= 0:
+        errors.append((rows[0], 'Not computed, along with {} other combinations: too many combinations failed.'.format(
+            len(rows) - 1)))
+        return
+    budget[0] -= 1
+    try:
+        simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, len(rows))
+        for name, values in columns.items():
+            simulation.set_input(name, period, values[rows])
+        values = {
+            name: output_array(_variable(tax_benefit_system, name), simulation.calculate(name, period))
+            for name in outputs
+            }
+    except SweepError:
+        raise
+    except Exception as error:
+        if len(rows) == 1:
+            errors.append((rows[0], str(error)))
+            return
+        middle = len(rows) // 2
+        _compute_rows(tax_benefit_system, columns, rows[:middle], outputs, period, results, errors, budget)
+        _compute_rows(tax_benefit_system, columns, rows[middle:], outputs, period, results, errors, budget)
+        return
+    for name in outputs:
+        results[name][rows] = values[name].tolist()
+
+
+def expand_axis(tax_benefit_system, axis, period):
+    """ The variable of `axis` and the values it takes along the axis.
+    """
+    if not isinstance(axis, dict) or 'variable' not in axis:
+        raise SweepError('Each axis must name its variable.')
+    variable = _variable(tax_benefit_system, axis['variable'])
+    if 'values' in axis:
+        values = list(axis['values'])
+    elif 'range' in axis:
+        values = _range_values(variable, axis['range'])
+    elif axis.get('all'):
+        values = _all_values(tax_benefit_system, variable, period)
+    else:
+        raise SweepError("The axis of '{}' needs 'values', a 'range' or 'all'.".format(variable.name))
+    if not values:
+        raise SweepError("The axis of '{}' has no values.".format(variable.name))
+    return variable.name, values
+
+
+def _range_values(variable, spec):
+    if variable.value_type not in (int, float):
+        raise SweepError("'{}' is not a number, its values cannot span a range.".format(variable.name))
+    try:
+        start, stop, step = float(spec['start']), float(spec['stop']), float(spec.get('step', 1))
+    except (KeyError, TypeError, ValueError):
+        raise SweepError("The range of '{}' needs a numeric 'start' and 'stop', and optionally 'step'.".format(
+            variable.name))
+    if step <= 0 or stop < start:
+        raise SweepError("The range of '{}' must have a positive step, and stop after it starts.".format(variable.name))
+    # Rounded, so that 0.1 steps give 4.1 rather than 4.1000000000000005, and a stop a step away is reached
+    values = np.round(start + step * np.arange(int(np.floor((stop - start) / step + 1e-9)) + 1), 10)
+    return values.tolist() if variable.value_type == float else values.astype(int).tolist()
+
+
+def _all_values(tax_benefit_system, variable, period):
+    if variable.value_type == Enum:
+        return [item.name for item in variable.possible_values]
+    if variable.value_type == bool:
+        return [False, True]
+    if variable.value_type in (int, float) and variable.name.endswith('postcode'):
+        return nsw_postcodes(tax_benefit_system.get_parameters_at_instant(period.start)).tolist()
+    raise SweepError("'{}' has no finite set of values, list them or give a range.".format(variable.name))
+
+
+def _variable(tax_benefit_system, name):
+    variable = tax_benefit_system.get_variable(name)
+    if variable is None:
+        raise SweepError("'{}' is not a variable.".format(name))
+    return variable
@@ -0,0 +1,543 @@
+""" Parallel runner of the YAML tests.
+
+    `openfisca test` runs the YAML tests one after the other. `run_tests`
+    loads the tax and benefit system once and runs the test files on
+    processes forked from it (see `sharding`), the most costly first, so
+    that the suite takes about as long as its share of each CPU:
+
+    Example::
+        python -m openfisca_nsw_safeguard.testrun openfisca_nsw_safeguard/tests/ --workers 8
+
+    Files are scheduled by the time they took on the previous runs, kept in
+    the package cache, or by their size until they have run once. Files
+    known to take longer than a share of the suite are split into ranges of
+    cases, so that the longest of them does not finish last. They are read
+    through the fixture cache (see `fixture_cache`).
+
+    The failures of every worker are merged into one report, each located
+    by the file and line of its case, and recorded: `--failed` only runs
+    the cases that failed on the previous runs, until they pass.
+
+    Cases run as `openfisca test` runs them, with the same error margins,
+    reforms and extensions, and are selected by the same `--name-filter`,
+    `--only-variables` and `--ignore-variables` options.
+
+    Most cases of a file only differ by the values of the same inputs and
+    outputs. Rather than a simulation for each, such cases run in one, on
+    consecutive rows, and each is compared to its own rows of the outputs.
+    Cases failing in a group run again alone, which reports them as
+    `openfisca test` would and keeps a formula reading across rows from
+    failing a case for another. `--case-by-case` builds a simulation for
+    each case.
+
+    `--profile PATH` records the time spent in each formula and parameter
+    lookup of the cases run (see `profiler`), with a single worker: a report
+    of the slowest goes to the standard error, and their collapsed stacks
+    to PATH.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from openfisca_core import periods
+from openfisca_core.errors import SituationParsingError, VariableNotFound
+from openfisca_core.simulation_builder import SimulationBuilder
+from openfisca_core.tools import assert_near
+from openfisca_core.tools.test_runner import _get_tax_benefit_system, build_test, yaml
+
+from openfisca_nsw_safeguard.caching import cache_directory, list_files, write_atomic
+from openfisca_nsw_safeguard.fixture_cache import TEST_EXTENSIONS, load_fixtures
+from openfisca_nsw_safeguard.profiler import Profile
+from openfisca_nsw_safeguard.sharding import available_cpus, map_ordered
+
+log = logging.getLogger(__name__)
+
+DURATIONS_FILE = 'durations.json'
+FAILURES_FILE = 'last-failed.json'
+# Shards per worker the suite is split into, at most, by splitting its most costly files
+SHARDS_PER_WORKER = 4
+
+Case = collections.namedtuple('Case', ['path', 'index', 'line', 'name', 'test'])
+Result = collections.namedtuple('Result', ['path', 'index', 'line', 'name', 'outcome', 'message', 'seconds'])
+# Cases `start` to `stop` of a file, or those of `cases` [index, name] pairs
+Shard = collections.namedtuple('Shard', ['path', 'start', 'stop', 'cases'])
+
+
+class YamlTestError(ValueError):
+    pass
+
+
+def list_test_files(paths):
+    """ The YAML files of `paths`, searching directories recursively.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(list_files(path, TEST_EXTENSIONS))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            raise YamlTestError("No such test file or directory: '{}'.".format(path))
+    return list(dict.fromkeys(os.path.realpath(path) for path in found))
+
+
+def load_cases(path):
+    """ The test cases of the YAML file at `path`, with the line each starts
+        at, read through the fixture cache.
+    """
+    try:
+        fixtures = load_fixtures(path)
+    except yaml.YAMLError as error:
+        raise YamlTestError("'{}' is not a valid YAML file: {}".format(path, error))
+    return [
+        Case(path, index, line, test.get('name', '') if isinstance(test, dict) else '', test)
+        for index, (line, test) in enumerate(fixtures)
+        ]
+
+
+def is_selected(case, name_filter):
+    """ Whether `openfisca test --name-filter` runs `case`.
+    """
+    return (
+        name_filter is None
+        or name_filter in os.path.splitext(os.path.basename(case.path))[0]
+        or name_filter in case.name
+        or name_filter in (case.test.get('keywords') or [])
+        )
+
+
+def expected_values(tax_benefit_system, simulation, test):
+    """ Yields the variable, period, expected value and entity index, if any,
+        of every output of `test`.
+    """
+    for key, expected in test.output.items():
+        if tax_benefit_system.get_variable(key):
+            yield from _by_period(key, expected, test.period, None)
+        elif simulation.populations.get(key):
+            for variable_name, value in expected.items():
+                yield from _by_period(variable_name, value, test.period, None)
+        else:
+            population = simulation.get_population(plural = key)
+            if population is None:
+                raise VariableNotFound(key, tax_benefit_system)
+            for instance_id, instance_values in expected.items():
+                entity_index = population.get_index(instance_id)
+                for variable_name, value in instance_values.items():
+                    yield from _by_period(variable_name, value, test.period, entity_index)
+
+
+def _by_period(variable_name, expected, period, entity_index):
+    if isinstance(expected, dict):
+        for requested_period, value in expected.items():
+            yield from _by_period(variable_name, value, requested_period, entity_index)
+    else:
+        yield variable_name, period, expected, entity_index
+
+
+def is_checked(variable_name, options):
+    only_variables = options.get('only_variables')
+    ignore_variables = options.get('ignore_variables')
+    return (
+        (only_variables is None or variable_name in only_variables)
+        and (ignore_variables is None or variable_name not in ignore_variables)
+        )
+
+
+def run_case(tax_benefit_system, case, options = None, recorder = None):
+    """ Runs `case` as `openfisca test` does. Returns its outcome, `passed`,
+        `failed` or `error`, and the message of its failure.
+
+        `recorder`, e.g. a `Profile`, is attached to the simulation of the
+        case.
+    """
+    options = options or {}
+    try:
+        test = build_test(dict(case.test))
+        if test.output is None:
+            return 'error', "Missing key 'output' in test '{}'".format(case.name)
+        system = _get_tax_benefit_system(tax_benefit_system, test.reforms, test.extensions)
+        builder = SimulationBuilder()
+        builder.set_default_period(test.period)
+        simulation = builder.build_from_dict(system, test.input)
+        if test.max_spiral_loops:
+            simulation.max_spiral_loops = test.max_spiral_loops
+        if recorder is not None:
+            recorder.attach(simulation)
+        for variable_name, period, expected, entity_index in expected_values(system, simulation, test):
+            if not is_checked(variable_name, options):
+                continue
+            actual = simulation.calculate(variable_name, period)
+            if entity_index is not None:
+                actual = actual[entity_index]
+            assert_near(
+                actual,
+                expected,
+                test.absolute_error_margin[variable_name],
+                '{}@{}: '.format(variable_name, period),
+                test.relative_error_margin[variable_name],
+                )
+    except AssertionError as error:
+        return 'failed', str(error.args[0]) if error.args else 'Assertion failed'
+    except VariableNotFound as error:
+        return 'failed', str(error.args[0]) if error.args else str(error)
+    except SituationParsingError as error:
+        return 'failed', 'Could not parse situation described: {}'.format(error)
+    except Exception:
+        return 'error', traceback.format_exc()
+    return 'passed', ''
+
+
+def group_key(tax_benefit_system, test):
+    """ What the cases running in one simulation must share: their period,
+        the variables and periods of their inputs and outputs. None for the
+        cases that run alone, such as those with reforms or entities.
+    """
+    if not isinstance(test, dict) or test.get('reforms') or test.get('extensions') or test.get('period') is None:
+        return None
+    inputs, outputs = test.get('input'), test.get('output')
+    if not isinstance(inputs, dict) or not inputs or not isinstance(outputs, dict):
+        return None
+    if not all(tax_benefit_system.get_variable(name) for name in itertools.chain(inputs, outputs)):
+        return None
+    if input_arrays(test) is None:
+        return None
+    return str(test['period']), test.get('max_spiral_loops'), _periods_of(inputs), _periods_of(outputs)
+
+
+def _periods_of(values):
+    return tuple(sorted(
+        (name, tuple(sorted(str(period) for period in value)) if isinstance(value, dict) else None)
+        for name, value in values.items()
+        ))
+
+
+def input_arrays(test):
+    """ The input arrays of `test` by variable and period, None being its
+        default period, and its number of rows. None if their lengths differ.
+    """
+    arrays = {}
+    for name, value in test['input'].items():
+        for period, values in value.items() if isinstance(value, dict) else [(None, value)]:
+            array = np.asarray(values)
+            arrays[name, None if period is None else str(period)] = array.reshape(1) if array.ndim == 0 else array
+    lengths = {array.shape for array in arrays.values()}
+    if len(lengths) != 1:
+        return None
+    shape, = lengths
+    return (arrays, shape[0]) if len(shape) == 1 else None
+
+
+def group_cases(tax_benefit_system, cases):
+    """ Groups `cases` that can run in one simulation, in the order of their
+        first case.
+    """
+    groups = collections.OrderedDict()
+    for case in cases:
+        key = group_key(tax_benefit_system, case.test)
+        groups.setdefault(('case', case.index) if key is None else key, []).append(case)
+    return list(groups.values())
+
+
+def run_group(tax_benefit_system, cases, options = None, recorder = None):
+    """ Runs compatible `cases` in one simulation, each on its own rows.
+        Returns the outcome and message of each case.
+
+        `recorder`, e.g. a `Profile`, is attached to the simulations of the
+        cases.
+    """
+    options = options or {}
+    if len(cases) == 1:
+        return [run_case(tax_benefit_system, cases[0], options, recorder)]
+    try:
+        passed = _pass_together(tax_benefit_system, cases, options, recorder)
+    except Exception:
+        passed = [False] * len(cases)
+    # A formula reading across rows would fail a case for its neighbours, so failures are confirmed alone
+    return [
+        ('passed', '') if ok else run_case(tax_benefit_system, case, options, recorder)
+        for case, ok in zip(cases, passed)
+        ]
+
+
+def _pass_together(tax_benefit_system, cases, options, recorder):
+    tests = [build_test(dict(case.test)) for case in cases]
+    inputs = [input_arrays(case.test) for case in cases]
+    simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, sum(rows for arrays, rows in inputs))
+    if recorder is not None:
+        recorder.attach(simulation)
+    if tests[0].max_spiral_loops:
+        simulation.max_spiral_loops = tests[0].max_spiral_loops
+    default_period = str(periods.period(tests[0].period))
+    for name, period in inputs[0][0]:
+        simulation.set_input(name, period or default_period, np.concatenate([arrays[name, period] for arrays, rows in inputs]))
+    passed = []
+    start = 0
+    for test, (arrays, rows) in zip(tests, inputs):
+        passed.append(_passes(simulation, test, start, start + rows, options))
+        start += rows
+    return passed
+
+
+def _passes(simulation, test, start, stop, options):
+    for variable_name, period, expected, entity_index in expected_values(simulation.tax_benefit_system, simulation, test):
+        if not is_checked(variable_name, options):
+            continue
+        try:
+            assert_near(
+                simulation.calculate(variable_name, period)[start:stop],
+                expected,
+                test.absolute_error_margin[variable_name],
+                '{}@{}: '.format(variable_name, period),
+                test.relative_error_margin[variable_name],
+                )
+        except AssertionError:
+            return False
+    return True
+
+
+def run_shard(tax_benefit_system, shard, options = None, vectorize = True, recorder = None):
+    """ Runs the cases of `shard`, those compatible in one simulation if
+        `vectorize` is true. Returns the number of cases of its file, None if
+        it could not be read, and the result of each case run.
+    """
+    options = options or {}
+    start = time.perf_counter()
+    try:
+        cases = load_cases(shard.path)
+    except (OSError, YamlTestError) as error:
+        return None, [Result(shard.path, None, 1, '', 'error', str(error), time.perf_counter() - start)]
+    if shard.cases is not None:
+        selected = select_cases(cases, shard.cases)
+    else:
+        selected = cases[shard.start:shard.stop]
+    selected = [case for case in selected if is_selected(case, options.get('name_filter'))]
+    results = []
+    for group in group_cases(tax_benefit_system, selected) if vectorize else [[case] for case in selected]:
+        outcomes = run_group(tax_benefit_system, group, options, recorder)
+        now = time.perf_counter()
+        # The first group also counts the time the file took to load
+        results.extend(
+            Result(case.path, case.index, case.line, case.name, outcome, message, (now - start) / len(group))
+            for case, (outcome, message) in zip(group, outcomes)
+            )
+        start = now
+    return len(cases), results
+
+
+def select_cases(cases, pairs):
+    """ The cases of [index, name] `pairs`, found by name when an edit moved
+        them. A None index, as for a file that could not be read, selects
+        every case.
+    """
+    if any(index is None for index, name in pairs):
+        return cases
+    names = {index: name for index, name in pairs}
+    found = {case.index for case in cases if names.get(case.index) == case.name}
+    moved = {name for index, name in pairs} - {cases[index].name for index in found}
+    return [case for case in cases if case.index in found or case.name in moved]
+
+
+def load_record(name):
+    try:
+        with open(os.path.join(cache_directory('tests'), name), 'rb') as f:
+            record = json.loads(f.read().decode('utf-8'))
+        return record if isinstance(record, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_record(name, record):
+    try:
+        write_atomic(os.path.join(cache_directory('tests'), name), json.dumps(record, indent = 1, sort_keys = True).encode('utf-8'))
+    except OSError:
+        log.warning('Unable to write %s.', name, exc_info = True)
+
+
+def estimate_costs(paths, durations):
+    """ The seconds each file took on its last run, or estimated from its
+        size and the speed of the files that ran.
+    """
+    sizes = {path: os.path.getsize(path) for path in paths}
+    known = [path for path in paths if path in durations]
+    known_size = sum(sizes[path] for path in known)
+    seconds_per_byte = sum(durations[path]['seconds'] for path in known) / known_size if known_size else 1e-6
+    return {path: durations[path]['seconds'] if path in durations else sizes[path] * seconds_per_byte for path in paths}
+
+
+def plan_shards(paths, durations, workers):
+    """ Shards of the files of `paths`, the most costly first. Files whose
+        number of cases is known are split in as many ranges as they take
+        shares of the suite.
+    """
+    costs = estimate_costs(paths, durations)
+    share = sum(costs.values()) / (workers * SHARDS_PER_WORKER)
+    planned = []
+    for path in paths:
+        cases = durations.get(path, {}).get('cases') or 0
+        parts = min(cases, int(math.ceil(costs[path] / share))) if workers > 1 and share > 0 else 1
+        if parts <= 1:
+            planned.append((costs[path], Shard(path, 0, None, None)))
+            continue
+        size = int(math.ceil(cases / parts))
+        for start in range(0, cases, size):
+            stop = start + size if start + size < cases else None
+            planned.append((costs[path] * size / cases, Shard(path, start, stop, None)))
+    planned.sort(key = lambda item: -item[0])
+    return [shard for cost, shard in planned]
+
+
+class Report:
+
+    def __init__(self, results, seconds, workers):
+        self.results = sorted(results, key = lambda result: (result.path, result.index if result.index is not None else -1))
+        self.seconds = seconds
+        self.workers = workers
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.outcome != 'passed']
+
+    def counts(self):
+        counts = collections.Counter(result.outcome for result in self.results)
+        return {outcome: counts[outcome] for outcome in ('passed', 'failed', 'error')}
+
+    def to_dict(self):
+        return {
+            'counts': self.counts(),
+            'seconds': self.seconds,
+            'workers': self.workers,
+            'failures': [
+                {'path': result.path, 'line': result.line, 'name': result.name, 'outcome': result.outcome, 'message': result.message}
+                for result in self.failures
+                ],
+            }
+
+    def format(self):
+        lines = []
+        for result in self.failures:
+            lines.append('{}:{}: {} {}'.format(
+                os.path.relpath(result.path), result.line, result.outcome.upper(), "'{}'".format(result.name) if result.name else ''))
+            lines.extend('    ' + line for line in result.message.rstrip().splitlines())
+        counts = self.counts()
+        lines.append('{} passed, {} failed, {} errors in {:.1f}s on {} worker{}'.format(
+            counts['passed'], counts['failed'], counts['error'], self.seconds, self.workers, 's' if self.workers > 1 else ''))
+        return '\n'.join(lines)
+
+
+def run_tests(tax_benefit_system, paths, workers = None, options = None, failed = False, vectorize = True, selection = None,
+        profile = None):
+    """ Runs the YAML tests of `paths` on `workers` processes, one per CPU by
+        default. Returns the `Report` of the run.
+
+        Only the cases that failed on the previous runs run if `failed` is
+        true, and only those of `selection` if given, a dict of the [index,
+        name] pairs of the cases to run by file, or None for all its cases.
+        With a `profile`, which needs a single worker, the calculations of
+        every case are recorded in it.
+    """
+    if profile is not None and workers != 1:
+        raise YamlTestError('Profiles are recorded by a single worker, run with --workers 1.')
+    options = options or {}
+    workers = workers or available_cpus()
+    files = list_test_files(paths)
+    durations = load_record(DURATIONS_FILE)
+    failures = load_record(FAILURES_FILE)
+    if failed:
+        selection = failures
+    if selection is not None:
+        costs = estimate_costs(files, durations)
+        shards = [Shard(path, 0, None, None if selection[path] is None else tuple(map(tuple, selection[path])))
+            for path in files if path in selection]
+        shards.sort(key = lambda shard: -costs[shard.path] * (
+            1 if shard.cases is None else len(shard.cases) / (durations.get(shard.path, {}).get('cases') or 1)))
+    else:
+        shards = plan_shards(files, durations, workers)
+    workers = max(1, min(workers, len(shards)))
+    log.info('%s shards of %s files on %s workers.', len(shards), len(files), workers)
+
+    def run(shard):
+        return shard, run_shard(tax_benefit_system, shard, options, vectorize, profile)
+
+    start = time.perf_counter()
+    results = []
+    # Files are only timed when all of their cases run
+    timed = collections.defaultdict(lambda: {'seconds': 0.0, 'cases': 0})
+    for shard, (cases, shard_results) in map_ordered(run, shards, workers = workers, max_pending = len(shards)):
+        results.extend(shard_results)
+        if selection is None and cases is not None and not options.get('name_filter'):
+            timed[shard.path]['seconds'] += sum(result.seconds for result in shard_results)
+            timed[shard.path]['cases'] = cases
+    report = Report(results, time.perf_counter() - start, workers)
+
+    durations.update(timed)
+    save_record(DURATIONS_FILE, durations)
+    for result in results:
+        recorded = [entry for entry in failures.get(result.path, []) if entry != [result.index, result.name]]
+        if result.outcome != 'passed':
+            recorded.append([result.index, result.name])
+        if recorded:
+            failures[result.path] = recorded
+        else:
+            failures.pop(result.path, None)
+    save_record(FAILURES_FILE, failures)
+    return report
+
+
+def main(args = None):
+    from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.testrun',
+        description = 'Runs the YAML tests on several processes, and reports their failures.',
+        )
+    parser.add_argument('paths', nargs = '*', default = [os.path.join(COUNTRY_DIR, 'tests')],
+        help = 'test files or directories, the tests of the package by default')
+    parser.add_argument('--workers', type = int, default = 0, help = 'processes running tests, 0 for one per CPU')
+    parser.add_argument('--failed', action = 'store_true', help = 'only run the cases that failed on the previous runs')
+    parser.add_argument('-n', '--name-filter', help = 'only run the cases whose file name, name or keywords contain this')
+    parser.add_argument('-o', '--only-variables', nargs = '+', help = 'only check these variables')
+    parser.add_argument('-i', '--ignore-variables', nargs = '+', help = 'do not check these variables')
+    parser.add_argument('--case-by-case', action = 'store_true',
+        help = 'build a simulation for each case, as openfisca test does, rather than one for each group of compatible cases')
+    parser.add_argument('--report', metavar = 'PATH', help = 'also write the report to PATH, as JSON')
+    parser.add_argument('--profile', metavar = 'PATH',
+        help = 'write the collapsed stacks of the calculations to PATH, and the time of each variable to stderr')
+    parser.add_argument('-v', '--verbose', action = 'store_true', help = 'log progress')
+    args = parser.parse_args(args)
+    logging.basicConfig(level = logging.INFO if args.verbose else logging.WARNING, stream = sys.stderr)
+    if args.workers < 0:
+        parser.error('--workers must be positive, or 0')
+
+    options = {
+        'name_filter': args.name_filter,
+        'only_variables': args.only_variables,
+        'ignore_variables': args.ignore_variables,
+        }
+    profile = Profile() if args.profile else None
+    try:
+        report = run_tests(CountryTaxBenefitSystem(), args.paths, workers = args.workers, options = options,
+            failed = args.failed, vectorize = not args.case_by_case, profile = profile)
+    except YamlTestError as error:
+        parser.exit(1, 'error: {}\n'.format(error))
+    print(report.format())  # noqa: T001
+    if profile is not None:
+        profile.write_collapsed_stacks(args.profile)
+        print(profile.report(), file = sys.stderr)  # noqa: T001
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report.to_dict(), f, indent = 1)
+    return 1 if report.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+from openfisca_nsw_safeguard.fixture_cache import use_fixture_cache
+
+
+def pytest_configure(config):
+    # `openfisca test` reads the YAML files through the fixture cache
+    use_fixture_cache(config.pluginmanager)
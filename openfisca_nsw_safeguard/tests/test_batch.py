@@ -0,0 +1,180 @@
+import csv
+
+import numpy as np
+import pytest
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.batch import BatchError, compute_chunk, output_gates, output_variables, run_batch
+from openfisca_nsw_safeguard.rule_versions import route
+from openfisca_nsw_safeguard.sharding import fork_available
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def test_batch_matches_single_simulation(tmp_path):
+    count = 20
+    random = np.random.RandomState(1)
+    inputs = {
+        'HVAC1_PDRSAug24_PDRS__postcode': random.choice([2000, 2340, 2880, 2650], count).tolist(),
+        'HVAC1_PDRSAug24_cooling_capacity_input': random.uniform(1, 80, count).round(2).tolist(),
+        'HVAC1_PDRSAug24_heating_capacity_input': random.uniform(0, 80, count).round(2).tolist(),
+        'HVAC1_PDRSAug24_rated_AEER_input': random.uniform(0, 6, count).round(2).tolist(),
+        'HVAC1_PDRSAug24_rated_ACOP_input': random.uniform(0, 6, count).round(2).tolist(),
+        'HVAC1_PDRSAug24_input_power': random.uniform(0, 10, count).round(2).tolist(),
+        'HVAC1_PDRSAug24_Activity': random.choice(['new_installation_activity', 'replacement_activity'], count).tolist(),
+        'HVAC1_PDRSAug24_installed_by_qualified_person': random.choice([True, False], count).tolist(),
+        }
+    input_path = tmp_path / 'installs.csv'
+    with open(input_path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        # Columns may drop the activity prefix, and unknown columns are copied to the output
+        columns = ['installation_id'] + [name.replace('HVAC1_PDRSAug24_', '', 1) for name in inputs]
+        writer.writerow(columns)
+        writer.writerows(zip(['id-{}'.format(row) for row in range(count)], *inputs.values()))
+
+    output_path = tmp_path / 'certificates.csv'
+    assert run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(output_path),
+        chunk_size = 7, period = '2024') == count
+
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, inputs)
+    with open(output_path, newline = '') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['installation_id'] for row in rows] == ['id-{}'.format(row) for row in range(count)]
+    outputs = output_variables(tax_benefit_system, 'HVAC1_PDRSAug24')
+    assert outputs[:2] == ['HVAC1_PDRSAug24_ESC_calculation', 'HVAC1_PDRSAug24_PRC_calculation']
+    for name in outputs:
+        expected = simulation.calculate(name, '2024')
+        if expected.dtype == bool:
+            assert [row[name] == 'True' for row in rows] == expected.tolist()
+        else:
+            assert np.allclose([float(row[name]) for row in rows], expected)
+
+
+def test_batch_rejects_unknown_enum_item(tmp_path):
+    input_path = tmp_path / 'installs.csv'
+    input_path.write_text('Activity\nrefurbishment_activity\n')
+    with pytest.raises(BatchError, match = 'refurbishment_activity'):
+        run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(tmp_path / 'out.csv'))
+
+
+def test_batch_parquet_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    input_path = tmp_path / 'installs.csv'
+    input_path.write_text('installation_id,cooling_capacity_input,rated_AEER_input,PDRS__postcode\na,10,4.5,2000\nb,5,5,2340\n')
+    parquet_path = str(tmp_path / 'certificates.parquet')
+    run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), parquet_path, chunk_size = 1)
+    csv_path = tmp_path / 'certificates.csv'
+    run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', parquet_path, str(csv_path),
+        outputs = ['HVAC1_PDRSAug24_PRC_calculation'])
+    with open(csv_path, newline = '') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['installation_id'] for row in rows] == ['a', 'b']
+    assert all(float(row['HVAC1_PDRSAug24_PRC_calculation']) > 0 for row in rows)
+
+
+@pytest.mark.skipif(not fork_available(), reason = 'workers are forked')
+def test_batch_workers_write_chunks_in_input_order(tmp_path):
+    random = np.random.RandomState(2)
+    input_path = tmp_path / 'installs.csv'
+    with open(input_path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['installation_id', 'cooling_capacity_input', 'rated_AEER_input', 'PDRS__postcode'])
+        writer.writerows(zip(range(50), random.uniform(1, 80, 50).round(2), random.uniform(0, 6, 50).round(2),
+            random.choice([2000, 2340, 2880, 2650], 50)))
+    for workers in (1, 3):
+        run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(tmp_path / 'out-{}.csv'.format(workers)),
+            chunk_size = 4, period = '2024', workers = workers)
+    assert (tmp_path / 'out-3.csv').read_text() == (tmp_path / 'out-1.csv').read_text()
+
+
+def test_skipping_ineligible_rows_leaves_outputs_unchanged(tmp_path):
+    count = 30
+    random = np.random.RandomState(3)
+    inputs = {
+        'PDRS__postcode': random.choice([2000, 2340, 2880, 2650], count).tolist(),
+        'cooling_capacity_input': random.uniform(1, 80, count).round(2).tolist(),
+        'heating_capacity_input': (random.uniform(1, 80, count) * (random.rand(count) > 0.3)).round(2).tolist(),
+        'rated_AEER_input': random.uniform(2, 6, count).round(2).tolist(),
+        'rated_ACOP_input': random.uniform(2, 6, count).round(2).tolist(),
+        'input_power': random.uniform(0, 10, count).round(2).tolist(),
+        'installed_by_qualified_person': random.choice(['true', 'false'], count).tolist(),
+        }
+    outputs = output_variables(tax_benefit_system, 'HVAC1_PDRSAug24')
+    gates = output_gates(tax_benefit_system, outputs)
+    assert gates == {
+        'HVAC1_PDRSAug24_ESC_calculation': 'HVAC1_PDRSAug24_HSPF_or_ACOP_exceeds_ESS_benchmark',
+        'HVAC1_PDRSAug24_PRC_calculation': 'HVAC1_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark',
+        }
+    gate_values = compute_chunk(tax_benefit_system, {'HVAC1_PDRSAug24_' + name: cells for name, cells in inputs.items()},
+        count, sorted(gates.values()), '2024')
+    for values in gate_values.values():
+        assert 0 < values.sum() < count
+
+    input_path = tmp_path / 'installs.csv'
+    with open(input_path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(inputs))
+        writer.writerows(zip(*inputs.values()))
+    for skip_ineligible in (False, True):
+        run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(tmp_path / 'out-{}.csv'.format(skip_ineligible)),
+            chunk_size = 7, period = '2024', skip_ineligible = skip_ineligible)
+    assert (tmp_path / 'out-True.csv').read_text() == (tmp_path / 'out-False.csv').read_text()
+
+    with pytest.raises(BatchError, match = 'no rows to skip'):
+        run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(tmp_path / 'out.csv'),
+            outputs = ['HVAC1_PDRSAug24_annual_energy_savings'], skip_ineligible = True)
+
+
+def test_routed_batch_computes_each_row_with_its_rule_version(tmp_path, monkeypatch):
+    dates = ['2024-05-20', '2024-07-01', '2024-09-02', '2024-06-01', '2024-08-01']
+    # The 2024 commencements are not confirmed yet, so they are confirmed for this test only
+    for value in tax_benefit_system.parameters.rule_versions.HVAC1.values_list:
+        monkeypatch.setitem(value.metadata, 'commencement_confirmed', True)
+    assert route(tax_benefit_system.parameters, 'HVAC1', dates).tolist() == [
+        'HVAC1', 'HVAC1_ESSJun24', 'HVAC1_PDRSAug24', 'HVAC1_ESSJun24', 'HVAC1_PDRSAug24']
+    inputs = {
+        'cooling_capacity_input': [7.1, 12.5, 20.0, 3.0, 40.0],
+        'rated_AEER_input': [4.5, 5.0, 3.9, 6.0, 4.1],
+        'PDRS__postcode': [2000, 2340, 2880, 2650, 2000],
+        }
+    input_path = tmp_path / 'installs.csv'
+    with open(input_path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['implementation_date'] + list(inputs))
+        writer.writerows(zip(dates, *inputs.values()))
+
+    output_path = tmp_path / 'certificates.csv'
+    assert run_batch(tax_benefit_system, 'HVAC1', str(input_path), str(output_path),
+        period = '2024', route_by = 'implementation_date', outputs = ['PRC_calculation']) == len(dates)
+    with open(output_path, newline = '') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['implementation_date'] for row in rows] == dates
+    for index, row in enumerate(rows):
+        version = row['rule_version']
+        expected = compute_chunk(tax_benefit_system, {
+            '{}_{}'.format(version, name): [values[index]] for name, values in inputs.items()
+            }, 1, [version + '_PRC_calculation'], '2024')
+        assert float(row['PRC_calculation']) == pytest.approx(float(expected[version + '_PRC_calculation'][0]))
+
+    with pytest.raises(BatchError, match = 'single rule version'):
+        run_batch(tax_benefit_system, 'F17', str(input_path), str(output_path), route_by = 'implementation_date')
+
+    monkeypatch.undo()
+    with pytest.raises(BatchError, match = 'not confirmed'):
+        run_batch(tax_benefit_system, 'HVAC1', str(input_path), str(output_path), route_by = 'implementation_date')
+
+
+def test_batch_checks_its_arguments_before_opening_the_output(tmp_path):
+    input_path = tmp_path / 'installs.csv'
+    input_path.write_text('implementation_date,cooling_capacity_input\n2024-07-01,7.1\n')
+    output_path = tmp_path / 'out.csv'
+    with pytest.raises(BatchError, match = 'HVAC1_PDRSAug24_typo'):
+        run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(output_path),
+            outputs = ['HVAC1_PDRSAug24_typo'])
+    with pytest.raises(BatchError, match = 'install_date'):
+        run_batch(tax_benefit_system, 'HVAC1', str(input_path), str(output_path), route_by = 'install_date')
+    assert not output_path.exists()
@@ -0,0 +1,75 @@
+import copy
+import functools
+import threading
+
+import pytest
+
+from openfisca_core.errors import SituationParsingError
+from openfisca_web_api import handlers
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.coalescer import CalculationCoalescer
+
+tax_benefit_system = CountryTaxBenefitSystem()
+calculate = functools.partial(handlers.calculate, tax_benefit_system)
+
+
+def situation(cooling_capacity, postcode):
+    return {
+        'persons': {'person': {}},
+        'buildings': {
+            'building': {
+                'representatives': ['person'],
+                'HVAC1_PDRSAug24_cooling_capacity_input': {'2024': cooling_capacity},
+                'HVAC1_PDRSAug24_rated_AEER_input': {'2024': 4.5},
+                'HVAC1_PDRSAug24_PDRS__postcode': {'2024': postcode},
+                'HVAC1_PDRSAug24_ESC_calculation': {'2024': None},
+                'HVAC1_PDRSAug24_PRC_calculation': {'2024': None},
+                },
+            },
+        }
+
+
+def calculate_concurrently(coalescer, situations):
+    outcomes = [None] * len(situations)
+
+    def run(position):
+        try:
+            outcomes[position] = coalescer.calculate(situations[position])
+        except Exception as error:
+            outcomes[position] = error
+
+    threads = [threading.Thread(target = run, args = (position,)) for position in range(len(situations))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_situations_are_computed_together():
+    situations = [situation(1.5 * row, [2000, 2340, 2880, 2650][row % 4]) for row in range(1, 25)]
+    expected = [calculate(copy.deepcopy(item)) for item in situations]
+    coalescer = CalculationCoalescer(tax_benefit_system, calculate, window = 0.5, max_batch = 10)
+
+    assert calculate_concurrently(coalescer, situations) == expected
+    assert coalescer.stats()['requests'] == 24
+    assert coalescer.stats()['batches'] < 24
+
+
+def test_an_invalid_situation_only_fails_its_own_request():
+    situations = [situation(10.0, 2000), situation(12.0, 2340), situation(14.0, 2880)]
+    situations[1]['persons']['person']['unknown_variable'] = {'2024': 1}
+    coalescer = CalculationCoalescer(tax_benefit_system, calculate, window = 0.5)
+    # The invalid situation sets another variable, so it is computed on its own
+    assert coalescer.signature(situations[1]) != coalescer.signature(situations[0])
+    situations[0]['buildings']['building']['HVAC1_PDRSAug24_rated_AEER_input'] = {'2024': 'not a number'}
+
+    outcomes = calculate_concurrently(coalescer, situations)
+    assert isinstance(outcomes[0], SituationParsingError)
+    assert isinstance(outcomes[1], SituationParsingError)
+    assert outcomes[2] == calculate(situation(14.0, 2880))
+    # The first and last situations were stacked, then computed again one by one
+    assert coalescer.stats()['fallbacks'] == 1
+    with pytest.raises(SituationParsingError):
+        coalescer.calculate(situations[0])
@@ -0,0 +1,54 @@
+import ast
+import os
+import textwrap
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.dependency_graph import DependencyGraph, FunctionReads
+
+tax_benefit_system = CountryTaxBenefitSystem()
+graph = DependencyGraph.from_directory(os.path.join(COUNTRY_DIR, 'variables'))
+
+
+def test_function_reads_variables_and_parameters():
+    module = ast.parse(textwrap.dedent('''
+        def helper(buildings, period):
+            return buildings('helper_input', period)
+
+        def formula(buildings, period, parameters):
+            size = buildings(
+                'size', period)
+            node = parameters(period).ESS.motors
+            rated = node['poles_2'].rated_output.calc(size)
+            zone = parameters(period).ESS.zones[buildings('zone', period)]
+            other = buildings('prefix_' + 'suffix', period)
+            return rated + zone + helper(buildings, period) + other
+        '''))
+    helpers = {node.name: node for node in module.body}
+    reads = FunctionReads(helpers['formula'], helpers, {})
+    assert reads.variables == {'size', 'zone', 'helper_input'}
+    assert reads.parameters == {'ESS.motors.poles_2.rated_output', 'ESS.zones'}
+    assert reads.dynamic
+
+
+def test_manifest_of_an_output():
+    manifest = graph.manifest('HVAC1_PDRSAug24_PRC_calculation')
+    assert {'HVAC1_PDRSAug24_cooling_capacity_input', 'HVAC1_PDRSAug24_PDRS__postcode'} <= set(manifest['inputs'])
+    assert 'PDRS.table_network_loss_factor_by_postcode' in manifest['parameters']
+    assert manifest['unknown'] == manifest['dynamic'] == []
+    order = manifest['evaluation_order']
+    assert order[-1] == 'HVAC1_PDRSAug24_PRC_calculation'
+    for position, name in enumerate(order):
+        assert not set(graph.nodes[name].variables) & set(order[position + 1:])
+
+
+def test_simulation_only_computes_the_manifest():
+    output = 'HVAC1_PDRSAug24_ESC_calculation'
+    manifest = graph.manifest(output)
+    simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, 1)
+    simulation.trace = True
+    simulation.calculate(output, '2024')
+    computed = set(key.split('<')[0] for key in simulation.tracer.get_flat_trace())
+    assert computed <= set(manifest['inputs'] + manifest['intermediates'] + [output])
+    assert set(manifest['intermediates']) <= computed
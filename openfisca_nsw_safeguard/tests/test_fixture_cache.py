@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import numpy as np
+
+from openfisca_core.tools.test_runner import run_tests
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem, fixture_cache
+from openfisca_nsw_safeguard.caching import CACHE_DIR_ENV
+from openfisca_nsw_safeguard.fixture_cache import fixture_path, load_fixtures
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+TESTS = """- name: capacity factor
+  period: 2022
+  absolute_error_margin: 0
+  input:
+    WH1_HP_capacity_factor:
+      [
+        10,
+        40,
+      ]
+    WH1_WH_capacity_factor: {'2022': [20, 20]}
+  output:
+    WH1_capacity_factor: [1, 0.5]
+"""
+
+
+def test_fixtures_are_cached_until_their_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    path = tmp_path / 'capacity.yaml'
+    path.write_text(TESTS)
+
+    (line, test), = load_fixtures(str(path))
+    assert line == 1
+    assert test['input']['WH1_HP_capacity_factor'].tolist() == [10, 40]
+    assert isinstance(test['input']['WH1_WH_capacity_factor']['2022'], np.ndarray)
+    assert os.path.exists(fixture_path(str(path)))
+
+    parse_fixtures = fixture_cache.parse_fixtures
+    monkeypatch.setattr(fixture_cache, 'parse_fixtures', None)
+    assert load_fixtures(str(path))[0][1]['name'] == 'capacity factor'
+    monkeypatch.setattr(fixture_cache, 'parse_fixtures', parse_fixtures)
+
+    stale_path = fixture_path(str(path))
+    path.write_text(TESTS.replace('capacity factor', 'edited'))
+    assert load_fixtures(str(path))[0][1]['name'] == 'edited'
+    assert not os.path.exists(stale_path)
+
+
+def test_openfisca_test_reads_the_fixture_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    tests = tmp_path / 'tests'
+    tests.mkdir()
+    shutil.copy(os.path.join(os.path.dirname(__file__), 'conftest.py'), str(tests))
+    (tests / 'capacity.yaml').write_text(TESTS)
+
+    assert run_tests(tax_benefit_system, str(tests), {}) == 0
+    assert os.path.exists(fixture_path(str(tests / 'capacity.yaml')))
+    (tests / 'capacity.yaml').write_text(TESTS.replace('[1, 0.5]', '[1, 0.7]'))
+    assert run_tests(tax_benefit_system, str(tests), {}) != 0
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.forecast import ForecastError, StreamingSummary, forecast_from_spec
+from openfisca_nsw_safeguard.sharding import fork_available
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+SPEC = {
+    'activity': 'HVAC1_PDRSAug24',
+    'period': '2024',
+    'inputs': {
+        'HVAC1_PDRSAug24_PDRS__postcode': {'choice': {'2000': 0.5, '2340': 0.2, '2880': 0.3}},
+        'HVAC1_PDRSAug24_rated_AEER_input': {'normal': [4.6, 0.4], 'clip': [3, 7]},
+        'HVAC1_PDRSAug24_cooling_capacity_input': {'triangular': [2, 7, 20]},
+        'HVAC1_PDRSAug24_Activity': {'choice': ['new_installation_activity', 'replacement_activity']},
+        },
+    }
+
+
+def test_streaming_summary_matches_the_whole_sample():
+    random = np.random.default_rng(0)
+    # Later chunks fall far outside of the bins of the first
+    chunks = [random.normal(100, 10, 1000), random.normal(-5000, 10, 1000), random.integers(0, 20000, 5000)]
+    summary = StreamingSummary()
+    for chunk in chunks:
+        summary.add(chunk)
+    values = np.concatenate(chunks)
+    result = summary.to_json()
+    assert result['count'] == len(values)
+    assert np.isclose(result['mean'], values.mean())
+    assert np.isclose(result['std'], values.std())
+    assert result['min'] == values.min() and result['max'] == values.max()
+    assert sum(result['histogram']['counts']) == len(values)
+    width = summary.histogram.width
+    for q, value in result['quantiles'].items():
+        assert abs(value - np.quantile(values, float(q))) <= width
+
+
+def test_forecast_summarizes_the_sampled_implementations():
+    forecast = forecast_from_spec(tax_benefit_system, SPEC, seed = 5, chunk_size = 40)
+    result = forecast.run(100)
+
+    inputs = {name: [] for name in SPEC['inputs']}
+    for index, size in enumerate((40, 40, 20)):
+        for name, values in forecast.sample_chunk(index, size).items():
+            inputs[name].extend(values.tolist())
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, inputs)
+    for name in ('HVAC1_PDRSAug24_ESC_calculation', 'HVAC1_PDRSAug24_PRC_calculation'):
+        expected = simulation.calculate(name, '2024')
+        assert result['outputs'][name]['sum'] == expected.sum()
+        assert result['outputs'][name]['max'] == expected.max()
+
+    if fork_available():
+        assert forecast.run(100, workers = 2) == result
+    assert forecast_from_spec(tax_benefit_system, SPEC, seed = 6, chunk_size = 40).run(100) != result
+
+
+def test_forecast_rejects_invalid_distributions():
+    spec = dict(SPEC, inputs = {'HVAC1_PDRSAug24_Activity': {'choice': ['refurbishment_activity']}})
+    with pytest.raises(ForecastError, match = 'refurbishment_activity'):
+        forecast_from_spec(tax_benefit_system, spec)
+    spec = dict(SPEC, inputs = {'HVAC1_PDRSAug24_rated_AEER_input': {'poisson': 4}})
+    with pytest.raises(ForecastError, match = 'constant or one of'):
+        forecast_from_spec(tax_benefit_system, spec)
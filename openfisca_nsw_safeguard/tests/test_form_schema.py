@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+
+from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem, form_schema
+from openfisca_nsw_safeguard.caching import CACHE_DIR_ENV
+from openfisca_nsw_safeguard.form_schema import load_form_schemas, schemas_version
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+directory = os.path.join(COUNTRY_DIR, 'variables')
+
+
+def test_form_schemas_are_built_once(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    schemas = load_form_schemas(tax_benefit_system, directory)
+    schema = schemas['activities']['HVAC1_PDRSAug24']
+    sortings = [question['metadata']['sorting'] for question in schema['questions']]
+    assert sortings == sorted(sortings)
+    questions = {question['id']: question for question in schema['questions']}
+    assert questions['HVAC1_PDRSAug24_Air_Conditioner_type']['defaultValue'] == 'non_ducted_split_system'
+    assert 'ducted_split_system' in questions['HVAC1_PDRSAug24_Air_Conditioner_type']['possibleValues']
+    assert [output['id'] for output in schema['outputs']][:2] == [
+        'HVAC1_PDRSAug24_ESC_calculation', 'HVAC1_PDRSAug24_PRC_calculation']
+
+    # Read from the cache rather than built again
+    assert load_form_schemas(None, directory) == schemas
+
+
+def test_form_schema_conditional_requests(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    client = create_app(tax_benefit_system).test_client()
+    response = client.get('/form-schemas/HVAC1_PDRSAug24', headers = {'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['activity'] == 'HVAC1_PDRSAug24'
+
+    response = client.get('/form-schemas/HVAC1_PDRSAug24', headers = {
+        'Accept-Encoding': 'gzip',
+        'If-None-Match': response.headers['ETag'],
+        })
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get('/form-schemas/HVAC1_PDRSAug24')
+    assert 'Content-Encoding' not in response.headers
+    assert response.json['activity'] == 'HVAC1_PDRSAug24'
+    headers = {'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get('/form-schemas/HVAC1_PDRSAug24', headers = headers).status_code == 304
+
+    assert 'HVAC1_PDRSAug24' in client.get('/form-schemas').json['activities']
+    assert client.get('/form-schemas/unknown').status_code == 404
+
+
+def test_form_schemas_are_rebuilt_when_the_parameters_change(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    version = schemas_version(directory)
+    monkeypatch.setattr(form_schema, 'parameters_hash', lambda parameters_directory: 'edited')
+    assert schemas_version(directory) != version
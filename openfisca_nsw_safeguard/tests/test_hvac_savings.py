@@ -0,0 +1,70 @@
+import numpy as np
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def test_fused_savings_match_split_variables():
+    count = 40
+    random = np.random.RandomState(0)
+    inputs = {
+        'HVAC1_PDRSAug24_PDRS__postcode': random.choice([2000, 2340, 2880, 2650], count).tolist(),
+        'HVAC1_PDRSAug24_cooling_capacity_input': random.uniform(1, 80, count).tolist(),
+        'HVAC1_PDRSAug24_heating_capacity_input': (random.uniform(0, 80, count) * (random.rand(count) > 0.2)).tolist(),
+        'HVAC1_PDRSAug24_rated_AEER_input': random.uniform(0, 6, count).tolist(),
+        'HVAC1_PDRSAug24_rated_ACOP_input': random.uniform(0, 6, count).tolist(),
+        'HVAC1_PDRSAug24_residential_TCEC': (random.uniform(0, 2000, count) * (random.rand(count) > 0.5)).tolist(),
+        'HVAC1_PDRSAug24_input_power': random.uniform(0, 10, count).tolist(),
+        'HVAC1_PDRSAug24_Activity': random.choice(['new_installation_activity', 'replacement_activity'], count).tolist(),
+        }
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, inputs)
+
+    annual_energy_savings = simulation.calculate('HVAC1_PDRSAug24_annual_energy_savings', '2024')
+    electricity_savings = simulation.calculate('HVAC1_PDRSAug24_electricity_savings', '2024')
+    assert np.allclose(annual_energy_savings, np.maximum(electricity_savings, 0))
+
+    peak_demand_annual_savings = simulation.calculate('HVAC1_PDRSAug24_peak_demand_annual_savings', '2024')
+    peak_demand_reduction_capacity = simulation.calculate('HVAC1_PDRSAug24_peak_demand_reduction_capacity', '2024')
+    assert np.allclose(peak_demand_annual_savings, np.maximum(peak_demand_reduction_capacity, 0))
+
+
+def test_summary_variables_ignore_the_intermediate_variables_set_as_inputs():
+    count = 10
+    random = np.random.RandomState(1)
+    inputs = {
+        'HVAC1_PDRS__postcode': random.choice([2000, 2340, 2880, 2650], count).tolist(),
+        'HVAC1_cooling_capacity_input': random.uniform(1, 80, count).tolist(),
+        'HVAC1_heating_capacity_input': random.uniform(1, 80, count).tolist(),
+        'HVAC1_rated_AEER_input': random.uniform(1, 6, count).tolist(),
+        'HVAC1_rated_ACOP_input': random.uniform(1, 6, count).tolist(),
+        'HVAC1_input_power': random.uniform(0, 10, count).tolist(),
+        }
+    intermediate_inputs = {
+        name: [1.5] * count for name in [
+            'HVAC1_baseline_AEER_input',
+            'HVAC1_baseline_ACOP_input',
+            'HVAC1_equivalent_cooling_hours_input',
+            'HVAC1_equivalent_heating_hours_input',
+            'HVAC1_PDRS__regional_network_factor',
+            'HVAC1_baseline_peak_adjustment_factor',
+            ]
+        }
+
+    def calculate(inputs):
+        builder = SimulationBuilder()
+        builder.set_default_period('2024')
+        simulation = builder.build_from_variables(tax_benefit_system, inputs)
+        return [simulation.calculate(name, '2024') for name in ['HVAC1_annual_energy_savings', 'HVAC1_peak_demand_annual_savings']]
+
+    annual_energy_savings, peak_demand_annual_savings = calculate(inputs)
+    assert annual_energy_savings.any()
+    overridden = calculate(dict(inputs, **intermediate_inputs))
+    assert np.allclose(overridden[0], annual_energy_savings)
+    # The baseline AEER has always been read from its variable on the PRC side
+    overridden = calculate(dict(inputs, HVAC1_baseline_peak_adjustment_factor = [1.5] * count))
+    assert np.allclose(overridden[1], peak_demand_annual_savings)
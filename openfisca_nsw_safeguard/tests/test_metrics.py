@@ -0,0 +1,82 @@
+import json
+import time
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.metrics import Metrics
+from openfisca_nsw_safeguard.result_cache import ResultCache
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def samples(exposition):
+    return dict(line.rsplit(' ', 1) for line in exposition.splitlines() if not line.startswith('#'))
+
+
+def test_metrics_sum_the_workers_sharing_a_directory(tmp_path):
+    labels = {'route': '/calculate', 'status': '200'}
+    exited_worker = Metrics(directory = str(tmp_path), worker = 'exited')
+    exited_worker.increment('openfisca_http_requests_total', labels, 2)
+    exited_worker.observe('openfisca_http_request_duration_seconds', 0.02, {'route': '/calculate'})
+    exited_worker.flush()
+    worker = Metrics(directory = str(tmp_path))
+    worker.increment('openfisca_http_requests_total', labels)
+    worker.observe('openfisca_http_request_duration_seconds', 3.0, {'route': '/calculate'})
+
+    exposition = worker.exposition()
+    assert '# TYPE openfisca_http_request_duration_seconds histogram' in exposition
+    values = samples(exposition)
+    assert values['openfisca_http_requests_total{route="/calculate",status="200"}'] == '3'
+    assert values['openfisca_http_request_duration_seconds_bucket{route="/calculate",le="0.025"}'] == '1'
+    assert values['openfisca_http_request_duration_seconds_bucket{route="/calculate",le="2.5"}'] == '1'
+    assert values['openfisca_http_request_duration_seconds_bucket{route="/calculate",le="+Inf"}'] == '2'
+    assert values['openfisca_http_request_duration_seconds_count{route="/calculate"}'] == '2'
+    # Only live workers report their memory
+    memory = [key for key in values if key.startswith('openfisca_worker_max_resident_memory_bytes')]
+    assert memory == ['openfisca_worker_max_resident_memory_bytes{{worker="{}"}}'.format(worker.worker)]
+
+
+def test_metrics_are_written_on_a_timer_and_when_stopped(tmp_path):
+    labels = {'route': '/calculate', 'status': '200'}
+    worker = Metrics(directory = str(tmp_path), flush_interval = 0.01, worker = 'timed')
+    worker.start()
+    worker.increment('openfisca_http_requests_total', labels)
+
+    def written():
+        path = tmp_path / 'timed.json'
+        counters = json.loads(path.read_text())['counters'] if path.exists() else []
+        return sum(value for name, _, value in counters if name == 'openfisca_http_requests_total')
+
+    deadline = time.monotonic() + 5
+    while written() < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert written() == 1
+    worker.stop()
+    worker.increment('openfisca_http_requests_total', labels, 2)
+    worker.stop()
+    assert written() == 3
+
+
+def test_web_api_metrics(tmp_path):
+    app = create_app(tax_benefit_system, calculate_cache = ResultCache(max_entries = 10, ttl = 60),
+        metrics = Metrics(directory = str(tmp_path)))
+    client = app.test_client()
+    situation = {
+        'persons': {'person': {}},
+        'buildings': {'building': {
+            'representatives': ['person'],
+            'HVAC1_PDRSAug24_cooling_capacity_input': {'2024': 7.1},
+            'HVAC1_PDRSAug24_PRC_calculation': {'2024': None},
+            }},
+        }
+    for _ in range(2):
+        assert client.post('/calculate', content_type = 'application/json', data = json.dumps(situation)).status_code == 200
+
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain')
+    values = samples(response.data.decode('utf-8'))
+    assert values['openfisca_calculate_variable_requests_total{variable="HVAC1_PDRSAug24_PRC_calculation"}'] == '2'
+    assert values['openfisca_calculate_rows_total{variable="HVAC1_PDRSAug24_PRC_calculation"}'] == '2'
+    assert values['openfisca_http_requests_total{route="/calculate",status="200"}'] == '2'
+    assert values['openfisca_result_cache_hit_ratio'] == '0.5'
+    assert float(next(value for key, value in values.items() if key.startswith('openfisca_parameters_load_seconds'))) > 0
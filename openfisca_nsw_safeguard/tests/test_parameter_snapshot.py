@@ -0,0 +1,58 @@
+import os
+
+from openfisca_nsw_safeguard import caching, parameter_snapshot
+from openfisca_nsw_safeguard.caching import CACHE_DIR_ENV
+
+
+def write_parameter_file(directory, value):
+    with open(os.path.join(directory, 'rate.yaml'), 'w') as f:
+        f.write('description: A rate\nvalues:\n  2020-01-01:\n    value: {}\n'.format(value))
+
+
+def test_parameter_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    parameters_dir = tmp_path / 'parameters'
+    parameters_dir.mkdir()
+    write_parameter_file(str(parameters_dir), 1.5)
+
+    # The first load parses the YAML files and writes the snapshot
+    parameters = parameter_snapshot.load_parameters(str(parameters_dir))
+    digest = parameter_snapshot.parameters_hash(str(parameters_dir))
+    assert parameters('2021-01-01').rate == 1.5
+    assert os.path.exists(parameter_snapshot.snapshot_path(str(parameters_dir), digest))
+
+    # The next one is served from the snapshot
+    assert parameter_snapshot.load_parameters(str(parameters_dir))('2021-01-01').rate == 1.5
+
+    # Editing a parameter file invalidates the snapshot
+    write_parameter_file(str(parameters_dir), 2.5)
+    assert parameter_snapshot.parameters_hash(str(parameters_dir)) != digest
+    assert parameter_snapshot.load_parameters(str(parameters_dir))('2021-01-01').rate == 2.5
+    assert not os.path.exists(parameter_snapshot.snapshot_path(str(parameters_dir), digest))
+
+
+def test_parameter_snapshot_keeps_the_snapshots_of_other_trees(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    directories = [str(tmp_path / name) for name in ('parameters', 'other_parameters')]
+    for directory in directories:
+        os.mkdir(directory)
+        write_parameter_file(directory, 1.5)
+        parameter_snapshot.load_parameters(directory)
+    digests = [parameter_snapshot.parameters_hash(directory) for directory in directories]
+
+    write_parameter_file(directories[0], 2.5)
+    assert parameter_snapshot.load_parameters(directories[0])('2021-01-01').rate == 2.5
+    assert not os.path.exists(parameter_snapshot.snapshot_path(directories[0], digests[0]))
+    assert os.path.exists(parameter_snapshot.snapshot_path(directories[1], digests[1]))
+
+
+def test_parameter_snapshot_is_keyed_by_the_openfisca_core_build(tmp_path, monkeypatch):
+    parameters_dir = tmp_path / 'parameters'
+    parameters_dir.mkdir()
+    write_parameter_file(str(parameters_dir), 1.5)
+    digest = parameter_snapshot.parameters_hash(str(parameters_dir))
+    assert caching.openfisca_core_build() in caching.environment_salt()
+
+    # A new commit of OpenFisca-Core keeps its version string
+    monkeypatch.setattr(caching, 'openfisca_core_build', lambda: 'commit-0123abc')
+    assert parameter_snapshot.parameters_hash(str(parameters_dir)) != digest
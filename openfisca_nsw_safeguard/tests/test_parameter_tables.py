@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from openfisca_core.errors import ParameterNotFoundError
+from openfisca_core.indexed_enums import Enum
+from openfisca_core.tracers import SimpleTracer, TracingParameterNodeAtInstant
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, build_postcode_index, compile_bins, compile_table, postcode_array, postcode_lookup
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def test_compiled_table_matches_fancy_indexing():
+    node = tax_benefit_system.parameters('2024-01-01').ESS.HEER.table_E5_1.residential_savings_factor
+    keys = [
+        np.array(['one_lamp', 'two_lamps', 'three_or_more_lamps']),
+        np.array(['700mm_to_1150mm', '1150mm_to_1350mm', 'over_1500mm']),
+        np.array(['1100_to_1200_lumens', '600_to_1100_lumens', '7300_lumens_or_more']),
+        np.array(['less_than_10W', 'between_20W_and_25W', 'more_than_90W']),
+        ]
+    table = compile_table(node)
+    assert table is compile_table(node)
+    assert table.values.shape == (3, 6, 12, 14)
+    assert list(table.lookup(*keys)) == list(node[keys[0]][keys[1]][keys[2]][keys[3]])
+
+
+def test_compiled_table_unknown_key():
+    table = compile_table(tax_benefit_system.parameters('2024-01-01').ESS.HEER.table_D16_2.AEER)
+    with pytest.raises(ParameterNotFoundError):
+        table.lookup(np.array(['ducted_split_system', 'ducted_split_system']), np.array(['less_than_4kW', '0']))
+
+
+def test_postcode_lookup_matches_calc():
+    parameters = tax_benefit_system.get_parameters_at_instant('2024-01-01')
+    build_postcode_index(parameters)
+    for scale in [
+            parameters.PDRS.table_A24_regional_network_factor,
+            parameters.ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode,
+            ]:
+        assert postcode_array(scale) is postcode_array(scale)
+        postcodes = np.array([0, 2000, 2340, 2880, 9999, 10000, -1])
+        assert list(postcode_lookup(scale, postcodes)) == list(scale.calc(postcodes))
+        assert list(postcode_lookup(scale, postcodes + 0.5)) == list(scale.calc(postcodes + 0.5))
+
+
+def test_traced_nodes_share_the_tables_of_the_nodes_they_wrap():
+    parameters = tax_benefit_system.get_parameters_at_instant('2024-01-01')
+    traced = TracingParameterNodeAtInstant(parameters, SimpleTracer())
+    node = parameters.ESS.HEER.table_D16_2.AEER
+    assert compile_table(traced.ESS.HEER.table_D16_2.AEER) is compile_table(node)
+    postcodes = np.array([2000, 2340, 2880])
+    scale = parameters.PDRS.table_A24_regional_network_factor
+    assert list(postcode_lookup(traced.PDRS.table_A24_regional_network_factor, postcodes)) == list(scale.calc(postcodes))
+
+
+def test_bins_plug_into_compiled_table():
+    parameters = tax_benefit_system.get_parameters_at_instant('2024-01-01')
+    lamp_circuit_power = compile_bins(parameters.ESS.HEER.table_E5_bins.lamp_circuit_power)
+    assert list(lamp_circuit_power.digitize([5, 10, 10.5, 90, 91])) == [0, 0, 1, 12, 13]
+    cooling_capacity = compile_bins(parameters.ESS.HEER.table_D16_bins.cooling_capacity)
+    assert list(cooling_capacity([3.9, 4, 39, 65]).keys()) == ['less_than_4kW', '4kW_to_10kW', '39kW_to_65kW', 'more_than_65kW']
+
+    table = compile_table(parameters.ESS.HEER.table_D16_2.AEER)
+    aircon = np.array(['ducted_split_system'] * 2)
+    assert list(table.lookup(aircon, cooling_capacity([5, 40]))) == \
+        list(table.lookup(aircon, np.array(['4kW_to_10kW', '39kW_to_65kW'])))
+
+    light_output = compile_bins(parameters.ESS.HEER.table_E5_bins.light_output)
+    with pytest.raises(ParameterNotFoundError):
+        compile_table(parameters.ESS.HEER.table_E5_1.residential_savings_factor).lookup(
+            'one_lamp', 'under_550mm', light_output([500]), 'less_than_10W')
+
+
+class AirConditionerType(Enum):
+    ducted_split_system = 'Ducted split system'
+    non_ducted_split_system = 'Non-ducted split system'
+    window_wall = 'Window or wall'
+
+
+def test_enum_keys_index_compiled_table():
+    parameters = tax_benefit_system.get_parameters_at_instant('2024-01-01')
+    aircon_keys = EnumKeys(AirConditionerType, keys = {'window_wall': None}, tables = [('ESS.HEER.table_D16_2.AEER', 0)])
+    aircon_keys.validate(tax_benefit_system.parameters)
+
+    table = compile_table(parameters.ESS.HEER.table_D16_2.AEER)
+    aircon = AirConditionerType.encode(np.array(['ducted_split_system', 'non_ducted_split_system']))
+    capacity = np.array(['less_than_4kW', '4kW_to_10kW'])
+    assert list(table.lookup(aircon_keys(aircon), capacity)) == \
+        list(table.lookup(np.array(['ducted_split_system', 'non_ducted_split_system']), capacity))
+    assert list(aircon_keys.codes(np.array(['Non-ducted split system', 'Portable']))) == [1, -1]
+    with pytest.raises(ParameterNotFoundError):
+        table.lookup(aircon_keys(AirConditionerType.encode(np.array(['window_wall']))), 'less_than_4kW')
+
+    renamed_keys = EnumKeys(AirConditionerType, keys = {'window_wall': 'window_or_wall'}, tables = [('ESS.HEER.table_D16_2.AEER', 0)])
+    with pytest.raises(ValueError, match = 'window_or_wall'):
+        renamed_keys.validate(tax_benefit_system.parameters)
+
+
+def test_tax_benefit_systems_validate_the_enum_keys_of_their_variable_files():
+    first, second = CountryTaxBenefitSystem(lazy_variables = False), CountryTaxBenefitSystem(lazy_variables = False)
+    assert {'HVAC1_AC_Type', 'RF2ProductClass', 'D17_ESSJun24_System_Size'} <= {
+        enum_keys.enum.__name__ for enum_keys in first.validated_enum_keys}
+    # Each executes the variable files again, and checks its own declarations only
+    assert len(second.validated_enum_keys) == len(first.validated_enum_keys)
+    assert not first.validated_enum_keys & second.validated_enum_keys
@@ -0,0 +1,71 @@
+import csv
+import json
+
+import numpy as np
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.batch import run_batch
+from openfisca_nsw_safeguard.profiler import Profile
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def hvac1_simulation(count):
+    simulation = SimulationBuilder().build_default_simulation(tax_benefit_system, count)
+    simulation.set_input('HVAC1_PDRSAug24_PDRS__postcode', '2024', np.resize([2000, 2340, 2880], count))
+    simulation.set_input('HVAC1_PDRSAug24_cooling_capacity_input', '2024', np.linspace(1, 60, count))
+    simulation.set_input('HVAC1_PDRSAug24_rated_AEER_input', '2024', np.full(count, 4.5))
+    return simulation
+
+
+def test_profile_records_formulas_and_parameters():
+    profile = Profile()
+    simulation = profile.attach(hvac1_simulation(50))
+    profiled = simulation.calculate('HVAC1_PDRSAug24_PRC_calculation', '2024')
+    assert np.array_equal(profiled, hvac1_simulation(50).calculate('HVAC1_PDRSAug24_PRC_calculation', '2024'))
+    simulation.calculate('HVAC1_PDRSAug24_PRC_calculation', '2024')
+
+    stats = profile.variables['HVAC1_PDRSAug24_PRC_calculation']
+    assert (stats.calls, stats.computed, stats.rows, stats.bytes) == (2, 1, 50, 200)
+    assert 0 < stats.self_time <= stats.total_time
+    assert profile.variables['HVAC1_PDRSAug24_PDRS__postcode'].computed == 0
+    assert any(name.startswith('PDRS.') for name in profile.parameters)
+
+    lines = profile.collapsed_stacks()
+    assert all(line.startswith('HVAC1_PDRSAug24_PRC_calculation') for line in lines)
+    path, microseconds = lines[-1].rsplit(' ', 1)
+    assert int(microseconds) > 0 and ';' in path
+    assert 'HVAC1_PDRSAug24_PRC_calculation' in profile.report()
+
+
+def test_batch_and_web_api_profiles(tmp_path):
+    input_path = tmp_path / 'installs.csv'
+    with open(input_path, 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['cooling_capacity_input', 'PDRS__postcode'])
+        writer.writerows([[7.1, 2000], [20, 2340], [40, 2880]])
+    profile = Profile()
+    run_batch(tax_benefit_system, 'HVAC1_PDRSAug24', str(input_path), str(tmp_path / 'certificates.csv'),
+        chunk_size = 2, period = '2024', profile = profile)
+    assert profile.variables['HVAC1_PDRSAug24_ESC_calculation'].computed == 2
+    assert profile.variables['HVAC1_PDRSAug24_ESC_calculation'].rows == 3
+    profile.write_collapsed_stacks(str(tmp_path / 'batch.folded'))
+    assert (tmp_path / 'batch.folded').read_text().splitlines() == profile.collapsed_stacks()
+
+    client = create_app(tax_benefit_system, profiling = True).test_client()
+    response = client.post('/profile?limit=5', content_type = 'application/json', data = json.dumps({
+        'persons': {'person': {}},
+        'buildings': {'building': {
+            'representatives': ['person'],
+            'HVAC1_PDRSAug24_cooling_capacity_input': {'2024': 7.1},
+            'HVAC1_PDRSAug24_PDRS__postcode': {'2024': 2000},
+            'HVAC1_PDRSAug24_PRC_calculation': {'2024': None},
+            }},
+        }))
+    assert response.status_code == 200
+    assert len(response.json['variables']) == 5
+    assert response.json['collapsedStacks']
+    assert create_app(tax_benefit_system, profiling = False).test_client().post('/profile').status_code == 404
@@ -0,0 +1,70 @@
+import json
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.result_cache import MemoryStore, ResultCache, canonical_json
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def test_canonical_json_ignores_key_order_and_integral_floats():
+    assert canonical_json('{"b": [1.0, 2.5], "a": {"y": true, "x": null}}') \
+        == canonical_json('{"a": {"x": null, "y": true}, "b": [1, 2.5]}')
+    assert canonical_json('{"a": 1}') != canonical_json('{"a": 1.5}')
+    assert canonical_json('not json') is None
+
+
+def test_memory_store_evicts_least_recently_used_and_expires():
+    now = [0]
+    store = MemoryStore(max_entries = 2, ttl = 10, clock = lambda: now[0])
+    store.set('a', b'1')
+    store.set('b', b'2')
+    assert store.get('a') == b'1'
+    store.set('c', b'3')
+    assert store.get('b') is None
+    assert store.evictions == 1
+    now[0] = 10
+    assert store.get('a') is None
+    assert store.expirations == 1
+
+
+def test_disk_store_is_shared_between_caches(tmp_path):
+    writer = ResultCache(directory = str(tmp_path), version = 'rules')
+    reader = ResultCache(directory = str(tmp_path), version = 'rules')
+    other_rules = ResultCache(directory = str(tmp_path), version = 'other rules')
+    body = '{"buildings": {"b": {"x": {"2024": 1}}}}'
+    writer.set(writer.key(body), b'result')
+    assert reader.get(reader.key(body)) == b'result'
+    assert other_rules.get(other_rules.key(body)) is None
+    assert reader.stats()['hits'] == 1
+
+
+def test_calculate_serves_cached_results():
+    cache = ResultCache(max_entries = 8, ttl = 60)
+    client = create_app(tax_benefit_system, calculate_cache = cache).test_client()
+    situation = {
+        'persons': {'person': {}},
+        'buildings': {
+            'building': {
+                'representatives': ['person'],
+                'HVAC1_PDRSAug24_cooling_capacity_input': {'2024': 10.0},
+                'HVAC1_PDRSAug24_rated_AEER_input': {'2024': 4.5},
+                'HVAC1_PDRSAug24_PDRS__postcode': {'2024': 2000},
+                'HVAC1_PDRSAug24_PRC_calculation': {'2024': None},
+                },
+            },
+        }
+    first = client.post('/calculate', data = json.dumps(situation), content_type = 'application/json')
+    # The same situation, submitted with another key order and an integral float
+    situation['buildings']['building'] = dict(reversed(list(situation['buildings']['building'].items())))
+    situation['buildings']['building']['HVAC1_PDRSAug24_PDRS__postcode'] = {'2024': 2000.0}
+    second = client.post('/calculate', data = json.dumps(situation), content_type = 'application/json')
+
+    assert first.status_code == second.status_code == 200
+    assert (first.headers['X-Cache'], second.headers['X-Cache']) == ('MISS', 'HIT')
+    assert second.get_json() == first.get_json()
+    assert client.get('/calculate/cache').get_json()['hits'] == 1
+
+    invalid = client.post('/calculate', data = '{"buildings": {"building": {}}}', content_type = 'application/json')
+    assert invalid.status_code == 400
+    assert client.get('/calculate/cache').get_json()['entries'] == 1
@@ -0,0 +1,29 @@
+import pytest
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.rule_versions import RuleVersionError, route
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+
+def test_route_refuses_the_dates_whose_commencement_is_not_confirmed(monkeypatch):
+    dates = ['2024-05-20', '2024-07-01', '2024-09-02']
+    assert route(tax_benefit_system.parameters, 'HVAC1', dates[:1]).tolist() == ['HVAC1']
+    with pytest.raises(RuleVersionError, match = 'HVAC1_ESSJun24 on 2024-06-01 is not confirmed'):
+        route(tax_benefit_system.parameters, 'HVAC1', dates)
+
+    for value in tax_benefit_system.parameters.rule_versions.HVAC1.values_list:
+        monkeypatch.setitem(value.metadata, 'commencement_confirmed', True)
+    assert route(tax_benefit_system.parameters, 'HVAC1', dates).tolist() == [
+        'HVAC1', 'HVAC1_ESSJun24', 'HVAC1_PDRSAug24']
+
+
+def test_route_needs_every_implementation_date():
+    with pytest.raises(RuleVersionError, match = 'needs its date'):
+        route(tax_benefit_system.parameters, 'HVAC1', ['2024-05-20', ''])
+
+
+def test_every_rule_version_date_has_a_reference():
+    for family in tax_benefit_system.parameters.rule_versions.children.values():
+        for value in family.values_list:
+            assert value.metadata.get('reference'), (family.name, value.instant_str)
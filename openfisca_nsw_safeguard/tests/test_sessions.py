@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.sessions import SessionError, SessionStore
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+sessions = SessionStore(tax_benefit_system)
+
+
+def expected_outputs(session, inputs):
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, {name: [value] for name, value in inputs.items()})
+    return {name: simulation.calculate(name, '2024').tolist()[0] for name in session.outputs}
+
+
+def test_updates_match_a_simulation_from_scratch():
+    inputs = {
+        'HVAC1_PDRSAug24_cooling_capacity_input': 7.1,
+        'HVAC1_PDRSAug24_rated_AEER_input': 4.5,
+        'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+        }
+    session, outputs = sessions.open('HVAC1_PDRSAug24', period = '2024', inputs = inputs)
+    assert outputs == session.results() == expected_outputs(session, inputs)
+    invalidated = session.invalidated
+
+    inputs['HVAC1_PDRSAug24_PDRS__postcode'] = 2880
+    assert session.update({'HVAC1_PDRSAug24_PDRS__postcode': 2880}) == expected_outputs(session, inputs)
+    # Only what reads the postcode was computed again
+    assert 0 < session.invalidated - invalidated < 20
+
+    assert session.update({'HVAC1_PDRSAug24_rated_AEER_input': None})['HVAC1_PDRSAug24_PRC_calculation'] == 0
+    with pytest.raises(SessionError, match = 'refurbishment_activity'):
+        session.update({'HVAC1_PDRSAug24_Activity': 'refurbishment_activity'})
+
+
+def test_web_api_sessions():
+    now = [0]
+    store = SessionStore(tax_benefit_system, max_sessions = 2, ttl = 60, clock = lambda: now[0], graph = sessions.graph)
+    client = create_app(tax_benefit_system, sessions = store).test_client()
+    response = client.post('/sessions', content_type = 'application/json', data = json.dumps({
+        'activity': 'HVAC1_PDRSAug24',
+        'period': '2024',
+        'inputs': {
+            'HVAC1_PDRSAug24_cooling_capacity_input': 7.1,
+            'HVAC1_PDRSAug24_rated_AEER_input': 4.5,
+            'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+            },
+        }))
+    assert response.status_code == 201
+    session_id = response.json['id']
+    assert response.json['outputs']['HVAC1_PDRSAug24_PRC_calculation'] > 0
+
+    response = client.patch('/sessions/' + session_id, content_type = 'application/json',
+        data = json.dumps({'inputs': {'HVAC1_PDRSAug24_installed_by_qualified_person': False}}))
+    assert response.status_code == 200
+    assert response.json['outputs']['HVAC1_PDRSAug24_installation_replacement_final_activity_eligibility'] is False
+
+    response = client.patch('/sessions/' + session_id, content_type = 'application/json',
+        data = json.dumps({'inputs': {'unknown_variable': 1}}))
+    assert response.status_code == 400
+
+    now[0] = 60
+    assert client.patch('/sessions/' + session_id, content_type = 'application/json', data = '{}').status_code == 404
+    assert client.get('/sessions').json['expirations'] == 1
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.solver import SolverError, solve
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+OUTPUT = 'HVAC1_PDRSAug24_ESC_calculation'
+VARIABLE = 'HVAC1_PDRSAug24_rated_ACOP_input'
+CAPACITIES = [7.1, 12.5, 20.0, 3.0]
+
+
+def esc(capacity, acop):
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, {
+        'HVAC1_PDRSAug24_cooling_capacity_input': capacity,
+        'HVAC1_PDRSAug24_heating_capacity_input': capacity,
+        'HVAC1_PDRSAug24_rated_AEER_input': 4.5,
+        'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+        VARIABLE: acop,
+        })
+    return simulation.calculate(OUTPUT, '2024')[0]
+
+
+def test_solve_finds_the_least_value_reaching_the_target():
+    inputs = {
+        'HVAC1_PDRSAug24_cooling_capacity_input': CAPACITIES,
+        'HVAC1_PDRSAug24_heating_capacity_input': CAPACITIES,
+        'HVAC1_PDRSAug24_rated_AEER_input': 4.5,
+        'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+        }
+    result = solve(tax_benefit_system, OUTPUT, VARIABLE, 20, 0, 10, inputs = inputs, period = '2024', tolerance = 0.01)
+    # Too small to earn 20 ESCs, whatever its ACOP
+    assert result['values'][3] is None
+    for capacity, value, output in zip(CAPACITIES[:3], result['values'], result['outputs']):
+        assert output >= 20
+        assert esc(capacity, value) == output
+        assert esc(capacity, value - 0.01) < 20
+
+
+def test_solve_stops_when_intervals_stop_narrowing():
+    inputs = {
+        'HVAC1_PDRSAug24_cooling_capacity_input': 12.5,
+        'HVAC1_PDRSAug24_heating_capacity_input': 12.5,
+        'HVAC1_PDRSAug24_rated_AEER_input': 4.5,
+        'HVAC1_PDRSAug24_PDRS__postcode': 2000,
+        }
+    with pytest.raises(SolverError, match = 'at least'):
+        solve(tax_benefit_system, OUTPUT, VARIABLE, 20, 0, 10, inputs = inputs, period = '2024', tolerance = 1e-12)
+    value, = solve(tax_benefit_system, OUTPUT, VARIABLE, 20, 0, 10, inputs = inputs, period = '2024', tolerance = 1e-7)['values']
+    # Floats around the value are further apart than the tolerance, so the last rounds cannot narrow the interval
+    result = solve(tax_benefit_system, OUTPUT, VARIABLE, 20, value - 1e-7, value, inputs = inputs, period = '2024',
+        tolerance = 1e-16, max_rounds = 10 ** 6)
+    assert value - 1e-7 < result['values'][0] <= value
+    assert result['outputs'][0] >= 20
+    result = solve(tax_benefit_system, OUTPUT, VARIABLE, 20, 0, 10, inputs = inputs, period = '2024', tolerance = 1e-7, max_rounds = 1)
+    assert value <= result['values'][0] < 10
+    assert result['outputs'][0] >= 20
+
+
+def test_solve_endpoint():
+    assert create_app(tax_benefit_system, solving = False).test_client().post('/solve', json = {}).status_code == 404
+    client = create_app(tax_benefit_system, solving = True).test_client()
+    response = client.post('/solve', content_type = 'application/json', data = json.dumps({
+        'output': 'HVAC1_PDRSAug24_PRC_calculation',
+        'variable': 'HVAC1_PDRSAug24_cooling_capacity_input',
+        'target': 600,
+        'low': 0,
+        'high': 60,
+        'inputs': {'HVAC1_PDRSAug24_rated_AEER_input': 4.5, 'HVAC1_PDRSAug24_PDRS__postcode': 2000},
+        'period': '2024',
+        }))
+    assert response.status_code == 200
+    assert 7 < response.json['values'][0] < 7.2
+    assert response.json['outputs'][0] >= 600
+
+    response = client.post('/solve', content_type = 'application/json', data = json.dumps({'output': OUTPUT}))
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import json
+
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.sweep import sweep
+from openfisca_nsw_safeguard.web_api import create_app
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+OUTPUTS = ['HVAC2_PDRSAug24_ESC_calculation', 'HVAC2_PDRSAug24_PRC_calculation']
+INPUTS = {
+    'HVAC2_PDRSAug24_cooling_capacity_input': 7.1,
+    'HVAC2_PDRSAug24_heating_capacity_input': 6.0,
+    # Replaced by the values of the axis sweeping it
+    'HVAC2_PDRSAug24_rated_AEER_input': 4.5,
+    }
+
+
+def test_sweep_matches_one_simulation_per_combination():
+    result = sweep(tax_benefit_system, OUTPUTS, inputs = INPUTS, period = '2024', axes = [
+        {'variable': 'HVAC2_PDRSAug24_rated_AEER_input', 'range': {'start': 4.0, 'stop': 5.0, 'step': 0.5}},
+        {'variable': 'HVAC2_PDRSAug24_PDRS__postcode', 'values': [2000, 2340, 2880]},
+        {'variable': 'HVAC2_PDRSAug24_Activity', 'all': True},
+        ])
+    assert result['axes'][0]['values'] == [4.0, 4.5, 5.0]
+    assert result['axes'][2]['values'] == ['new_installation_activity', 'replacement_activity']
+    assert result['errors'] == []
+    for i, aeer in enumerate(result['axes'][0]['values']):
+        for j, postcode in enumerate(result['axes'][1]['values']):
+            for k, activity in enumerate(result['axes'][2]['values']):
+                builder = SimulationBuilder()
+                builder.set_default_period('2024')
+                simulation = builder.build_from_variables(tax_benefit_system, dict(INPUTS, **{
+                    'HVAC2_PDRSAug24_rated_AEER_input': aeer,
+                    'HVAC2_PDRSAug24_PDRS__postcode': postcode,
+                    'HVAC2_PDRSAug24_Activity': activity,
+                    }))
+                for name in OUTPUTS:
+                    assert result['outputs'][name][i][j][k] == simulation.calculate(name, '2024')[0]
+
+
+def test_sweep_endpoint_reports_combinations_that_fail():
+    assert create_app(tax_benefit_system, sweeping = False).test_client().post('/sweep', json = {}).status_code == 404
+    client = create_app(tax_benefit_system, sweeping = True).test_client()
+    response = client.post('/sweep', content_type = 'application/json', data = json.dumps({
+        'outputs': OUTPUTS,
+        'inputs': INPUTS,
+        'period': '2024',
+        # 2560 is in climate zone 4, which the activity has no equivalent hours for
+        'axes': [{'variable': 'HVAC2_PDRSAug24_PDRS__postcode', 'values': [2000, 2560, 2880]}],
+        }))
+    assert response.status_code == 200
+    prc = response.json['outputs']['HVAC2_PDRSAug24_PRC_calculation']
+    assert prc[0] > 0 and prc[1] is None and prc[2] > 0
+    assert [error['position'] for error in response.json['errors']] == [[1]]
+
+    response = client.post('/sweep', content_type = 'application/json', data = json.dumps({
+        'outputs': OUTPUTS,
+        'axes': [{'variable': 'HVAC2_PDRSAug24_rated_AEER_input', 'range': {'start': 0, 'stop': 1000, 'step': 0.001}}],
+        }))
+    assert response.status_code == 400
+    assert 'combinations' in response.json['error']
+
+
+def test_sweep_stops_computing_failing_combinations_again():
+    postcodes = {'variable': 'HVAC2_PDRSAug24_PDRS__postcode', 'values': [2000, 2560, 2880, 2560, 2560, 2340]}
+    result = sweep(tax_benefit_system, OUTPUTS, inputs = INPUTS, period = '2024', axes = [postcodes], max_simulations = 3)
+    prc = result['outputs']['HVAC2_PDRSAug24_PRC_calculation']
+    # The grid and its first half fail, and the third simulation computes the first row
+    assert prc[0] > 0 and prc[1:] == [None] * 5
+    assert [error['position'] for error in result['errors']] == [[1], [3]]
+    assert 'too many combinations failed' in result['errors'][0]['error']
@@ -0,0 +1,96 @@
+import pytest
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem, testrun
+from openfisca_nsw_safeguard.caching import CACHE_DIR_ENV
+from openfisca_nsw_safeguard.profiler import Profile
+from openfisca_nsw_safeguard.testrun import (
+    DURATIONS_FILE, YamlTestError, group_cases, load_cases, load_record, plan_shards, run_group, run_tests)
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+CASE = """
+- name: {name}
+  period: 2022
+  absolute_error_margin: 0
+  input:
+    WH1_HP_capacity_factor: [{heat_pump}]
+    WH1_WH_capacity_factor: [20]
+  output:
+    WH1_capacity_factor: [{expected}]
+"""
+
+
+def write_cases(path, cases):
+    path.write_text(''.join(CASE.format(name = name, heat_pump = heat_pump, expected = expected)
+        for name, heat_pump, expected in cases))
+
+
+def test_run_tests_merges_the_failures_of_every_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    tests = tmp_path / 'tests'
+    tests.mkdir()
+    write_cases(tests / 'capacity.yaml', [('smaller', 10, 1), ('larger', 40, 0.5), ('wrong', 10, 0.7)])
+    write_cases(tests / 'other.yaml', [('equal', 20, 1)])
+    (tests / 'broken.yaml').write_text('- name: [unclosed\n')
+
+    report = run_tests(tax_benefit_system, [str(tests)], workers = 2)
+    assert report.counts() == {'passed': 3, 'failed': 1, 'error': 1}
+    failed, = [result for result in report.failures if result.outcome == 'failed']
+    assert (failed.name, failed.line) == ('wrong', 20)
+    assert 'WH1_capacity_factor@2022' in failed.message
+    assert "capacity.yaml:20: FAILED 'wrong'" in report.format()
+    durations = load_record(DURATIONS_FILE)
+    assert durations[str(tests / 'capacity.yaml')]['cases'] == 3
+
+    # Only the failures run again, until fixed
+    write_cases(tests / 'capacity.yaml', [('smaller', 10, 1), ('larger', 40, 0.5), ('wrong', 10, 1)])
+    (tests / 'broken.yaml').unlink()
+    report = run_tests(tax_benefit_system, [str(tests)], workers = 1, failed = True)
+    assert report.counts() == {'passed': 1, 'failed': 0, 'error': 0}
+    assert run_tests(tax_benefit_system, [str(tests)], failed = True).results == []
+
+    shards = plan_shards([str(tests / 'capacity.yaml'), str(tests / 'other.yaml')], {
+        str(tests / 'capacity.yaml'): {'seconds': 9.0, 'cases': 3},
+        str(tests / 'other.yaml'): {'seconds': 1.0, 'cases': 1},
+        }, workers = 2)
+    assert [(shard.start, shard.stop) for shard in shards] == [(0, 1), (1, 2), (2, None), (0, None)]
+
+
+def test_compatible_cases_run_in_one_simulation(tmp_path, monkeypatch):
+    write_cases(tmp_path / 'capacity.yaml', [('smaller', 10, 1), ('larger', 40, 0.5), ('wrong', 10, 0.7)])
+    (tmp_path / 'capacity.yaml').write_text((tmp_path / 'capacity.yaml').read_text() + """
+- name: entities
+  period: 2022
+  input:
+    persons: {person: {}}
+    buildings: {building: {representatives: [person], WH1_HP_capacity_factor: 10, WH1_WH_capacity_factor: 20}}
+  output:
+    WH1_capacity_factor: 1
+""")
+    groups = group_cases(tax_benefit_system, load_cases(str(tmp_path / 'capacity.yaml')))
+    assert [[case.name for case in group] for group in groups] == [['smaller', 'larger', 'wrong'], ['entities']]
+
+    run_alone = []
+    run_case = testrun.run_case
+    monkeypatch.setattr(testrun, 'run_case', lambda *args: run_alone.append(args[1].name) or run_case(*args))
+    outcomes = run_group(tax_benefit_system, groups[0])
+    assert [outcome for outcome, message in outcomes] == ['passed', 'passed', 'failed']
+    assert 'WH1_capacity_factor@2022: [1.] differs from [0.7]' in outcomes[2][1]
+    # Only the failure is confirmed in a simulation of its own
+    assert run_alone == ['wrong']
+
+
+def test_run_tests_profiles_the_calculations_of_the_cases(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    tests = tmp_path / 'tests'
+    tests.mkdir()
+    write_cases(tests / 'capacity.yaml', [('smaller', 10, 1), ('larger', 40, 0.5), ('wrong', 10, 0.7)])
+
+    with pytest.raises(YamlTestError, match = 'single worker'):
+        run_tests(tax_benefit_system, [str(tests)], workers = 2, profile = Profile())
+
+    stacks = tmp_path / 'tests.folded'
+    assert testrun.main([str(tests), '--workers', '1', '--profile', str(stacks)]) == 1
+    # The cases run together, then the failure alone
+    assert 'WH1_capacity_factor' in stacks.read_text()
+    assert 'WH1_capacity_factor' in capsys.readouterr().err
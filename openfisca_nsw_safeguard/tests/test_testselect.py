@@ -0,0 +1,50 @@
+import os
+
+from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.testrun import load_cases, run_case
+from openfisca_nsw_safeguard.testselect import Change, Recorder, changed_lines, impact_of, select
+
+tax_benefit_system = CountryTaxBenefitSystem()
+
+REPOSITORY = os.path.dirname(COUNTRY_DIR)
+NETWORK_FACTOR_TESTS = os.path.join(COUNTRY_DIR, 'tests', 'ESS', 'ESS_general', 'ESS_regional_network_factor.yaml')
+WH1_VARIABLES = 'openfisca_nsw_safeguard/variables/ESS_PDRS_Estimator/WH1/certificate_estimation/WH1_ESC_calculation.py'
+
+
+def test_recorder_records_the_variables_and_parameters_of_a_case():
+    case, = load_cases(NETWORK_FACTOR_TESTS)
+    recorder = Recorder()
+    assert run_case(tax_benefit_system, case, recorder = recorder) == ('passed', '')
+    assert recorder.variables == {'ESS__postcode', 'ESS__regional_network_factor'}
+    # The table is compiled from its whole node
+    assert recorder.read_parameters() == ['ESS.ESS_general.table_A24_regional_network_factor']
+
+
+def test_changes_select_the_cases_exercising_them():
+    assert changed_lines('@@ -3,0 +4,2 @@\n+a\n+b\n@@ -9 +11 @@\n-c\n+d\n') == ([(3, 4), (9, 9)], [(4, 5), (11, 11)])
+
+    def impact(path, lines = None):
+        return impact_of(REPOSITORY, 'HEAD', [Change(path, None, [], lines)])
+
+    changed = impact(WH1_VARIABLES, [(10, 12)])
+    assert (changed.variables, changed.everything) == ({'WH1_capacity_factor'}, set())
+    assert 'WH1_ESC_calculation' in impact(WH1_VARIABLES, [(1, 2)]).variables
+    assert impact('openfisca_nsw_safeguard/parameters/ESS/ESS_general/table_A24_regional_network_factor.yaml').parameters == {
+        'ESS.ESS_general.table_A24_regional_network_factor'}
+    assert impact('openfisca_nsw_safeguard/testrun.py').everything == {'openfisca_nsw_safeguard/testrun.py'}
+    assert not impact('README.md').everything
+
+    impact_map = {
+        'variables': ['WH1_capacity_factor', 'ESS__postcode'],
+        'parameters': ['ESS.ESS_general.table_A24_regional_network_factor.value'],
+        'cases': {os.path.relpath(NETWORK_FACTOR_TESTS, REPOSITORY): [
+            [0, 'network factor', 1, 'passed', [1], [0]],
+            [1, 'capacity factor', 9, 'passed', [0], []],
+            [2, 'broken', 17, 'failed', [1], []],
+            ]},
+        }
+    selection, count = select(impact_map, changed, REPOSITORY, [NETWORK_FACTOR_TESTS, os.path.join(COUNTRY_DIR, 'new.yaml')])
+    # Cases that did not pass, and files not recorded, always run
+    assert selection == {NETWORK_FACTOR_TESTS: [[1, 'capacity factor'], [2, 'broken']], os.path.join(COUNTRY_DIR, 'new.yaml'): None}
+    changed = impact('openfisca_nsw_safeguard/parameters/ESS/ESS_general/table_A24_regional_network_factor.yaml')
+    assert select(impact_map, changed, REPOSITORY, [NETWORK_FACTOR_TESTS])[1] == 2
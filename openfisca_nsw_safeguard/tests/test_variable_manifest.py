@@ -0,0 +1,36 @@
+from openfisca_core.simulation_builder import SimulationBuilder
+
+from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+from openfisca_nsw_safeguard.caching import CACHE_DIR_ENV
+
+
+def calculate(tax_benefit_system, variable_name, inputs):
+    builder = SimulationBuilder()
+    builder.set_default_period('2024')
+    simulation = builder.build_from_variables(tax_benefit_system, inputs)
+    return simulation.calculate(variable_name, '2024')
+
+
+def test_lazy_variables(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    inputs = {
+        'HVAC1_PDRSAug24_PDRS__postcode': [2000, 2800],
+        'HVAC1_PDRSAug24_cooling_capacity_input': [5, 5],
+        'HVAC1_PDRSAug24_rated_AEER_input': [5, 5],
+        'HVAC1_PDRSAug24_heating_capacity_input': [5, 5],
+        'HVAC1_PDRSAug24_rated_ACOP_input': [5, 5],
+        }
+
+    # Without a manifest, every variable is loaded and the manifest is written
+    eager = CountryTaxBenefitSystem(lazy_variables=True)
+    assert eager.variable_files is None
+
+    lazy = CountryTaxBenefitSystem(lazy_variables=True)
+    assert lazy.variables == {}
+    assert list(calculate(lazy, 'HVAC1_PDRSAug24_ESC_calculation', inputs)) == \
+        list(calculate(eager, 'HVAC1_PDRSAug24_ESC_calculation', inputs))
+    assert 'ESS__NABERS_building_type' not in lazy.variables
+    assert 0 < len(lazy.variables) < len(eager.variables)
+
+    lazy.load_all_variables()
+    assert set(lazy.variables) == set(eager.variables)
@@ -0,0 +1,545 @@
+""" Selection of the YAML test cases a change can affect.
+
+    Most changes touch one activity, a few formulas or a parameter table,
+    but the whole suite runs to check them. An impact map lists, for every
+    test case, the variables it calculates and the parameters its formulas
+    read, as recorded by a traced run of the suite. Given the changes of the
+    working tree since a git revision, only the cases exercising a changed
+    variable or parameter run:
+
+    Example::
+        # once, then whenever the map gets old
+        python -m openfisca_nsw_safeguard.testselect --record
+        # on a branch
+        python -m openfisca_nsw_safeguard.testselect --since origin/main
+
+    A changed variable file changes the variables whose class the diff
+    touches, or all of its variables if it touches the rest of the module,
+    such as an enum or a helper, and the variables of the files importing
+    it. A changed parameter file changes every parameter under its path,
+    and a changed test file runs all of its cases. Changes to the modules
+    loading the tax and benefit system, to the test harness or to the
+    packaging run every case, and changes to other files, e.g. the web API
+    or the documentation, none.
+
+    A formula may read new variables since the map was recorded, so the
+    changes since the commit it was recorded at are selected too. Cases not
+    in the map, or that did not pass when it was recorded, always run.
+"""
+
+import argparse
+import ast
+import collections
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+from openfisca_core.parameters import ParameterNodeAtInstant, VectorialParameterNodeAtInstant
+from openfisca_core.tracers import SimpleTracer, TracingParameterNodeAtInstant
+
+from openfisca_nsw_safeguard.caching import cache_directory, write_atomic
+from openfisca_nsw_safeguard.dependency_graph import _is_variable_class
+from openfisca_nsw_safeguard.sharding import available_cpus, map_ordered
+from openfisca_nsw_safeguard.testrun import (
+    DURATIONS_FILE, YamlTestError, list_test_files, load_cases, load_record, plan_shards, run_case, run_tests)
+
+log = logging.getLogger(__name__)
+
+IMPACT_MAP_FILE = 'impact-map.json'
+IMPACT_MAP_FORMAT = 1
+PACKAGE = 'openfisca_nsw_safeguard'
+# Modules running the tests, rather than computing what they test
+HARNESS_MODULES = (
+    'openfisca_nsw_safeguard.fixture_cache',
+    'openfisca_nsw_safeguard.testrun',
+    'openfisca_nsw_safeguard.testselect',
+    'openfisca_nsw_safeguard.tests.conftest',
+    )
+PACKAGING_FILES = re.compile(r'^(setup\.py|setup\.cfg|pyproject\.toml|requirements[^/]*\.txt)$')
+DOCUMENTATION_EXTENSIONS = ('.md', '.rst', '.txt')
+HUNK = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class SelectionError(ValueError):
+    pass
+
+
+class Recorder:
+    """ Records the variables a simulation calculates and the parameters its
+        formulas read.
+    """
+
+    def __init__(self):
+        self.variables = set()
+        self.parameters = set()
+
+    def attach(self, simulation):
+        tracer = RecordingTracer(self)
+        simulation.trace = True
+        simulation.tracer = tracer
+        get_parameters_at_instant = simulation.tax_benefit_system.get_parameters_at_instant
+        simulation.trace_parameters_at_instant = lambda instant: RecordingParameterNodeAtInstant(
+            get_parameters_at_instant(instant), tracer)
+        return simulation
+
+    def read_parameters(self):
+        """ The parameters read, without the nodes only read on the way to
+            their children.
+        """
+        return sorted(
+            name for name in self.parameters
+            if not any(other.startswith(name + '.') for other in self.parameters)
+            )
+
+
+class RecordingTracer(SimpleTracer):
+
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def record_calculation_start(self, variable, period):
+        self.recorder.variables.add(variable)
+        super().record_calculation_start(variable, period)
+
+    def record_parameter_read(self, name):
+        self.recorder.parameters.add(name)
+
+
+class RecordingParameterNodeAtInstant(TracingParameterNodeAtInstant):
+    """ Parameters as formulas read them, recording the name of every node
+        and value read, as nodes may be read whole, e.g. by `compile_table`.
+    """
+
+    def get_traced_child(self, child, key):
+        node = self.parameter_node_at_instant
+        if isinstance(child, (ParameterNodeAtInstant, VectorialParameterNodeAtInstant)):
+            self.tracer.record_parameter_read(child._name)
+            return RecordingParameterNodeAtInstant(child, self.tracer)
+        if isinstance(key, str) and not isinstance(node, VectorialParameterNodeAtInstant):
+            self.tracer.record_parameter_read('{}.{}'.format(node._name, key))
+        else:
+            self.tracer.record_parameter_read(node._name)
+        return child
+
+
+def git(repository, *args):
+    try:
+        return subprocess.run(
+            ['git', '-C', repository] + list(args),
+            check = True, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+            ).stdout.decode('utf-8', 'replace')
+    except (OSError, subprocess.CalledProcessError) as error:
+        raise SelectionError('git {} failed: {}'.format(' '.join(args), getattr(error, 'stderr', b'').decode('utf-8', 'replace').strip() or error))
+
+
+def repository_of(path):
+    return git(path, 'rev-parse', '--show-toplevel').strip()
+
+
+def record_impact_map(tax_benefit_system, paths, repository, workers = None):
+    """ Runs every case of the YAML tests of `paths`, recording what it
+        exercises. Returns the impact map.
+    """
+    workers = workers or available_cpus()
+    files = list_test_files(paths)
+    shards = plan_shards(files, load_record(DURATIONS_FILE), workers)
+
+    def record(shard):
+        try:
+            cases = load_cases(shard.path)[shard.start:shard.stop]
+        except (OSError, YamlTestError):
+            return shard.path, []
+        entries = []
+        for case in cases:
+            recorder = Recorder()
+            outcome, message = run_case(tax_benefit_system, case, recorder = recorder)
+            entries.append([case.index, case.name, case.line, outcome, sorted(recorder.variables), recorder.read_parameters()])
+        return shard.path, entries
+
+    names = {'variables': {}, 'parameters': {}}
+    cases = collections.defaultdict(list)
+    for path, entries in map_ordered(record, shards, workers = max(1, min(workers, len(shards))), max_pending = len(shards)):
+        for index, name, line, outcome, variables, parameters in entries:
+            cases[os.path.relpath(path, repository)].append([
+                index, name, line, outcome,
+                [names['variables'].setdefault(variable, len(names['variables'])) for variable in variables],
+                [names['parameters'].setdefault(parameter, len(names['parameters'])) for parameter in parameters],
+                ])
+    return {
+        'format': IMPACT_MAP_FORMAT,
+        'commit': git(repository, 'rev-parse', 'HEAD').strip(),
+        'variables': list(names['variables']),
+        'parameters': list(names['parameters']),
+        'cases': {path: sorted(entries) for path, entries in sorted(cases.items())},
+        }
+
+
+def impact_map_path():
+    return os.path.join(cache_directory('tests'), IMPACT_MAP_FILE)
+
+
+def save_impact_map(impact_map, path = None):
+    write_atomic(path or impact_map_path(), json.dumps(impact_map, sort_keys = True).encode('utf-8'))
+
+
+def load_impact_map(path = None):
+    try:
+        with open(path or impact_map_path(), 'rb') as f:
+            impact_map = json.loads(f.read().decode('utf-8'))
+    except (OSError, ValueError):
+        raise SelectionError('No impact map, record one with --record.')
+    if impact_map.get('format') != IMPACT_MAP_FORMAT:
+        raise SelectionError('The impact map has an old format, record it again with --record.')
+    return impact_map
+
+
+Change = collections.namedtuple('Change', ['path', 'old_path', 'old_lines', 'new_lines'])
+
+
+def changes_since(repository, revision):
+    """ The files of the working tree that differ from `revision`, with the
+        ranges of lines changed on either side, None for a whole file.
+    """
+    output = git(repository, 'diff', '--name-status', '-z', '-M', revision, '--').split('\0')
+    changes = []
+    index = 0
+    while index < len(output) - 1:
+        status = output[index]
+        if status[0] in 'RC':
+            old_path, path = output[index + 1:index + 3]
+            index += 3
+        else:
+            old_path = path = output[index + 1]
+            index += 2
+        if status[0] == 'A':
+            changes.append(Change(path, None, [], None))
+        elif status[0] == 'D':
+            changes.append(Change(path, path, None, []))
+        elif path.endswith('.py'):
+            old_lines, new_lines = changed_lines(git(repository, 'diff', '-U0', '-M', revision, '--', old_path, path))
+            changes.append(Change(path, old_path, old_lines, new_lines))
+        else:
+            changes.append(Change(path, old_path, None, None))
+    untracked = git(repository, 'ls-files', '--others', '--exclude-standard', '-z').split('\0')
+    changes.extend(Change(path, None, [], None) for path in untracked if path)
+    return changes
+
+
+def changed_lines(diff):
+    """ The ranges of lines changed by `diff` in the old and new files. A
+        range of no lines, as deleted on one side, is the two lines around.
+    """
+    old_lines, new_lines = [], []
+    for line in diff.splitlines():
+        match = HUNK.match(line)
+        if match is None:
+            continue
+        for lines, start, count in ((old_lines, match.group(1), match.group(2)), (new_lines, match.group(3), match.group(4))):
+            start, count = int(start), 1 if count is None else int(count)
+            lines.append((start, start + 1) if count == 0 else (start, start + count - 1))
+    return old_lines, new_lines
+
+
+def module_spans(source):
+    """ The lines of each statement of a module, named after the variable
+        it defines if it is a variable class.
+    """
+    spans = []
+    for node in ast.parse(source).body:
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+        name = node.name if isinstance(node, ast.ClassDef) and _is_variable_class(node) else None
+        spans.append((start, node.end_lineno, name))
+    return spans
+
+
+def changed_definitions(source, lines):
+    """ The variables defined in `source` whose definition `lines` touch,
+        and whether they touch the rest of the module.
+    """
+    try:
+        spans = module_spans(source)
+    except SyntaxError:
+        return set(), True
+    variables, module = set(), False
+    for start, end, name in spans:
+        if lines is None or any(first <= end and last >= start for first, last in lines):
+            if name is None:
+                module = True
+            else:
+                variables.add(name)
+    return variables, module
+
+
+def module_name(path):
+    """ The name of the module of the file at `path`, relative to the
+        repository, None if it cannot be imported.
+    """
+    parts = os.path.splitext(path)[0].split('/')
+    if parts[-1] == '__init__':
+        parts.pop()
+    name = '.'.join(parts)
+    return name if all(part.isidentifier() for part in parts) else None
+
+
+class PackageModules:
+    """ The Python files of the package, the variables each defines, and the
+        files importing each.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.variables = {}
+        self.importers = collections.defaultdict(set)
+        self.files = {}
+        package = os.path.join(repository, PACKAGE)
+        for root, dirs, files in os.walk(package):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+            for file_name in sorted(files):
+                if file_name.endswith('.py'):
+                    path = os.path.relpath(os.path.join(root, file_name), repository).replace(os.sep, '/')
+                    name = module_name(path)
+                    if name is not None:
+                        self.files[name] = path
+        for root, dirs, files in os.walk(package):
+            for file_name in files:
+                if file_name.endswith('.py'):
+                    self._parse(os.path.relpath(os.path.join(root, file_name), repository).replace(os.sep, '/'))
+
+    def _parse(self, path):
+        try:
+            with open(os.path.join(self.repository, path), 'rb') as f:
+                module = ast.parse(f.read())
+        except (OSError, SyntaxError):
+            return
+        self.variables[path] = {node.name for node in module.body if isinstance(node, ast.ClassDef) and _is_variable_class(node)}
+        package = os.path.dirname(path).replace('/', '.')
+        for node in ast.walk(module):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ''
+                if node.level:
+                    base = '.'.join(package.split('.')[:len(package.split('.')) - node.level + 1] + ([base] if base else []))
+                names = [base] + ['{}.{}'.format(base, alias.name) for alias in node.names]
+            else:
+                continue
+            for name in names:
+                if name in self.files:
+                    self.importers[self.files[name]].add(path)
+
+    def importing(self, path):
+        """ The files importing the file at `path`, directly or not.
+        """
+        found, pending = set(), [path]
+        while pending:
+            for importer in self.importers.get(pending.pop(), ()):
+                if importer not in found:
+                    found.add(importer)
+                    pending.append(importer)
+        return found
+
+    def loading(self):
+        """ The files the package imports as it loads, but its variables.
+        """
+        found, pending = set(), [self.files[PACKAGE]]
+        imported = collections.defaultdict(set)
+        for path, importers in self.importers.items():
+            for importer in importers:
+                imported[importer].add(path)
+        while pending:
+            path = pending.pop()
+            if path not in found:
+                found.add(path)
+                pending.extend(imported.get(path, ()))
+        return found
+
+
+class Impact:
+    """ What changes affect: variables, parameter paths and test files, or
+        every test, for the reasons in `everything`.
+    """
+
+    def __init__(self):
+        self.variables = set()
+        self.parameters = set()
+        self.test_files = set()
+        self.everything = set()
+
+    def describe(self):
+        if self.everything:
+            return 'every case, as {} changed'.format(', '.join(sorted(self.everything)))
+        return '{} variables, {} parameters and {} test files changed'.format(
+            len(self.variables), len(self.parameters), len(self.test_files))
+
+
+def impact_of(repository, revision, changes, modules = None):
+    """ The `Impact` of the `changes` of the working tree since `revision`.
+    """
+    modules = modules or PackageModules(repository)
+    loading = modules.loading()
+    harness = {modules.files.get(name) for name in HARNESS_MODULES}
+    impact = Impact()
+    for change in changes:
+        for path, lines, read in ((change.path, change.new_lines, _read), (change.old_path, change.old_lines, _show)):
+            if path is None:
+                continue
+            # Only the modules are parsed, other files change as a whole
+            source = read(repository, revision, path) if path.endswith('.py') else b''
+            if source is not None:
+                _add_impact(impact, modules, loading, harness, path, lines, source)
+    return impact
+
+
+def _add_impact(impact, modules, loading, harness, path, lines, source):
+    package_path = PACKAGE + '/'
+    if not path.startswith(package_path):
+        if PACKAGING_FILES.match(path):
+            impact.everything.add(path)
+        return
+    relative = path[len(package_path):]
+    if relative.startswith('parameters/'):
+        if os.path.splitext(path)[1] in ('.yaml', '.yml'):
+            parts = os.path.splitext(relative)[0].split('/')[1:]
+            if parts[-1] == 'index':
+                parts.pop()
+            impact.parameters.add('.'.join(parts))
+        return
+    if relative.startswith('tests/') and not path.endswith('.py'):
+        if os.path.splitext(path)[1] in ('.yaml', '.yml'):
+            impact.test_files.add(path)
+        return
+    if not path.endswith('.py'):
+        if not path.endswith(DOCUMENTATION_EXTENSIONS):
+            impact.everything.add(path)
+        return
+    if path in loading or path in harness:
+        impact.everything.add(path)
+        return
+    variables, module = changed_definitions(source, lines)
+    impact.variables |= variables
+    if module:
+        impact.variables |= modules.variables.get(path, set())
+    importers = modules.importing(path)
+    if importers & loading:
+        impact.everything.add(path)
+    for importer in importers:
+        impact.variables |= modules.variables.get(importer, set())
+
+
+def _read(repository, revision, path):
+    try:
+        with open(os.path.join(repository, path), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _show(repository, revision, path):
+    try:
+        return git(repository, 'show', '{}:{}'.format(revision, path)).encode('utf-8')
+    except SelectionError:
+        return None
+
+
+def select(impact_map, impact, repository, files):
+    """ The cases of the test `files` affected by `impact`, as a selection of
+        `run_tests`, and their number.
+    """
+    variables = {index for index, name in enumerate(impact_map['variables']) if name in impact.variables}
+    parameters = {
+        index for index, name in enumerate(impact_map['parameters'])
+        if any(name == changed or name.startswith(changed + '.') or changed.startswith(name + '.') for changed in impact.parameters)
+        }
+    selection, count = {}, 0
+    for path in files:
+        relative = os.path.relpath(path, repository)
+        entries = impact_map['cases'].get(relative)
+        if entries is None or relative in impact.test_files:
+            selection[path] = None
+            continue
+        selected = [
+            [index, name] for index, name, line, outcome, case_variables, case_parameters in entries
+            if outcome != 'passed' or variables.intersection(case_variables) or parameters.intersection(case_parameters)
+            ]
+        if selected:
+            selection[path] = selected
+            count += len(selected)
+    return selection, count
+
+
+def main(args = None):
+    from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+
+    parser = argparse.ArgumentParser(
+        prog = 'python -m openfisca_nsw_safeguard.testselect',
+        description = 'Runs the YAML test cases affected by the changes since a git revision.',
+        )
+    parser.add_argument('paths', nargs = '*', default = [os.path.join(COUNTRY_DIR, 'tests')],
+        help = 'test files or directories, the tests of the package by default')
+    action = parser.add_mutually_exclusive_group(required = True)
+    action.add_argument('--since', metavar = 'REVISION', help = 'run the cases affected by the changes since REVISION, e.g. origin/main')
+    action.add_argument('--record', action = 'store_true', help = 'run every case to record the impact map')
+    parser.add_argument('--list', action = 'store_true', help = 'list the cases affected rather than run them')
+    parser.add_argument('--map', metavar = 'PATH', help = 'impact map to read or record, in the package cache by default')
+    parser.add_argument('--workers', type = int, default = 0, help = 'processes running tests, 0 for one per CPU')
+    parser.add_argument('-v', '--verbose', action = 'store_true', help = 'log progress')
+    args = parser.parse_args(args)
+    logging.basicConfig(level = logging.INFO if args.verbose else logging.WARNING, stream = sys.stderr)
+    if args.workers < 0:
+        parser.error('--workers must be positive, or 0')
+
+    try:
+        repository = repository_of(COUNTRY_DIR)
+        if args.record:
+            start = time.perf_counter()
+            impact_map = record_impact_map(CountryTaxBenefitSystem(), args.paths, repository, workers = args.workers)
+            save_impact_map(impact_map, args.map)
+            print('Recorded the impact map of {} cases in {:.1f}s.'.format(  # noqa: T001
+                sum(len(entries) for entries in impact_map['cases'].values()), time.perf_counter() - start))
+            return 0
+
+        impact_map = load_impact_map(args.map)
+        base = git(repository, 'merge-base', args.since, 'HEAD').strip()
+        changes = changes_since(repository, base)
+        try:
+            git(repository, 'cat-file', '-e', impact_map['commit'] + '^{commit}')
+        except SelectionError:
+            raise SelectionError('The impact map was recorded at an unknown commit, record it again with --record.')
+        recorded_changes = changes_since(repository, impact_map['commit'])
+        modules = PackageModules(repository)
+        impact = impact_of(repository, base, changes, modules)
+        since_recorded = impact_of(repository, impact_map['commit'], recorded_changes, modules)
+        impact.variables |= since_recorded.variables
+        impact.parameters |= since_recorded.parameters
+        impact.test_files |= since_recorded.test_files
+        impact.everything |= since_recorded.everything
+        files = list_test_files(args.paths)
+        selection, count = (None, None) if impact.everything else select(impact_map, impact, repository, files)
+    except (SelectionError, YamlTestError) as error:
+        parser.exit(1, 'error: {}\n'.format(error))
+    print('Running {}: {}.'.format(  # noqa: T001
+        impact.describe(),
+        'every case' if selection is None else '{} files whole and {} cases of others'.format(
+            sum(1 for cases in selection.values() if cases is None), count),
+        ), file = sys.stderr)
+    if args.list:
+        for path in files:
+            if selection is None or path in selection:
+                cases = load_cases(path)
+                chosen = {tuple(pair) for pair in selection[path]} if selection is not None and selection[path] is not None else None
+                for case in cases:
+                    if chosen is None or (case.index, case.name) in chosen:
+                        print('{}:{}: {}'.format(os.path.relpath(path), case.line, case.name))  # noqa: T001
+        return 0
+    report = run_tests(CountryTaxBenefitSystem(), args.paths, workers = args.workers, selection = selection)
+    print(report.format())  # noqa: T001
+    return 1 if report.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
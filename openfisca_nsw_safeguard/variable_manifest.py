@@ -0,0 +1,122 @@
+""" Manifest of the variables defined under `variables/`.
+
+    The manifest maps every variable name to the file defining it. It lets
+    `CountryTaxBenefitSystem(lazy_variables=True)` register variables lazily:
+    a variable file is only imported when one of its variables is first
+    requested, so a batch computing `HVAC1_PDRSAug24_ESC_calculation` never
+    imports the NABERS or SoNA variables.
+
+    The manifest is generated from an eagerly loaded tax and benefit system
+    and cached on disk, keyed by a hash of every variable file. A missing or
+    stale manifest makes the lazy tax and benefit system load every variable
+    once, and write the manifest for the next start up.
+
+    Example::
+        # build step
+        python -m openfisca_nsw_safeguard.variable_manifest
+
+        # batch job
+        tax_benefit_system = CountryTaxBenefitSystem(lazy_variables=True)
+
+    Lazy registration can also be turned on with
+    `OPENFISCA_NSW_SAFEGUARD_LAZY_VARIABLES=1`. It is not meant for the web
+    API, which lists every variable: call `load_all_variables()` first.
+"""
+
+import json
+import logging
+import os
+import sys
+
+from openfisca_nsw_safeguard.caching import cache_directory, content_hash, write_atomic
+
+log = logging.getLogger(__name__)
+
+LAZY_VARIABLES_ENV = 'OPENFISCA_NSW_SAFEGUARD_LAZY_VARIABLES'
+MANIFEST_FORMAT = 1
+
+
+def lazy_variables_enabled():
+    return os.environ.get(LAZY_VARIABLES_ENV, '0').lower() in ('1', 'true', 'yes')
+
+
+def list_variable_files(directory):
+    """ Lists the files `add_variables_from_directory` would load.
+    """
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        found.extend(os.path.join(root, name) for name in files
+                     if name.endswith('.py') and not name.startswith('.'))
+    return sorted(found)
+
+
+def variables_hash(directory):
+    salt = 'variable-manifest-{}'.format(MANIFEST_FORMAT)
+    return content_hash(list_variable_files(directory), root=directory, salt=salt)
+
+
+def manifest_path(digest):
+    return os.path.join(cache_directory('manifests'), 'variables-{}.json'.format(digest))
+
+
+def variable_file(variable):
+    """ Path of the file a loaded variable was defined in.
+    """
+    module = sys.modules.get(type(variable).__module__)
+    return getattr(module, '__file__', None)
+
+
+def build_manifest(tax_benefit_system, directory):
+    """ Maps the name of every variable of `tax_benefit_system` defined under
+        `directory` to the path of its file, relative to `directory`.
+    """
+    directory = os.path.abspath(directory)
+    manifest = {}
+    for name, variable in tax_benefit_system.variables.items():
+        path = variable_file(variable)
+        if path and os.path.abspath(path).startswith(directory + os.sep):
+            manifest[name] = os.path.relpath(os.path.abspath(path), directory).replace(os.sep, '/')
+    return manifest
+
+
+def write_manifest(tax_benefit_system, directory):
+    """ Writes the manifest of the variables of `tax_benefit_system` defined
+        under `directory`. Returns its path, or None if it cannot be written.
+    """
+    manifest = build_manifest(tax_benefit_system, directory)
+    try:
+        path = manifest_path(variables_hash(directory))
+        write_atomic(path, json.dumps({'variables': manifest}, indent=1, sort_keys=True).encode('utf-8'))
+    except OSError:
+        log.warning('Unable to write the variable manifest.', exc_info=True)
+        return None
+    return path
+
+
+def load_manifest(directory):
+    """ Returns the manifest of `directory` with absolute file paths, or None
+        if it has not been built for the current variable files.
+    """
+    try:
+        path = manifest_path(variables_hash(directory))
+        with open(path, 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))['variables']
+    except (OSError, ValueError, KeyError):
+        return None
+    return {
+        name: os.path.join(directory, *relative_path.split('/'))
+        for name, relative_path in manifest.items()
+        }
+
+
+def main():
+    from openfisca_nsw_safeguard import COUNTRY_DIR, CountryTaxBenefitSystem
+
+    directory = os.path.join(COUNTRY_DIR, 'variables')
+    tax_benefit_system = CountryTaxBenefitSystem(lazy_variables=False)
+    print(write_manifest(tax_benefit_system, directory))  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for BESS1 PRC Calculation
@@ -60,4 +61,4 @@ class BESS1_V5Nov24_get_network_loss_factor_by_postcode(Variable):
         postcode = building('BESS1_V5Nov24_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
+        return postcode_lookup(network_loss_factor, postcode)
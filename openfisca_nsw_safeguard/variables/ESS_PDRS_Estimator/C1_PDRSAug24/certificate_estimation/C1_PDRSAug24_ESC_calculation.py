@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class C1_PDRSAug24_number_of_refrigerator_freezers_removal(Variable):
@@ -50,7 +51,7 @@ class C1_PDRSAug24_energy_savings(Variable):
       #regional network factor
       postcode = buildings('C1_PDRSAug24_PDRS__postcode', period)
       rnf = parameters(period).PDRS.table_A24_regional_network_factor
-      regional_network_factor = rnf.calc(postcode) 
+      regional_network_factor = postcode_lookup(rnf, postcode) 
    
       #electricity savings
       annual_energy_savings = deemed_electricity_savings * regional_network_factor
@@ -81,7 +82,7 @@ class C1_PDRSAug24_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('C1_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode) 
+        return postcode_lookup(rnf, postcode) 
 
 
 class C1_PDRSAug24_electricity_savings(Variable):
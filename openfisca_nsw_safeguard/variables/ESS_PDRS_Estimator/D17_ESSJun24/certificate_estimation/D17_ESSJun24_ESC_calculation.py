@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_table, postcode_lookup
 
 
 class D17_ESSJun24_deemed_activity_electricity_savings(Variable):
@@ -43,6 +44,12 @@ class D17_ESSJun24_System_Size(Enum):
     system_size_medium = 'medium'
 
 
+D17_ESSJUN24_SYSTEM_SIZE_KEYS = EnumKeys(D17_ESSJun24_System_Size, keys = {
+    'system_size_small': 'small',
+    'system_size_medium': 'medium',
+    }, tables = [('ESS.HEER.table_D17_1_ESSJun24.baseline_energy_consumption', 1)])
+
+
 class D17_ESSJun24_system_size_savings(Variable):
     value_type = Enum
     entity = Building
@@ -69,20 +76,12 @@ class D17_ESSJun24_annual_energy_savings(Variable):
     def formula(buildings, period, parameters):
         #system size
         system_size = buildings('D17_ESSJun24_system_size', period)
-        system_size_int = np.select(
-            [
-                (system_size == D17_ESSJun24_System_Size.system_size_small),
-                (system_size == D17_ESSJun24_System_Size.system_size_medium)
-            ],
-            [
-                'small',
-                'medium'
-            ])
+        system_size_int = D17_ESSJUN24_SYSTEM_SIZE_KEYS(system_size)
         
         #climate zone
         postcode = buildings('D17_ESSJun24_PDRS__postcode', period)
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
 
         #heat pump zone
         heat_pump_zone = parameters(period).ESS.ESS_general.heat_pump_zone_by_BCA_climate_zone
@@ -98,11 +97,14 @@ class D17_ESSJun24_annual_energy_savings(Variable):
                 'heat_pump_zone_5'
             ])
 
+        baseline_energy_consumption = compile_table(
+            parameters(period).ESS.HEER.table_D17_1_ESSJun24.baseline_energy_consumption)
+
         #Baseline A
-        Baseline_A = parameters(period).ESS.HEER.table_D17_1_ESSJun24['baseline_energy_consumption'][heat_pump_zone_str][system_size_int]['Baseline_A']
+        Baseline_A = baseline_energy_consumption.lookup(heat_pump_zone_str, system_size_int, 'Baseline_A')
         
         #adjustment coefficient
-        a = parameters(period).ESS.HEER.table_D17_1_ESSJun24['baseline_energy_consumption'][heat_pump_zone_str][system_size_int]['adjustment_coefficient']
+        a = baseline_energy_consumption.lookup(heat_pump_zone_str, system_size_int, 'adjustment_coefficient')
 
         #Deemed electricity savings
         Bs = buildings('D17_ESSJun24_Bs', period)
@@ -125,7 +127,7 @@ class D17_ESSJun24_annual_energy_savings(Variable):
 
         #regional network factor
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         annual_energy_savings = electricity_savings * regional_network_factor
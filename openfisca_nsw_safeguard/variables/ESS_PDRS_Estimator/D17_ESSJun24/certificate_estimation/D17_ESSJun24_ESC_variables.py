@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_table, postcode_lookup
 
 
 """ Parameters for D17 ESC Calculation
@@ -35,7 +36,7 @@ class D17_ESSJun24_BCA_climate_zone_by_postcode(Variable):
         postcode = buildings('D17_ESSJun24_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         BCA_climate_zone_to_check = np.select(
             [
                 climate_zone_int == 1,
@@ -73,7 +74,7 @@ class D17_ESSJun24_BCA_climate_zone_by_postcode_int(Variable):
         postcode = buildings('D17_ESSJun24_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
 
         return climate_zone_int
     
@@ -100,7 +101,7 @@ class D17_ESSJun24_regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('D17_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)
+        return postcode_lookup(rnf, postcode)
 
 
 class D17_ESSJun24_replacement_activity(Variable):
@@ -121,6 +122,12 @@ class D17_ESSJun24_System_Size(Enum):
     system_size_medium = 'Medium'
 
 
+D17_ESSJUN24_SYSTEM_SIZE_KEYS = EnumKeys(D17_ESSJun24_System_Size, keys = {
+    'system_size_small': 'small',
+    'system_size_medium': 'medium',
+    }, tables = [('ESS.HEER.table_D17_1_ESSJun24.baseline_energy_consumption', 1)])
+
+
 class D17_ESSJun24_system_size(Variable):
     value_type = Enum
     entity = Building
@@ -142,17 +149,7 @@ class D17_ESSJun24_system_size_int(Variable):
 
     def formula(buildings, period, parameters):
         system_size = buildings('D17_ESSJun24_system_size', period)
-        system_size_int = np.select(
-            [
-                (system_size == D17_ESSJun24_System_Size.system_size_small),
-                (system_size == D17_ESSJun24_System_Size.system_size_medium)
-            ],
-            [
-                'small',
-                'medium'
-            ])
-        
-        return system_size_int
+        return D17_ESSJUN24_SYSTEM_SIZE_KEYS(system_size).keys()
 
 
 class D17_ESSJun24_Baseline_A(Variable):
@@ -174,7 +171,9 @@ class D17_ESSJun24_Baseline_A(Variable):
                 'heat_pump_zone_5'
             ])
         
-        Baseline_A = parameters(period).ESS.HEER.table_D17_1_ESSJun24['baseline_energy_consumption'][heat_pump_zone_str][system_size]['Baseline_A']
+        Baseline_A = compile_table(
+            parameters(period).ESS.HEER.table_D17_1_ESSJun24.baseline_energy_consumption).lookup(
+            heat_pump_zone_str, system_size, 'Baseline_A')
         return Baseline_A
     
 
@@ -197,7 +196,9 @@ class D17_ESSJun24_adjustment_coefficient(Variable):
                 'heat_pump_zone_5'
             ])
         
-        adjustment_coefficient = parameters(period).ESS.HEER.table_D17_1_ESSJun24['baseline_energy_consumption'][heat_pump_zone_str][system_size]['adjustment_coefficient']
+        adjustment_coefficient = compile_table(
+            parameters(period).ESS.HEER.table_D17_1_ESSJun24.baseline_energy_consumption).lookup(
+            heat_pump_zone_str, system_size, 'adjustment_coefficient')
         return adjustment_coefficient
   
 
@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class D18_deemed_activity_electricity_savings(Variable):
@@ -64,7 +65,7 @@ class D18_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('D18_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         annual_energy_savings = deemed_activity_electricity_savings * regional_network_factor
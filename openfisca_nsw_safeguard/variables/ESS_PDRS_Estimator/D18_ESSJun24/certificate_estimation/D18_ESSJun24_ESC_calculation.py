@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class D18_ESSJun24_deemed_activity_electricity_savings(Variable):
@@ -77,7 +78,7 @@ class D18_ESSJun24_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('D18_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         annual_energy_savings = deemed_activity_electricity_savings * regional_network_factor
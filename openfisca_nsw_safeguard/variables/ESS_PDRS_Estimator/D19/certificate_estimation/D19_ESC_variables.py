@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for D19 ESC Calculation
@@ -36,7 +37,7 @@ class D19_BCA_climate_zone_by_postcode(Variable):
         postcode = buildings('D19_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         BCA_climate_zone_to_check = np.select(
             [
                 climate_zone_int == 1,
@@ -74,7 +75,7 @@ class D19_BCA_climate_zone_by_postcode_int(Variable):
         postcode = buildings('D19_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
 
         return climate_zone_int
     
@@ -101,7 +102,7 @@ class D19_regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('D19_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)
+        return postcode_lookup(rnf, postcode)
 
 
 class D19_replacement_activity(Variable):
@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class D19_ESSJun24_deemed_activity_electricity_savings(Variable):
@@ -68,7 +69,7 @@ class D19_ESSJun24_annual_energy_savings(Variable):
         #climate zone
         postcode = buildings('D19_ESSJun24_PDRS__postcode', period)
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
 
         #heat pump zone
         heat_pump_zone = parameters(period).ESS.ESS_general.heat_pump_zone_by_BCA_climate_zone
@@ -104,7 +105,7 @@ class D19_ESSJun24_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('D19_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         electricity_savings = electricity_savings * regional_network_factor
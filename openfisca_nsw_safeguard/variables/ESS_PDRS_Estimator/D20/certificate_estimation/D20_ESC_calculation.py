@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class D20_deemed_activity_electricity_savings(Variable):
@@ -69,7 +70,7 @@ class D20_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('D20_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         electricity_savings = deemed_electricity_savings * regional_network_factor
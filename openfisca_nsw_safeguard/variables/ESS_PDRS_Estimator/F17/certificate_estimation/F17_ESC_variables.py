@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for F17 ESC Calculation
@@ -87,4 +88,4 @@ class F17_regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('F17_ESS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)
\ No newline at end of file
+        return postcode_lookup(rnf, postcode)
\ No newline at end of file
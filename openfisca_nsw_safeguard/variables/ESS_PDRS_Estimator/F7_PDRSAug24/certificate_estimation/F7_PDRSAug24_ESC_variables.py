@@ -3,6 +3,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class F7_PDRSAug24_PDRS__postcode(Variable):
@@ -33,8 +34,7 @@ class F7_PDRSAug24_regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('F7_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
+        return postcode_lookup(rnf, postcode)
     
 
 class F7_PDRSAug24_replacement_activity(Variable):
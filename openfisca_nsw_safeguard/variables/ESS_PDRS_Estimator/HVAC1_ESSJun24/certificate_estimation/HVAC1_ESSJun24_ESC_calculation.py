@@ -5,6 +5,9 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard import hvac_savings
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_bins
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 np.set_printoptions(suppress=True)
 
@@ -23,19 +26,8 @@ class HVAC1_ESSJun24_heating_annual_energy_use(Variable):
       heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period)
       equivalent_heating_hours = buildings('HVAC1_ESSJun24_equivalent_heating_hours_input', period)
       rated_ACOP = buildings('HVAC1_ESSJun24_rated_ACOP_input', period)
-      
-      return np.select([    
-                            rated_ACOP == 0,
-                            (heating_capacity * equivalent_heating_hours) > 0, 
-                            (heating_capacity * equivalent_heating_hours) == 0,
-                            (heating_capacity * equivalent_heating_hours) < 0
-                        ],
-                        [
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / rated_ACOP,
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / rated_ACOP
-                        ])
+
+      return hvac_savings.energy_use(heating_capacity, equivalent_heating_hours, rated_ACOP)
 
 class HVAC1_ESSJun24_cooling_annual_energy_use(Variable):
     value_type = float
@@ -52,18 +44,7 @@ class HVAC1_ESSJun24_cooling_annual_energy_use(Variable):
       equivalent_cooling_hours = buildings('HVAC1_ESSJun24_equivalent_cooling_hours_input', period)
       rated_AEER = buildings('HVAC1_ESSJun24_rated_AEER_input', period)
 
-      return np.select([    
-                    rated_AEER == 0,
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER
-                ])
+      return hvac_savings.energy_use(cooling_capacity, equivalent_cooling_hours, rated_AEER)
 
 
 class HVAC1_ESSJun24_reference_heating_annual_energy_use(Variable):
@@ -79,19 +60,8 @@ class HVAC1_ESSJun24_reference_heating_annual_energy_use(Variable):
       heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period)
       equivalent_heating_hours = buildings('HVAC1_ESSJun24_equivalent_heating_hours_input', period)
       baseline_ACOP = buildings('HVAC1_ESSJun24_baseline_ACOP_input', period)
-      
-      return np.select([    
-                        baseline_ACOP == 0,
-                        (heating_capacity * equivalent_heating_hours) > 0, 
-                        (heating_capacity * equivalent_heating_hours) == 0,
-                        (heating_capacity * equivalent_heating_hours) < 0
-                    ],
-                    [
-                        0,
-                        (heating_capacity * equivalent_heating_hours) / baseline_ACOP,
-                        0,
-                        (heating_capacity * equivalent_heating_hours) / baseline_ACOP
-                    ])
+
+      return hvac_savings.energy_use(heating_capacity, equivalent_heating_hours, baseline_ACOP)
 
 
 class HVAC1_ESSJun24_THEC_or_annual_heating(Variable):
@@ -101,19 +71,11 @@ class HVAC1_ESSJun24_THEC_or_annual_heating(Variable):
     definition_period = ETERNITY
    
     def formula(buildings, period, parameters):
-        thec = buildings('HVAC1_ESSJun24_residential_THEC',period)
-        refheat = buildings('HVAC1_ESSJun24_heating_annual_energy_use',period)
-
-        result_to_return = np.select([
-                thec > 0, 
-                thec <= 0 #if there is no THEC
-            ],
-            [
-                thec,
-                refheat
-            ])
-        return result_to_return
-  
+        thec = buildings('HVAC1_ESSJun24_residential_THEC', period)
+        refheat = buildings('HVAC1_ESSJun24_heating_annual_energy_use', period)
+
+        return hvac_savings.reported_or_estimated_use(thec, refheat)
+
 
 class HVAC1_ESSJun24_reference_cooling_annual_energy_use(Variable):
     value_type = float
@@ -128,19 +90,8 @@ class HVAC1_ESSJun24_reference_cooling_annual_energy_use(Variable):
       cooling_capacity = buildings('HVAC1_ESSJun24_cooling_capacity_input', period)
       equivalent_cooling_hours = buildings('HVAC1_ESSJun24_equivalent_cooling_hours_input', period)
       baseline_AEER = buildings('HVAC1_ESSJun24_baseline_AEER_input', period)
-      
-      return np.select([  
-                    baseline_AEER == 0,  
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER
-                ])
+
+      return hvac_savings.energy_use(cooling_capacity, equivalent_cooling_hours, baseline_AEER)
 
 
 class HVAC1_ESSJun24_TCEC_or_annual_cooling(Variable):
@@ -150,18 +101,10 @@ class HVAC1_ESSJun24_TCEC_or_annual_cooling(Variable):
     definition_period = ETERNITY
    
     def formula(buildings, period, parameters):
-        tcec = buildings('HVAC1_ESSJun24_residential_TCEC',period)
-        refcool = buildings('HVAC1_ESSJun24_cooling_annual_energy_use',period)
+        tcec = buildings('HVAC1_ESSJun24_residential_TCEC', period)
+        refcool = buildings('HVAC1_ESSJun24_cooling_annual_energy_use', period)
 
-        result_to_return = np.select([
-                tcec > 0, 
-                tcec <= 0 #if there is no TCEC
-            ],
-            [
-                tcec,
-                refcool
-            ])
-        return result_to_return
+        return hvac_savings.reported_or_estimated_use(tcec, refcool)
 
 
 class HVAC1_ESSJun24_deemed_activity_electricity_savings(Variable):
@@ -179,11 +122,10 @@ class HVAC1_ESSJun24_deemed_activity_electricity_savings(Variable):
       annual_cooling = buildings('HVAC1_ESSJun24_TCEC_or_annual_cooling', period)
       reference_annual_heating = buildings('HVAC1_ESSJun24_reference_heating_annual_energy_use', period)
       annual_heating = buildings('HVAC1_ESSJun24_THEC_or_annual_heating', period)
-      lifetime = 10
-      
-      deemed_electricity_savings = np.multiply(((reference_annual_cooling - annual_cooling) + (reference_annual_heating - annual_heating)), (lifetime / 1000))
-      return deemed_electricity_savings
-    
+
+      return hvac_savings.deemed_electricity_savings(
+          reference_annual_cooling, annual_cooling, reference_annual_heating, annual_heating)
+
 
 class HVAC1_ESSJun24_AC_Type(Enum):
     non_ducted_split_system = 'Non-ducted split system'
@@ -192,6 +134,15 @@ class HVAC1_ESSJun24_AC_Type(Enum):
     ducted_unitary_system = 'Ducted unitary system'
 
 
+HVAC1_ESSJun24_AC_TYPE_KEYS = EnumKeys(HVAC1_ESSJun24_AC_Type, tables = [
+    ('ESS.HEER.table_D16_2.AEER', 0),
+    ('ESS.HEER.table_D16_2.ACOP', 0),
+    ('ESS.HEER.table_D16_3.AEER', 0),
+    ('ESS.HEER.table_D16_3.ACOP', 0),
+    ])
+
+
+
 class HVAC1_ESSJun24_Air_Conditioner_type_savings(Variable):
     value_type = Enum
     entity = Building
@@ -235,207 +186,33 @@ class HVAC1_ESSJun24_annual_energy_savings(Variable):
     }
 
     def formula(buildings, period, parameters):
-      #baseline AEER
+      # The baselines, equivalent hours and network factor are read from the
+      # tables, not from the intermediate variables clients may set as inputs
+      tables = parameters(period).ESS.HEER
       cooling_capacity = buildings('HVAC1_ESSJun24_cooling_capacity_input', period)
-      air_conditioner_type = buildings('HVAC1_ESSJun24_Air_Conditioner_type', period)
-      new_or_replacement_activity = buildings('HVAC1_ESSJun24_Activity', period)
-
-      cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-      
-      aircon = np.select(
-            [air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_split_system, 
-             air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_split_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_unitary_system],
-            
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-        
-      baseline_AEER = np.select(
-            [new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.replacement_activity],
-            
-                [parameters(period).ESS.HEER.table_D16_2.AEER[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEER.table_D16_3.AEER[aircon][cooling_capacity_to_check]
-                    ]
-            )
-
-      #equivalent cooling hours
+      cooling_capacity_to_check = compile_bins(tables.table_D16_bins.cooling_capacity)(cooling_capacity)
+      aircon = HVAC1_ESSJun24_AC_TYPE_KEYS(buildings('HVAC1_ESSJun24_Air_Conditioner_type', period))
+      new_installation = buildings('HVAC1_ESSJun24_Activity', period) == HVAC1_ESSJun24_Activity_Type.new_installation_activity
       climate_zone = buildings('HVAC1_ESSJun24_certificate_climate_zone', period)
-      climate_zone_str = np.select([climate_zone == 1, climate_zone == 2, climate_zone == 3],
-                                    ['hot_zone', 'average_zone', 'cold_zone'])
-      equivalent_cooling_hours = parameters(period).ESS.HEER.table_D16_1.equivalent_cooling_hours[climate_zone_str]
-
-      #rated AEER
-      rated_AEER = buildings('HVAC1_ESSJun24_rated_AEER_input', period)
-
-      #cooling annual energy use
-      annual_cooling = np.select([  
-                    rated_AEER == 0,
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER
-                ])
-
-      #TCEC or annual cooling
-      tcec = buildings('HVAC1_ESSJun24_residential_TCEC',period)
-
-      tcec_or_annual_cooling = np.select([
-            tcec > 0, 
-            tcec <= 0 #if there is no TCEC use annual cooling energy formula
-        ],
-        [
-            tcec,
-            annual_cooling
-        ])
-
-      #reference cooling energy use
-      reference_cooling = np.select([  
-                    baseline_AEER == 0,  
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER
-                ])
-
-      #baseline ACOP
-      cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-      
-      aircon = np.select(
-            [air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_split_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_unitary_system],
-            
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-        
-      baseline_ACOP = np.select(
-            [new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.replacement_activity],
-            
-                [parameters(period).ESS.HEER.table_D16_2.ACOP[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEER.table_D16_3.ACOP[aircon][cooling_capacity_to_check]
-                    ]
-            )
-
-      #heating capacity input
-      heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period)
+      postcode = buildings('HVAC1_ESSJun24_PDRS__postcode', period)
 
-      #equivalent heating hours
-      equivalent_heating_hours = parameters(period).ESS.HEER.table_D16_1.equivalent_heating_hours[climate_zone_str]
+      savings = hvac_savings.HVACSavings(
+          cooling_capacity = cooling_capacity,
+          heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period),
+          equivalent_cooling_hours = hvac_savings.equivalent_hours(tables.table_D16_1.equivalent_cooling_hours, climate_zone),
+          equivalent_heating_hours = hvac_savings.equivalent_hours(tables.table_D16_1.equivalent_heating_hours, climate_zone),
+          rated_AEER = buildings('HVAC1_ESSJun24_rated_AEER_input', period),
+          rated_ACOP = buildings('HVAC1_ESSJun24_rated_ACOP_input', period),
+          baseline_AEER = hvac_savings.baseline_efficiency(
+              tables.table_D16_2.AEER, tables.table_D16_3.AEER, aircon, cooling_capacity_to_check, new_installation),
+          baseline_ACOP = hvac_savings.baseline_efficiency(
+              tables.table_D16_2.ACOP, tables.table_D16_3.ACOP, aircon, cooling_capacity_to_check, new_installation),
+          TCEC = buildings('HVAC1_ESSJun24_residential_TCEC', period),
+          THEC = buildings('HVAC1_ESSJun24_residential_THEC', period),
+          regional_network_factor = postcode_lookup(parameters(period).PDRS.table_A24_regional_network_factor, postcode),
+          )
+      return savings.annual_energy_savings
 
-      #rated ACOP
-      rated_ACOP = buildings('HVAC1_ESSJun24_rated_ACOP_input', period)
-      
-      aircon = np.select(
-            [air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_split_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC1_ESSJun24_AC_Type.ducted_unitary_system],
-            
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-        
-      baseline_ACOP = np.select(
-            [new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC1_ESSJun24_Activity_Type.replacement_activity],
-            
-                [parameters(period).ESS.HEER.table_D16_2.ACOP[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEER.table_D16_3.ACOP[aircon][cooling_capacity_to_check]
-                    ]
-            )
-
-      #heating annual energy use
-      annual_heating = np.select([  
-                    rated_ACOP == 0,
-                    (heating_capacity * equivalent_heating_hours) > 0, 
-                    (heating_capacity * equivalent_heating_hours) == 0,
-                    (heating_capacity * equivalent_heating_hours) < 0
-                ],
-                [
-                    0,
-                    (heating_capacity * equivalent_heating_hours) / rated_ACOP, 
-                    0,
-                    (heating_capacity * equivalent_heating_hours) / rated_ACOP
-                ])
-
-      #THEC or annual heating
-      thec = buildings('HVAC1_ESSJun24_residential_THEC',period)
-
-      thec_or_annual_heating = np.select([
-                thec > 0, 
-                thec <= 0 #if there is no THEC
-            ],
-            [
-                thec,
-                annual_heating
-            ])
-
-      #reference heating annual energy use
-      reference_heating = np.select([    
-                            baseline_ACOP == 0,
-                            (heating_capacity * equivalent_heating_hours) > 0, 
-                            (heating_capacity * equivalent_heating_hours) == 0,
-                            (heating_capacity * equivalent_heating_hours) < 0
-                        ],
-                        [
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / baseline_ACOP,
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / baseline_ACOP
-                        ])
-      
-      #deemed electricity savings
-      lifetime = 10
-      deemed_electricity_savings = np.multiply(((reference_cooling - tcec_or_annual_cooling) + (reference_heating - thec_or_annual_heating)), (lifetime / 1000))
-      
-      #regional network factor
-      postcode = buildings('HVAC1_ESSJun24_PDRS__postcode', period)
-      rnf = parameters(period).PDRS.table_A24_regional_network_factor
-      regional_network_factor = rnf.calc(postcode)
-
-      #electricity savings
-      annual_savings = (deemed_electricity_savings * regional_network_factor)
-      annual_savings_return = np.select([
-            annual_savings <= 0, annual_savings > 0
-        ],
-	    [
-            0, annual_savings
-        ])
-      return annual_savings_return
-      
 
 class HVAC1_ESSJun24_PDRS__regional_network_factor(Variable):
     value_type = float
@@ -453,8 +230,7 @@ class HVAC1_ESSJun24_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('HVAC1_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
+        return postcode_lookup(rnf, postcode)
 
 
 class HVAC1_ESSJun24_electricity_savings(Variable):
@@ -481,37 +257,15 @@ class HVAC1_ESSJun24_ESC_calculation(Variable):
     definition_period = ETERNITY
     label = 'The number of ESCs for HVAC1'
     metadata = {
-        "variable-type": "output"
+        "variable-type": "output",
+        "zero-unless": "HVAC1_ESSJun24_HSPF_or_ACOP_exceeds_ESS_benchmark"
     }
 
     def formula(buildings, period, parameters):
-      HVAC1_electricity_savings = buildings('HVAC1_ESSJun24_electricity_savings', period)
-      HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark = buildings('HVAC1_ESSJun24_TCSPF_or_AEER_exceeds_ESS_benchmark', period)
-      HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark = buildings('HVAC1_ESSJun24_HSPF_or_ACOP_exceeds_ESS_benchmark', period)
-      electricity_certificate_conversion_factor = 1.06
-      heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period) 
-      zero_heating_capacity = ( heating_capacity == 0)
-      
-      result = np.floor(HVAC1_electricity_savings * electricity_certificate_conversion_factor)
-      result_meet_elig = np.select([
-                         np.logical_not(zero_heating_capacity) * HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark * HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark, 
-                         np.logical_not(zero_heating_capacity) * np.logical_not(HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark) * HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark,
-                         np.logical_not(zero_heating_capacity) * HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark * np.logical_not(HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         np.logical_not(zero_heating_capacity) * np.logical_not(HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark) * np.logical_not(HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark * np.logical_not(HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * np.logical_not(HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark) * np.logical_not(HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * HVAC1_TCSPF_or_AEER_exceeds_ESS_benchmark * HVAC1_HSPF_or_ACOP_exceeds_ESS_benchmark
-                         ],
-                        [
-                            result, 0, 0, 0, 0, 0, 0
-                        ],
-                        result
-      )
-      
-      result_to_return = np.select([
-                result_meet_elig <= 0, result_meet_elig > 0
-            ], [
-                0, result_meet_elig
-            ])
-
-      return result_to_return
\ No newline at end of file
+      electricity_savings = buildings('HVAC1_ESSJun24_electricity_savings', period)
+      heating_capacity = buildings('HVAC1_ESSJun24_heating_capacity_input', period)
+      exceeds_cooling_benchmark = buildings('HVAC1_ESSJun24_TCSPF_or_AEER_exceeds_ESS_benchmark', period)
+      exceeds_heating_benchmark = buildings('HVAC1_ESSJun24_HSPF_or_ACOP_exceeds_ESS_benchmark', period)
+
+      return hvac_savings.energy_savings_certificates(
+          electricity_savings, heating_capacity, exceeds_cooling_benchmark, exceeds_heating_benchmark)
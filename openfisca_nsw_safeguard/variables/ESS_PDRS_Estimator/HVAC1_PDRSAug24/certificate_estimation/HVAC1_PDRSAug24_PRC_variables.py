@@ -3,6 +3,7 @@ from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for HVAC1 PRC Calculation
@@ -37,4 +38,4 @@ class HVAC1_PDRSAug24_get_network_loss_factor_by_postcode(Variable):
         postcode = building('HVAC1_PDRSAug24_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
\ No newline at end of file
+        return postcode_lookup(network_loss_factor, postcode)
\ No newline at end of file
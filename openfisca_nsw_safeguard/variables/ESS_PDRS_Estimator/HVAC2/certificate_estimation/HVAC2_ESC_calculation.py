@@ -6,6 +6,9 @@ from openfisca_nsw_base.entities import Building
 import math
 
 import numpy as np
+from openfisca_nsw_safeguard import hvac_savings
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_bins
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class HVAC2_heating_annual_energy_use(Variable):
@@ -22,19 +25,8 @@ class HVAC2_heating_annual_energy_use(Variable):
       heating_capacity = buildings('HVAC2_heating_capacity_input', period)
       equivalent_heating_hours = buildings('HVAC2_equivalent_heating_hours_input', period)
       rated_ACOP = buildings('HVAC2_rated_ACOP_input', period)
-      
-      return np.select([    
-                            rated_ACOP == 0,
-                            (heating_capacity * equivalent_heating_hours) > 0, 
-                            (heating_capacity * equivalent_heating_hours) == 0,
-                            (heating_capacity * equivalent_heating_hours) < 0
-                        ],
-                        [
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / rated_ACOP, 
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / rated_ACOP
-                        ])
+
+      return hvac_savings.energy_use(heating_capacity, equivalent_heating_hours, rated_ACOP)
 
 
 class HVAC2_cooling_annual_energy_use(Variable):
@@ -52,18 +44,7 @@ class HVAC2_cooling_annual_energy_use(Variable):
       equivalent_cooling_hours = buildings('HVAC2_equivalent_cooling_hours_input', period)
       rated_AEER = buildings('HVAC2_rated_AEER_input', period)
 
-      return np.select([    
-                    rated_AEER == 0,
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER
-                ])
+      return hvac_savings.energy_use(cooling_capacity, equivalent_cooling_hours, rated_AEER)
 
 
 class HVAC2_reference_heating_annual_energy_use(Variable):
@@ -80,18 +61,7 @@ class HVAC2_reference_heating_annual_energy_use(Variable):
       equivalent_heating_hours = buildings('HVAC2_equivalent_heating_hours_input', period)
       baseline_ACOP = buildings('HVAC2_baseline_ACOP_input', period)
 
-      return np.select([    
-                        baseline_ACOP == 0,
-                        (heating_capacity * equivalent_heating_hours) > 0, 
-                        (heating_capacity * equivalent_heating_hours) == 0,
-                        (heating_capacity * equivalent_heating_hours) < 0
-                    ],
-                    [
-                        0,
-                        (heating_capacity * equivalent_heating_hours) / baseline_ACOP, 
-                        0,
-                        (heating_capacity * equivalent_heating_hours) / baseline_ACOP
-                    ])
+      return hvac_savings.energy_use(heating_capacity, equivalent_heating_hours, baseline_ACOP)
 
 class HVAC2_THEC_or_annual_heating(Variable):
     #Check if there is a THEC and if not, use the annual heating energy use formula
@@ -100,18 +70,10 @@ class HVAC2_THEC_or_annual_heating(Variable):
     definition_period = ETERNITY
    
     def formula(buildings, period, parameters):
-        thec = buildings('HVAC2_commercial_THEC',period)
-        refheat = buildings('HVAC2_heating_annual_energy_use',period)
+        thec = buildings('HVAC2_commercial_THEC', period)
+        refheat = buildings('HVAC2_heating_annual_energy_use', period)
 
-        result_to_return = np.select([
-                thec > 0, 
-                thec <= 0 #if there is no THEC
-            ],
-            [
-                thec,
-                refheat
-            ])
-        return result_to_return
+        return hvac_savings.reported_or_estimated_use(thec, refheat)
 
 
 class HVAC2_reference_cooling_annual_energy_use(Variable):
@@ -127,19 +89,8 @@ class HVAC2_reference_cooling_annual_energy_use(Variable):
       cooling_capacity = buildings('HVAC2_cooling_capacity_input', period)
       equivalent_cooling_hours = buildings('HVAC2_equivalent_cooling_hours_input', period)
       baseline_AEER = buildings('HVAC2_baseline_AEER_input', period)
-      
-      return np.select([  
-                    baseline_AEER == 0,  
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER
-                ])
+
+      return hvac_savings.energy_use(cooling_capacity, equivalent_cooling_hours, baseline_AEER)
 
 
 class HVAC2_TCEC_or_annual_cooling(Variable):
@@ -149,18 +100,10 @@ class HVAC2_TCEC_or_annual_cooling(Variable):
     definition_period = ETERNITY
    
     def formula(buildings, period, parameters):
-        tcec = buildings('HVAC2_commercial_TCEC',period)
-        refcool = buildings('HVAC2_cooling_annual_energy_use',period)
+        tcec = buildings('HVAC2_commercial_TCEC', period)
+        refcool = buildings('HVAC2_cooling_annual_energy_use', period)
 
-        result_to_return = np.select([
-                tcec > 0, 
-                tcec <= 0 #if there is no TCEC
-            ],
-            [
-                tcec,
-                refcool
-            ])
-        return result_to_return
+        return hvac_savings.reported_or_estimated_use(tcec, refcool)
 
 
 class HVAC2_deemed_activity_electricity_savings(Variable):
@@ -178,11 +121,10 @@ class HVAC2_deemed_activity_electricity_savings(Variable):
       annual_cooling = buildings('HVAC2_TCEC_or_annual_cooling', period)
       reference_annual_heating = buildings('HVAC2_reference_heating_annual_energy_use', period)
       annual_heating = buildings('HVAC2_THEC_or_annual_heating', period)
-      lifetime = 10
-      
-      deemed_electricity_savings = np.multiply(((reference_annual_cooling - annual_cooling) + (reference_annual_heating - annual_heating)), (lifetime / 1000))
-      return deemed_electricity_savings
-    
+
+      return hvac_savings.deemed_electricity_savings(
+          reference_annual_cooling, annual_cooling, reference_annual_heating, annual_heating)
+
 
 class HVAC2_AC_Type(Enum):
     non_ducted_split_system = 'Non-ducted split system'
@@ -191,6 +133,14 @@ class HVAC2_AC_Type(Enum):
     ducted_unitary_system = 'Ducted unitary system'
 
 
+HVAC2_AC_TYPE_KEYS = EnumKeys(HVAC2_AC_Type, tables = [
+    ('ESS.HEAB.table_F4_2.AEER', 0),
+    ('ESS.HEAB.table_F4_2.ACOP', 0),
+    ('ESS.HEAB.table_F4_3.AEER', 0),
+    ('ESS.HEAB.table_F4_3.ACOP', 0),
+    ])
+
+
 class HVAC2_Air_Conditioner_type_savings(Variable):
     value_type = Enum
     entity = Building
@@ -234,205 +184,38 @@ class HVAC2_annual_energy_savings(Variable):
     }
 
     def formula(buildings, period, parameters):
-      #baseline AEER
+      # The baselines, equivalent hours and network factor are read from the
+      # tables, not from the intermediate variables clients may set as inputs
+      tables = parameters(period).ESS.HEAB
       cooling_capacity = buildings('HVAC2_cooling_capacity_input', period)
-      air_conditioner_type = buildings('HVAC2_Air_Conditioner_type', period)
-      new_or_replacement_activity = buildings('HVAC2_Activity', period)
-
-      cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-
-      aircon = np.select(
-            [air_conditioner_type == HVAC2_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC2_AC_Type.ducted_split_system, air_conditioner_type == HVAC2_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC2_AC_Type.ducted_unitary_system],
-
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-
-      baseline_AEER = np.select(
-            [new_or_replacement_activity == HVAC2_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC2_Activity_Type.replacement_activity
-            ],
-            [parameters(period).ESS.HEAB.table_F4_2.AEER[aircon][cooling_capacity_to_check], 
-                    parameters(period).ESS.HEAB.table_F4_3.AEER[aircon][cooling_capacity_to_check] 
-            ])
-
-      #equivalent cooling hours
+      cooling_capacity_to_check = compile_bins(tables.table_F4_bins.cooling_capacity)(cooling_capacity)
+      aircon = HVAC2_AC_TYPE_KEYS(buildings('HVAC2_Air_Conditioner_type', period))
+      new_installation = buildings('HVAC2_Activity', period) == HVAC2_Activity_Type.new_installation_activity
       climate_zone = buildings('HVAC2_certificate_climate_zone', period)
-      climate_zone_str = np.select([climate_zone == 1, climate_zone == 2, climate_zone == 3],
-                                    ['hot_zone', 'average_zone', 'cold_zone'])
-      equivalent_cooling_hours = parameters(period).ESS.HEAB.table_F4_1.equivalent_cooling_hours[climate_zone_str]
-
-      #rated AEER
-      rated_AEER = buildings('HVAC2_rated_AEER_input', period)
+      postcode = buildings('HVAC2_PDRS__postcode', period)
 
-      #cooling annual energy use
-      annual_cooling = np.select([
-                    rated_AEER == 0,
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / rated_AEER
-                ])
-
-      #TCEC or annual cooling
-      tcec = buildings('HVAC2_commercial_TCEC',period)
-
-      tcec_or_annual_cooling = np.select([
-                tcec > 0, 
-                tcec <= 0 #if there is no TCEC use annual cooling energy formula
-            ],
-            [
-                tcec,
-                annual_cooling
-            ])
-
-      #reference cooling energy use
-      reference_cooling = np.select([  
-                    baseline_AEER == 0,  
-                    (cooling_capacity * equivalent_cooling_hours) > 0, 
-                    (cooling_capacity * equivalent_cooling_hours) == 0,
-                    (cooling_capacity * equivalent_cooling_hours) < 0
-                ],
-                [
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER, 
-                    0,
-                    (cooling_capacity * equivalent_cooling_hours) / baseline_AEER
-                ])
-
-      #baseline ACOP
-      cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-
-      aircon = np.select(
-            [air_conditioner_type == HVAC2_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC2_AC_Type.ducted_split_system, air_conditioner_type == HVAC2_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC2_AC_Type.ducted_unitary_system],
-
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-
-      baseline_ACOP = np.select(
-            [new_or_replacement_activity == HVAC2_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC2_Activity_Type.replacement_activity
-            ],
-            [parameters(period).ESS.HEAB.table_F4_2.ACOP[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEAB.table_F4_3.ACOP[aircon][cooling_capacity_to_check]
-            ])
-
-      #heating capacity input
       heating_capacity = buildings('HVAC2_heating_capacity_input', period)
-
-      #equivalent heating hours
-      equivalent_heating_hours = parameters(period).ESS.HEAB.table_F4_1.equivalent_heating_hours[climate_zone_str]
-
-      #rated ACOP
-      rated_ACOP = buildings('HVAC2_rated_ACOP_input', period)
-
-      aircon = np.select(
-            [air_conditioner_type == HVAC2_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC2_AC_Type.ducted_split_system, air_conditioner_type == HVAC2_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC2_AC_Type.ducted_unitary_system],
-
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-
-      baseline_ACOP = np.select(
-            [new_or_replacement_activity == HVAC2_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC2_Activity_Type.replacement_activity],
-
-                [parameters(period).ESS.HEAB.table_F4_2.ACOP[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEAB.table_F4_3.ACOP[aircon][cooling_capacity_to_check]
-                    ]
-            )
-
-      #heating annual energy use
-      annual_heating = np.select([  
-                    rated_ACOP == 0,
-                    (heating_capacity * equivalent_heating_hours) > 0, 
-                    (heating_capacity * equivalent_heating_hours) == 0,
-                    (heating_capacity * equivalent_heating_hours) < 0
-                ],
-                [
-                    0,
-                    (heating_capacity * equivalent_heating_hours) / rated_ACOP, 
-                    0,
-                    (cooling_capacity * equivalent_heating_hours) / rated_ACOP
-                ])
-
-      #THEC or annual heating
-      thec = buildings('HVAC2_commercial_THEC',period)
-
-      thec_or_annual_heating = np.select([
-                thec > 0, 
-                thec <= 0 #if there is no THEC
-            ],
-            [
-                thec,
-                annual_heating
-            ])
-
-      #reference heating annual energy use
-      reference_heating = np.select([    
-                            baseline_ACOP == 0,
-                            (heating_capacity * equivalent_heating_hours) > 0, 
-                            (heating_capacity * equivalent_heating_hours) == 0,
-                            (heating_capacity * equivalent_heating_hours) < 0
-                        ],
-                        [
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / baseline_ACOP,
-                            0,
-                            (heating_capacity * equivalent_heating_hours) / baseline_ACOP
-                        ])
-      lifetime = 10
-
-      #deemed electricity savings
-      deemed_electricity_savings = np.multiply(((reference_cooling - tcec_or_annual_cooling) + (reference_heating - thec_or_annual_heating)), (lifetime / 1000))
-  
-      #regional network factor
-      postcode = buildings('HVAC2_PDRS__postcode', period)
-      rnf = parameters(period).PDRS.table_A24_regional_network_factor
-      regional_network_factor = rnf.calc(postcode)
-
-      #electricity savings
-      annual_energy_savings = (deemed_electricity_savings * regional_network_factor)
-    
-      annual_savings_return = np.select([
-            annual_energy_savings <= 0, annual_energy_savings > 0
-        ],
-	    [
-            0, annual_energy_savings
-        ])
-        
-      return annual_savings_return
+      equivalent_cooling_hours = hvac_savings.equivalent_hours(tables.table_F4_1.equivalent_cooling_hours, climate_zone)
+      equivalent_heating_hours = hvac_savings.equivalent_hours(tables.table_F4_1.equivalent_heating_hours, climate_zone)
+      baseline_AEER = hvac_savings.baseline_efficiency(
+          tables.table_F4_2.AEER, tables.table_F4_3.AEER, aircon, cooling_capacity_to_check, new_installation)
+      baseline_ACOP = hvac_savings.baseline_efficiency(
+          tables.table_F4_2.ACOP, tables.table_F4_3.ACOP, aircon, cooling_capacity_to_check, new_installation)
+
+      annual_cooling = hvac_savings.energy_use(
+          cooling_capacity, equivalent_cooling_hours, buildings('HVAC2_rated_AEER_input', period))
+      # Where the heating use is negative, the estimator has always used the cooling capacity
+      annual_heating = hvac_savings.energy_use(
+          np.where(heating_capacity * equivalent_heating_hours < 0, cooling_capacity, heating_capacity),
+          equivalent_heating_hours, buildings('HVAC2_rated_ACOP_input', period))
+
+      deemed_electricity_savings = hvac_savings.deemed_electricity_savings(
+          hvac_savings.energy_use(cooling_capacity, equivalent_cooling_hours, baseline_AEER),
+          hvac_savings.reported_or_estimated_use(buildings('HVAC2_commercial_TCEC', period), annual_cooling),
+          hvac_savings.energy_use(heating_capacity, equivalent_heating_hours, baseline_ACOP),
+          hvac_savings.reported_or_estimated_use(buildings('HVAC2_commercial_THEC', period), annual_heating))
+      regional_network_factor = postcode_lookup(parameters(period).PDRS.table_A24_regional_network_factor, postcode)
+      return hvac_savings.positive_part(deemed_electricity_savings * regional_network_factor)
 
 
 class HVAC2_PDRS__regional_network_factor(Variable):
@@ -450,8 +233,7 @@ class HVAC2_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('HVAC2_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
+        return postcode_lookup(rnf, postcode)
 
 
 class HVAC2_electricity_savings(Variable):
@@ -478,37 +260,15 @@ class HVAC2_ESC_calculation(Variable):
     definition_period = ETERNITY
     label = 'The number of ESCs for HVAC2'
     metadata = {
-        "variable-type": "output"
+        "variable-type": "output",
+        "zero-unless": "HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark"
     }
 
     def formula(buildings, period, parameters):
       electricity_savings = buildings('HVAC2_electricity_savings', period)
-      HVAC2_TCSPF_or_AEER_exceeds_benchmark = buildings('HVAC2_TCSPF_or_AEER_exceeds_benchmark', period)
-      HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark = buildings('HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark', period)
-      electricity_certificate_conversion_factor = 1.06
       heating_capacity = buildings('HVAC2_heating_capacity_input', period)
-      zero_heating_capacity = ( heating_capacity == 0)
-
-      result = np.floor(electricity_savings * electricity_certificate_conversion_factor)      
-      result_meet_elig = np.select([
-                         np.logical_not(zero_heating_capacity) * HVAC2_TCSPF_or_AEER_exceeds_benchmark * HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark, 
-                         np.logical_not(zero_heating_capacity) * np.logical_not(HVAC2_TCSPF_or_AEER_exceeds_benchmark) * HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark,
-                         np.logical_not(zero_heating_capacity) * HVAC2_TCSPF_or_AEER_exceeds_benchmark * np.logical_not(HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         np.logical_not(zero_heating_capacity) * np.logical_not(HVAC2_TCSPF_or_AEER_exceeds_benchmark) * np.logical_not(HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * HVAC2_TCSPF_or_AEER_exceeds_benchmark * np.logical_not(HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * np.logical_not(HVAC2_TCSPF_or_AEER_exceeds_benchmark) * np.logical_not(HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark),
-                         zero_heating_capacity * HVAC2_TCSPF_or_AEER_exceeds_benchmark * HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark
-                         ],
-                         [
-                            result, 0, 0, 0, 0, 0, 0
-                         ],
-                         result
-      )
-      
-      result_to_return = np.select([
-                result_meet_elig <= 0, result_meet_elig > 0
-            ], [
-                0, result_meet_elig
-            ])
-
-      return result_to_return
+      exceeds_cooling_benchmark = buildings('HVAC2_TCSPF_or_AEER_exceeds_benchmark', period)
+      exceeds_heating_benchmark = buildings('HVAC2_HSPF_or_ACOP_exceeds_ESS_benchmark', period)
+
+      return hvac_savings.energy_savings_certificates(
+          electricity_savings, heating_capacity, exceeds_cooling_benchmark, exceeds_heating_benchmark)
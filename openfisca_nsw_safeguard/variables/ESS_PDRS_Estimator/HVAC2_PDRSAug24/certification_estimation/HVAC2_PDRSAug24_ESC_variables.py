@@ -3,6 +3,9 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard import hvac_savings
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_bins
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for HVAC2 ESC Calculation
@@ -58,42 +61,16 @@ class HVAC2_PDRSAug24_baseline_AEER_input(Variable):
 
     def formula(building, period, parameters):
         cooling_capacity = building('HVAC2_PDRSAug24_cooling_capacity_input', period)
-        
-        cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-        
+        cooling_capacity_bins = compile_bins(parameters(period).ESS.HEAB.table_F4_bins.cooling_capacity)
         air_conditioner_type = building('HVAC2_PDRSAug24_Air_Conditioner_type', period)
-        aircon = np.select(
-            [air_conditioner_type == HVAC2_PDRSAug24_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.ducted_split_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.ducted_unitary_system],
-            
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-       
         new_or_replacement_activity = building('HVAC2_PDRSAug24_Activity', period)
-        
-        baseline_aeer = np.select(
-            [new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.replacement_activity],
-            
-                [parameters(period).ESS.HEAB.table_F4_2.AEER[aircon][cooling_capacity_to_check],
-                    parameters(period).ESS.HEAB.table_F4_3.AEER[aircon][cooling_capacity_to_check]
-                    ]
-            )
 
-        return baseline_aeer
+        return hvac_savings.baseline_efficiency(
+            parameters(period).ESS.HEAB.table_F4_2.AEER,
+            parameters(period).ESS.HEAB.table_F4_3.AEER,
+            HVAC2_PDRSAUG24_AC_TYPE_KEYS(air_conditioner_type),
+            cooling_capacity_bins(cooling_capacity),
+            new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.new_installation_activity)
 
 
 class HVAC2_PDRSAug24_rated_AEER_input(Variable):
@@ -120,7 +97,7 @@ class HVAC2_PDRSAug24_certificate_climate_zone(Variable):
     def formula(building, period, parameters):
         postcode = building('HVAC2_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).ESS.ESS_general.table_A27_4_climate_zone_by_postcode
-        zone_int = rnf.calc(postcode)
+        zone_int = postcode_lookup(rnf, postcode)
         return zone_int
 
 
@@ -136,7 +113,7 @@ class HVAC2_PDRSAug24_get_climate_zone_by_postcode(Variable):
     def formula(building, period, parameters):
         postcode = building('HVAC2_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).ESS.ESS_general.table_A27_4_climate_zone_by_postcode
-        zone_int = rnf.calc(postcode)
+        zone_int = postcode_lookup(rnf, postcode)
         climate_zone_str = np.select([zone_int == 1, zone_int == 2, zone_int == 3],
                                      ['hot', 'mixed', 'cold'])
         return climate_zone_str
@@ -220,44 +197,17 @@ class HVAC2_PDRSAug24_baseline_ACOP_input(Variable):
     definition_period = ETERNITY
 
     def formula(building, period, parameters):
-        cooling_capacity = building(
-            'HVAC2_PDRSAug24_cooling_capacity_input', period)
-        
-        cooling_capacity_to_check = np.select(
-            [
-                cooling_capacity < 4,
-                (cooling_capacity < 10) * (cooling_capacity >= 4),
-                (cooling_capacity < 39) * (cooling_capacity >= 10),
-                (cooling_capacity < 65) * (cooling_capacity >= 39),
-                cooling_capacity > 65
-            ],
-            [
-                "less_than_4kW",
-                "4kW_to_10kW",
-                "10kW_to_39kW",
-                "39kW_to_65kW",
-                "more_than_65kW"
-            ])
-        
+        cooling_capacity = building('HVAC2_PDRSAug24_cooling_capacity_input', period)
+        cooling_capacity_bins = compile_bins(parameters(period).ESS.HEAB.table_F4_bins.cooling_capacity)
         air_conditioner_type = building('HVAC2_PDRSAug24_Air_Conditioner_type', period)
-        aircon = np.select(
-            [air_conditioner_type == HVAC2_PDRSAug24_AC_Type.non_ducted_split_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.ducted_split_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.non_ducted_unitary_system, air_conditioner_type == HVAC2_PDRSAug24_AC_Type.ducted_unitary_system],
-            
-                ["non_ducted_split_system", "ducted_split_system", "non_ducted_unitary_system", "ducted_unitary_system"]
-            )
-        
         new_or_replacement_activity = building('HVAC2_PDRSAug24_Activity', period)
-        
-        baseline_acop = np.select(
-            [new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.new_installation_activity,
-                new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.replacement_activity],
-            
-                 [parameters(period).ESS.HEAB.table_F4_2.ACOP[aircon][cooling_capacity_to_check], 
-                    parameters(period).ESS.HEAB.table_F4_3.ACOP[aircon][cooling_capacity_to_check] 
-                    ]
-            )
 
-        return baseline_acop
+        return hvac_savings.baseline_efficiency(
+            parameters(period).ESS.HEAB.table_F4_2.ACOP,
+            parameters(period).ESS.HEAB.table_F4_3.ACOP,
+            HVAC2_PDRSAUG24_AC_TYPE_KEYS(air_conditioner_type),
+            cooling_capacity_bins(cooling_capacity),
+            new_or_replacement_activity == HVAC2_PDRSAug24_Activity_Type.new_installation_activity)
 
 
 class HVAC2_PDRSAug24_AC_Type(Enum):
@@ -267,6 +217,14 @@ class HVAC2_PDRSAug24_AC_Type(Enum):
     ducted_unitary_system = 'Ducted unitary system'
 
 
+HVAC2_PDRSAUG24_AC_TYPE_KEYS = EnumKeys(HVAC2_PDRSAug24_AC_Type, tables = [
+    ('ESS.HEAB.table_F4_2.AEER', 0),
+    ('ESS.HEAB.table_F4_2.ACOP', 0),
+    ('ESS.HEAB.table_F4_3.AEER', 0),
+    ('ESS.HEAB.table_F4_3.ACOP', 0),
+    ])
+
+
 class HVAC2_PDRSAug24_Air_Conditioner_type(Variable):
     value_type = Enum
     entity = Building
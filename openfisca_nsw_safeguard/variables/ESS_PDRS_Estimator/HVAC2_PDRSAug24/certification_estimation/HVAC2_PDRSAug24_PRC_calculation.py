@@ -4,6 +4,8 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard import hvac_savings
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class HVAC2_PDRSAug24_baseline_input_power(Variable):
@@ -17,19 +19,8 @@ class HVAC2_PDRSAug24_baseline_input_power(Variable):
     def formula(buildings, period, parameters):
       rated_cooling_capacity = buildings('HVAC2_PDRSAug24_cooling_capacity_input', period)
       baseline_AEER = buildings('HVAC2_PDRSAug24_baseline_AEER_input', period)
-      
-      return np.select([    
-                    baseline_AEER == 0,
-                    (rated_cooling_capacity / baseline_AEER) > 0, 
-                    (rated_cooling_capacity / baseline_AEER) == 0,
-                    (rated_cooling_capacity / baseline_AEER) < 0
-                ],
-                [
-                    0,
-                    rated_cooling_capacity / baseline_AEER,
-                    0,
-                    rated_cooling_capacity / baseline_AEER
-                ])
+
+      return hvac_savings.baseline_input_power(rated_cooling_capacity, baseline_AEER)
 
 
 class HVAC2_PDRSAug24_BCA_climate_zone_by_postcode(Variable):
@@ -45,7 +36,7 @@ class HVAC2_PDRSAug24_BCA_climate_zone_by_postcode(Variable):
         postcode = buildings('HVAC2_PDRSAug24_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         return climate_zone_int
 
 
@@ -106,20 +97,8 @@ class HVAC2_PDRSAug24_peak_demand_savings_activity(Variable):
         baseline_input_power = buildings('HVAC2_PDRSAug24_baseline_input_power', period)
         baseline_peak_adjustment = buildings('HVAC2_PDRSAug24_baseline_peak_adjustment_factor', period)
         input_power = buildings('HVAC2_PDRSAug24_input_power', period)
-        firmness_factor = 1
-
-        return (
-                    (
-                        baseline_input_power *
-                        baseline_peak_adjustment
-                    ) -
-                    (
-                        input_power *
-                        baseline_peak_adjustment
-                    )
-                    *
-                    firmness_factor
-            )
+
+        return hvac_savings.peak_demand_savings(baseline_input_power, baseline_peak_adjustment, input_power)
 
 
 class HVAC2_PDRSAug24_peak_demand_annual_savings(Variable):
@@ -132,61 +111,18 @@ class HVAC2_PDRSAug24_peak_demand_annual_savings(Variable):
     }
 
     def formula(buildings, period, parameters):
-        #baseline input power
-        rated_cooling_capacity = buildings('HVAC2_PDRSAug24_cooling_capacity_input', period)
-        baseline_AEER = buildings('HVAC2_PDRSAug24_baseline_AEER_input', period)
-      
-        baseline_input_power = np.select([    
-                    baseline_AEER == 0,
-                    (rated_cooling_capacity / baseline_AEER) > 0, 
-                    (rated_cooling_capacity / baseline_AEER) == 0,
-                    (rated_cooling_capacity / baseline_AEER) < 0
-                ],
-                [
-                    0,
-                    rated_cooling_capacity / baseline_AEER,
-                    0,
-                    rated_cooling_capacity / baseline_AEER
-                ])
-
-        #baseline peak adjustment factor
         usage_factor = 0.6
         climate_zone = buildings('HVAC2_PDRSAug24_BCA_Climate_Zone', period)
         temp_factor = parameters(period).PDRS.table_A28_temperature_factor.temperature_factor[climate_zone]
 
-        baseline_peak_adjustment = usage_factor * temp_factor
-
-        #peak demand savings activity
-        input_power = buildings('HVAC2_PDRSAug24_input_power', period)
-        firmness_factor = 1
-
-        peak_demand_savings_activity = (
-                    (
-                        baseline_input_power *
-                        baseline_peak_adjustment
-                    ) -
-                    (
-                        input_power *
-                        baseline_peak_adjustment
-                    )
-                    *
-                    firmness_factor
+        savings = hvac_savings.HVACPeakDemandSavings(
+            cooling_capacity = buildings('HVAC2_PDRSAug24_cooling_capacity_input', period),
+            baseline_AEER = buildings('HVAC2_PDRSAug24_baseline_AEER_input', period),
+            baseline_peak_adjustment_factor = usage_factor * temp_factor,
+            input_power = buildings('HVAC2_PDRSAug24_input_power', period),
             )
+        return savings.peak_demand_annual_savings
 
-        #peak demand reduction capacity
-        summer_peak_demand_duration = 6
-        lifetime = 10
-
-        peak_demand_annual_savings = (peak_demand_savings_activity * summer_peak_demand_duration * lifetime)
-        peak_demand_annual_savings_return = np.select([
-                peak_demand_annual_savings <= 0, peak_demand_annual_savings > 0
-            ], 
-	        [
-                0, peak_demand_annual_savings
-            ])
-        
-        return peak_demand_annual_savings_return
-    
 
 class HVAC2_PDRSAug24_peak_demand_reduction_capacity(Variable):
     value_type = float
@@ -199,11 +135,7 @@ class HVAC2_PDRSAug24_peak_demand_reduction_capacity(Variable):
 
     def formula(buildings, period, parameters):
         peak_demand_savings = buildings('HVAC2_PDRSAug24_peak_demand_savings_activity', period)
-        summer_peak_demand_duration = 6
-        lifetime = 10
-
-        peak_demand_reduction_capacity = (peak_demand_savings * summer_peak_demand_duration * lifetime)
-        return peak_demand_reduction_capacity
+        return hvac_savings.peak_demand_reduction_capacity(peak_demand_savings)
 
 
 class HVAC2_PDRSAug24_PRC_calculation(Variable):
@@ -212,33 +144,17 @@ class HVAC2_PDRSAug24_PRC_calculation(Variable):
     definition_period = ETERNITY
     label = 'The number of PRCs for HVAC2'
     metadata = {
-        'variable-type': 'output'
+        'variable-type': 'output',
+        'zero-unless': 'HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark'
     }
 
     def formula(buildings, period, parameters):
         peak_demand_capacity = buildings('HVAC2_PDRSAug24_peak_demand_reduction_capacity', period)
         network_loss_factor = buildings('HVAC2_PDRSAug24_get_network_loss_factor_by_postcode', period)
-        kw_to_0_1kw = 10
-        
-        HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark = buildings('HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark', period)
-
-        result = np.floor(peak_demand_capacity * network_loss_factor * kw_to_0_1kw)
-        result_meet_elig = np.select(
-                        [
-                         HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark,
-                         np.logical_not(HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark)
-                         ],
-                        [
-                            result, 0
-                        ])
-
-        result_to_return = np.select([
-                result_meet_elig <= 0, result_meet_elig > 0
-            ], [
-                0, result_meet_elig
-            ])
-        return result_to_return
-    
+        exceeds_cooling_benchmark = buildings('HVAC2_PDRSAug24_TCSPF_or_AEER_exceeds_ESS_benchmark', period)
+
+        return hvac_savings.peak_reduction_certificates(peak_demand_capacity, network_loss_factor, exceeds_cooling_benchmark)
+
 
 class HVAC2_PDRSAug24_PRC_savings_check(Variable):
     #this variable checks if PRCs are zero, and if they are returns zero peak savings
@@ -2,6 +2,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 
@@ -18,7 +19,7 @@ class RF1_get_network_loss_factor_by_postcode(Variable):
         postcode = building('RF1_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
+        return postcode_lookup(network_loss_factor, postcode)
 
 
 class RF1_peak_demand_savings_capacity(Variable):
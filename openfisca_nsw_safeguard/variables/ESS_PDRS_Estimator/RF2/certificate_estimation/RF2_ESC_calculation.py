@@ -4,6 +4,8 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_table
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class RF2_input_power(Variable):
@@ -110,6 +112,14 @@ class RF2ProductClass(Enum):
     product_class_fifteen = 'Class 15'
 
 
+RF2_PRODUCT_CLASS_KEYS = EnumKeys(RF2ProductClass, tables = [
+    ('ESS.HEAB.table_F1_1_1.adjustment_factor', 0),
+    ('ESS.HEAB.table_F1_1_1.baseline_EEI', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.adjustment_factor', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.baseline_EEI', 0),
+    ])
+
+
 class RF2_product_class_savings(Variable):
     value_type = Enum
     entity = Building
@@ -155,42 +165,7 @@ class RF2_annual_energy_savings(Variable):
 
     def formula(buildings, period, parameters):
         #product class
-        product_class_savings = buildings('RF2_product_class', period)
-        
-        product_class_savings = np.select([
-            product_class_savings == 'Class 1',
-            product_class_savings == 'Class 2',
-            product_class_savings == 'Class 3',
-            product_class_savings == 'Class 4',
-            product_class_savings == 'Class 5',
-            product_class_savings == 'Class 6',
-            product_class_savings == 'Class 7',
-            product_class_savings == 'Class 8',
-            product_class_savings == 'Class 9',
-            product_class_savings == 'Class 10',
-            product_class_savings == 'Class 11',
-            product_class_savings == 'Class 12',
-            product_class_savings == 'Class 13',
-            product_class_savings == 'Class 14',
-            product_class_savings == 'Class 15',
-        ], 
-        [
-            RF2ProductClass.product_class_one,
-            RF2ProductClass.product_class_two,
-            RF2ProductClass.product_class_three,
-            RF2ProductClass.product_class_four,
-            RF2ProductClass.product_class_five,
-            RF2ProductClass.product_class_six,
-            RF2ProductClass.product_class_seven,
-            RF2ProductClass.product_class_eight,
-            RF2ProductClass.product_class_nine,
-            RF2ProductClass.product_class_ten,
-            RF2ProductClass.product_class_eleven,
-            RF2ProductClass.product_class_twelve,
-            RF2ProductClass.product_class_thirteen,
-            RF2ProductClass.product_class_fourteen,
-            RF2ProductClass.product_class_fifteen         
-      ])
+        product_class_savings = RF2_PRODUCT_CLASS_KEYS(buildings('RF2_product_class', period))
         
         #duty class
         duty_type = buildings('RF2_duty_class', period)
@@ -205,8 +180,8 @@ class RF2_annual_energy_savings(Variable):
                 replacement_activity
             ],
             [
-                parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor'][product_class_savings][duty_type],
-                parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor'][product_class_savings][duty_type]
+                compile_table(parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor']).lookup(product_class_savings, duty_type),
+                compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor']).lookup(product_class_savings, duty_type)
             ])
         
         #tec
@@ -219,8 +194,8 @@ class RF2_annual_energy_savings(Variable):
                 np.logical_not(replacement_activity) #new install
             ],
             [
-                parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI'][product_class_savings][duty_type],
-                parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI'][product_class_savings][duty_type]
+                compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI']).lookup(product_class_savings, duty_type),
+                compile_table(parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI']).lookup(product_class_savings, duty_type)
             ])
                 
         #product EEI
@@ -229,27 +204,8 @@ class RF2_annual_energy_savings(Variable):
         #lifetime_by_rc_class
         display_area_savings =  buildings('RF2_total_display_area', period)
         
-        product_class_savings = np.select([
-            product_class_savings == RF2ProductClass.product_class_one,
-            product_class_savings == RF2ProductClass.product_class_two,
-            product_class_savings == RF2ProductClass.product_class_three,
-            product_class_savings == RF2ProductClass.product_class_four,
-            product_class_savings == RF2ProductClass.product_class_five,
-            product_class_savings == RF2ProductClass.product_class_six,
-            product_class_savings == RF2ProductClass.product_class_seven,
-            product_class_savings == RF2ProductClass.product_class_eight,
-            product_class_savings == RF2ProductClass.product_class_nine,
-            product_class_savings == RF2ProductClass.product_class_ten,
-            product_class_savings == RF2ProductClass.product_class_eleven,
-            product_class_savings == RF2ProductClass.product_class_twelve,
-            product_class_savings == RF2ProductClass.product_class_thirteen,
-            product_class_savings == RF2ProductClass.product_class_fourteen,
-            product_class_savings == RF2ProductClass.product_class_fifteen
-        ],
-        [
-            1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15
-        ]
-        )
+        # Items are in class order, from Class 1
+        product_class_savings = product_class_savings.codes + 1
                 
         lifetime_by_rc_class = np.select(
             [
@@ -299,7 +255,7 @@ class RF2_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('RF2_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode) 
+        regional_network_factor = postcode_lookup(rnf, postcode) 
 
         #electricity savings
         annual_energy_savings = deemed_electricity_savings * regional_network_factor
@@ -328,7 +284,7 @@ class RF2_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('RF2_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode) 
+        return postcode_lookup(rnf, postcode) 
 
 
 class RF2_electricity_savings(Variable):
@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_table
 
 
 """ Parameters for RF2 ESC Calculation
@@ -42,44 +43,9 @@ class RF2_af(Variable):
     label = "Adjustment factor"
 
     def formula(buildings, period, parameters):
-      product_class = buildings('RF2_product_class', period)
+      product_class = RF2_PRODUCT_CLASS_KEYS(buildings('RF2_product_class', period))
       duty_type = buildings('RF2_duty_class', period)
       new_equipment = buildings('RF2_replacement_activity', period)
-    
-      product_class = np.select([
-          product_class == 'Class 1',
-          product_class == 'Class 2',
-          product_class == 'Class 3',
-          product_class == 'Class 4',
-          product_class == 'Class 5',
-          product_class == 'Class 6',
-          product_class == 'Class 7',
-          product_class == 'Class 8',
-          product_class == 'Class 9',
-          product_class == 'Class 10',
-          product_class == 'Class 11',
-          product_class == 'Class 12',
-          product_class == 'Class 13',
-          product_class == 'Class 14',
-          product_class == 'Class 15',
-        ], 
-        [
-          RF2ProductClass.product_class_one,
-          RF2ProductClass.product_class_two,
-          RF2ProductClass.product_class_three,
-          RF2ProductClass.product_class_four,
-          RF2ProductClass.product_class_five,
-          RF2ProductClass.product_class_six,
-          RF2ProductClass.product_class_seven,
-          RF2ProductClass.product_class_eight,
-          RF2ProductClass.product_class_nine,
-          RF2ProductClass.product_class_ten,
-          RF2ProductClass.product_class_eleven,
-          RF2ProductClass.product_class_twelve,
-          RF2ProductClass.product_class_thirteen,
-          RF2ProductClass.product_class_fourteen,
-          RF2ProductClass.product_class_fifteen         
-        ])
       
       af = np.select(
         [ 
@@ -87,8 +53,8 @@ class RF2_af(Variable):
           np.logical_not(new_equipment)
         ],
         [ 
-          parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor'][product_class][duty_type],
-          parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor'][product_class][duty_type]
+          compile_table(parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor']).lookup(product_class, duty_type),
+          compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor']).lookup(product_class, duty_type)
         ]
       )
       return af
@@ -101,44 +67,9 @@ class RF2_baseline_EEI(Variable):
     label = "Baseline EEI"
   
     def formula(buildings, period, parameters):
-      product_class = buildings('RF2_product_class', period)
+      product_class = RF2_PRODUCT_CLASS_KEYS(buildings('RF2_product_class', period))
       duty_type = buildings('RF2_duty_class', period)
       replacement_activity = buildings('RF2_replacement_activity', period)
-    
-      product_class = np.select([
-          product_class == 'Class 1',
-          product_class == 'Class 2',
-          product_class == 'Class 3',
-          product_class == 'Class 4',
-          product_class == 'Class 5',
-          product_class == 'Class 6',
-          product_class == 'Class 7',
-          product_class == 'Class 8',
-          product_class == 'Class 9',
-          product_class == 'Class 10',
-          product_class == 'Class 11',
-          product_class == 'Class 12',
-          product_class == 'Class 13',
-          product_class == 'Class 14',
-          product_class == 'Class 15',
-        ], 
-        [
-          RF2ProductClass.product_class_one,
-          RF2ProductClass.product_class_two,
-          RF2ProductClass.product_class_three,
-          RF2ProductClass.product_class_four,
-          RF2ProductClass.product_class_five,
-          RF2ProductClass.product_class_six,
-          RF2ProductClass.product_class_seven,
-          RF2ProductClass.product_class_eight,
-          RF2ProductClass.product_class_nine,
-          RF2ProductClass.product_class_ten,
-          RF2ProductClass.product_class_eleven,
-          RF2ProductClass.product_class_twelve,
-          RF2ProductClass.product_class_thirteen,
-          RF2ProductClass.product_class_fourteen,
-          RF2ProductClass.product_class_fifteen         
-        ])
 
       baseline_EEI = np.select(
         [ 
@@ -146,8 +77,8 @@ class RF2_baseline_EEI(Variable):
           np.logical_not(replacement_activity)
         ],
         [ 
-          parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI'][product_class][duty_type],
-          parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI'][product_class][duty_type]
+          compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI']).lookup(product_class, duty_type),
+          compile_table(parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI']).lookup(product_class, duty_type)
         ]
       )    
       return baseline_EEI
@@ -183,6 +114,14 @@ class RF2ProductClass(Enum):
     product_class_fifteen = 'Class 15'
 
 
+RF2_PRODUCT_CLASS_KEYS = EnumKeys(RF2ProductClass, tables = [
+    ('ESS.HEAB.table_F1_1_1.adjustment_factor', 0),
+    ('ESS.HEAB.table_F1_1_1.baseline_EEI', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.adjustment_factor', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.baseline_EEI', 0),
+    ])
+
+
 class RF2_product_class(Variable):
     value_type = str
     entity = Building
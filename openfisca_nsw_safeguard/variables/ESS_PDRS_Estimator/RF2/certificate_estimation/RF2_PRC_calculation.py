@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import EnumKeys, compile_table
 
 
 class RF2_baseline_input_power(Variable):
@@ -70,6 +71,14 @@ class RF2ProductClass(Enum):
     product_class_fifteen = 'Class 15'
 
 
+RF2_PRODUCT_CLASS_KEYS = EnumKeys(RF2ProductClass, tables = [
+    ('ESS.HEAB.table_F1_1_1.adjustment_factor', 0),
+    ('ESS.HEAB.table_F1_1_1.baseline_EEI', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.adjustment_factor', 0),
+    ('PDRS.refrigerated_cabinets.table_RF2_1.baseline_EEI', 0),
+    ])
+
+
 class RF2_product_class_peak_savings(Variable):
     value_type = Enum
     entity = Building
@@ -135,75 +144,40 @@ class RF2_peak_demand_annual_savings(Variable):
 
     def formula(buildings, period, parameters):
         #product class
-        product_class = buildings('RF2_product_class', period)
+        product_class = RF2_PRODUCT_CLASS_KEYS(buildings('RF2_product_class', period))
 
         #duty class
         duty_type = buildings('RF2_duty_class', period)
         
-        product_class = np.select([
-            product_class == 'Class 1',
-            product_class == 'Class 2',
-            product_class == 'Class 3',
-            product_class == 'Class 4',
-            product_class == 'Class 5',
-            product_class == 'Class 6',
-            product_class == 'Class 7',
-            product_class == 'Class 8',
-            product_class == 'Class 9',
-            product_class == 'Class 10',
-            product_class == 'Class 11',
-            product_class == 'Class 12',
-            product_class == 'Class 13',
-            product_class == 'Class 14',
-            product_class == 'Class 15',
-        ], 
-        [
-            RF2ProductClass.product_class_one,
-            RF2ProductClass.product_class_two,
-            RF2ProductClass.product_class_three,
-            RF2ProductClass.product_class_four,
-            RF2ProductClass.product_class_five,
-            RF2ProductClass.product_class_six,
-            RF2ProductClass.product_class_seven,
-            RF2ProductClass.product_class_eight,
-            RF2ProductClass.product_class_nine,
-            RF2ProductClass.product_class_ten,
-            RF2ProductClass.product_class_eleven,
-            RF2ProductClass.product_class_twelve,
-            RF2ProductClass.product_class_thirteen,
-            RF2ProductClass.product_class_fourteen,
-            RF2ProductClass.product_class_fifteen         
-      ])
-        
         #product type
         is_integral_RDC = (
-                            (product_class == RF2ProductClass.product_class_one) +
-                            (product_class == RF2ProductClass.product_class_two) +
-                            (product_class == RF2ProductClass.product_class_seven) +
-                            (product_class == RF2ProductClass.product_class_eight) +
-                            (product_class == RF2ProductClass.product_class_eleven)
+                            (product_class.codes == RF2ProductClass.product_class_one.index) +
+                            (product_class.codes == RF2ProductClass.product_class_two.index) +
+                            (product_class.codes == RF2ProductClass.product_class_seven.index) +
+                            (product_class.codes == RF2ProductClass.product_class_eight.index) +
+                            (product_class.codes == RF2ProductClass.product_class_eleven.index)
                             )
 
         is_integral_ice_cream_freezer_cabinet = (
-                            (product_class == RF2ProductClass.product_class_five)
+                            (product_class.codes == RF2ProductClass.product_class_five.index)
         )
 
         is_remote_RDC = (
-                            (product_class == RF2ProductClass.product_class_twelve) +
-                            (product_class == RF2ProductClass.product_class_thirteen) +
-                            (product_class == RF2ProductClass.product_class_fourteen) +
-                            (product_class == RF2ProductClass.product_class_fifteen)
+                            (product_class.codes == RF2ProductClass.product_class_twelve.index) +
+                            (product_class.codes == RF2ProductClass.product_class_thirteen.index) +
+                            (product_class.codes == RF2ProductClass.product_class_fourteen.index) +
+                            (product_class.codes == RF2ProductClass.product_class_fifteen.index)
         )
 
         is_gelato_or_icecream_scooping_cabinets = (
-                            (product_class == RF2ProductClass.product_class_six)
+                            (product_class.codes == RF2ProductClass.product_class_six.index)
         )
 
         is_RSC = (
-                            (product_class == RF2ProductClass.product_class_three) +
-                            (product_class == RF2ProductClass.product_class_four) +
-                            (product_class == RF2ProductClass.product_class_nine) +
-                            (product_class == RF2ProductClass.product_class_ten)
+                            (product_class.codes == RF2ProductClass.product_class_three.index) +
+                            (product_class.codes == RF2ProductClass.product_class_four.index) +
+                            (product_class.codes == RF2ProductClass.product_class_nine.index) +
+                            (product_class.codes == RF2ProductClass.product_class_ten.index)
         )
 
         product_type = np.select(
@@ -238,8 +212,8 @@ class RF2_peak_demand_annual_savings(Variable):
                 replacement_activity
             ],
             [
-                parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor'][product_class][duty_type],
-                parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor'][product_class][duty_type]
+                compile_table(parameters(period).ESS.HEAB.table_F1_1_1['adjustment_factor']).lookup(product_class, duty_type),
+                compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['adjustment_factor']).lookup(product_class, duty_type)
             ])
         
         #tec
@@ -252,8 +226,8 @@ class RF2_peak_demand_annual_savings(Variable):
                 np.logical_not(replacement_activity) #new install
             ],
             [
-                parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI'][product_class][duty_type],
-                parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI'][product_class][duty_type]
+                compile_table(parameters(period).PDRS.refrigerated_cabinets.table_RF2_1['baseline_EEI']).lookup(product_class, duty_type),
+                compile_table(parameters(period).ESS.HEAB.table_F1_1_1['baseline_EEI']).lookup(product_class, duty_type)
             ])
 
         #product EEI
@@ -280,27 +254,8 @@ class RF2_peak_demand_annual_savings(Variable):
         #lifetime
         display_area_savings =  buildings('RF2_total_display_area', period)
         
-        product_class = np.select([
-            product_class == RF2ProductClass.product_class_one,
-            product_class == RF2ProductClass.product_class_two,
-            product_class == RF2ProductClass.product_class_three,
-            product_class == RF2ProductClass.product_class_four,
-            product_class == RF2ProductClass.product_class_five,
-            product_class == RF2ProductClass.product_class_six,
-            product_class == RF2ProductClass.product_class_seven,
-            product_class == RF2ProductClass.product_class_eight,
-            product_class == RF2ProductClass.product_class_nine,
-            product_class == RF2ProductClass.product_class_ten,
-            product_class == RF2ProductClass.product_class_eleven,
-            product_class == RF2ProductClass.product_class_twelve,
-            product_class == RF2ProductClass.product_class_thirteen,
-            product_class == RF2ProductClass.product_class_fourteen,
-            product_class == RF2ProductClass.product_class_fifteen
-        ],
-        [
-            1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15
-        ]
-        )
+        # Items are in class order, from Class 1
+        product_class = product_class.codes + 1
 
         lifetime_by_rc_class = np.select(
             [
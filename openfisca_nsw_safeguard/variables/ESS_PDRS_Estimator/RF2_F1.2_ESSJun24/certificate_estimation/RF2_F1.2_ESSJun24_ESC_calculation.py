@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class RF2_F1_2_ESSJun24_input_power(Variable):
@@ -213,7 +214,7 @@ class RF2_F1_2_ESSJun24_annual_energy_savings(Variable):
         #regional network factor
         postcode = buildings('RF2_F1_2_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode) 
+        regional_network_factor = postcode_lookup(rnf, postcode) 
 
         #electricity savings
         annual_energy_savings = deemed_electricity_savings * regional_network_factor
@@ -242,7 +243,7 @@ class RF2_F1_2_ESSJun24_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('RF2_F1_2_ESSJun24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode) 
+        return postcode_lookup(rnf, postcode) 
 
 
 class RF2_F1_2_ESSJun24_electricity_savings(Variable):
@@ -268,6 +269,9 @@ class RF2_F1_2_ESSJun24_ESC_calculation(Variable):
     entity = Building
     definition_period = ETERNITY
     label = 'The number of ESCs for HVAC1'
+    metadata = {
+        'zero-unless': 'RF2_F1_2_ESSJun24_product_minimum_EEI_eligibility'
+    }
 
     def formula(buildings, period, parameters):
       electricity_savings = buildings('RF2_F1_2_ESSJun24_electricity_savings', period)
@@ -350,7 +350,8 @@ class RF2_F1_2_ESSJun24_PRC_calculation(Variable):
     definition_period = ETERNITY
     metadata = {
         'label' : 'The number of PRCs for RF2_F1_2_ESSJun24',
-        'variable-type' : 'output'
+        'variable-type' : 'output',
+        'zero-unless' : 'RF2_F1_2_ESSJun24_product_minimum_EEI_eligibility'
     }
 
     def formula(buildings, period, parameters):
@@ -5,6 +5,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class SYS1_asset_life(Variable):
@@ -413,7 +414,7 @@ class SYS1_energy_savings(Variable):
         #regional network factor
         postcode = buildings('SYS1_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #electricity savings
         annual_energy_savings = (deemed_electricity_savings * regional_network_factor)
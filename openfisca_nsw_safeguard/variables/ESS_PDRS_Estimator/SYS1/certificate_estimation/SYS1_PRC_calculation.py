@@ -5,6 +5,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class SYS1_baseline_input_power(Variable):
@@ -211,7 +212,7 @@ class SYS1_peak_demand_annual_savings(Variable):
         #BCA climate zozne  
         postcode = buildings('SYS1_PDRS__postcode', period)
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         climate_zone_savings = np.select(
             [
                 climate_zone_int == 1,
@@ -4,6 +4,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 
@@ -34,7 +35,7 @@ class SYS1_get_network_loss_factor_by_postcode(Variable):
         postcode = building('SYS1_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
+        return postcode_lookup(network_loss_factor, postcode)
 
 
 class SYS1_BCA_climate_zone_by_postcode(Variable):
@@ -51,7 +52,7 @@ class SYS1_BCA_climate_zone_by_postcode(Variable):
         postcode = buildings('SYS1_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         cooling_capacity_to_check = np.select(
             [
                 climate_zone_int == 1,
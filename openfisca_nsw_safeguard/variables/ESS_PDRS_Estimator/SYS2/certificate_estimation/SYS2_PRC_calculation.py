@@ -3,6 +3,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import compile_table
 
 
 class SYS2_peak_demand_savings_capacity(Variable):
@@ -138,7 +139,7 @@ class SYS2_peak_demand_annual_savings(Variable):
         pool_pump_type = buildings('SYS2_pool_pump_type', period)
         star_rating = buildings('SYS2_star_rating', period)
         
-        input_power = parameters(period).PDRS.pool_pumps.table_sys2_2['input_power'][pool_size_int][star_rating][pool_pump_type]
+        input_power = compile_table(parameters(period).PDRS.pool_pumps.table_sys2_2['input_power']).lookup(pool_size_int, star_rating, pool_pump_type)
      
         #peak adjustment factor
         peak_adjustment_factor = parameters(period).PDRS.table_A4_adjustment_factors['peak_adjustment']['SYS2']
@@ -5,6 +5,8 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import compile_table
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class SYS2PoolSize(Enum):
@@ -102,7 +104,7 @@ class SYS2_input_power(Variable):
         pool_pump_type = buildings('SYS2_pool_pump_type', period)
         star_rating = buildings('SYS2_star_rating', period)
 
-        input_power = parameters(period).PDRS.pool_pumps.table_sys2_2['input_power'][pool_size][star_rating][pool_pump_type]
+        input_power = compile_table(parameters(period).PDRS.pool_pumps.table_sys2_2['input_power']).lookup(pool_size, star_rating, pool_pump_type)
         return input_power
 
 
@@ -119,4 +121,4 @@ class SYS2_get_network_loss_factor_by_postcode(Variable):
         postcode = building('SYS2_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
\ No newline at end of file
+        return postcode_lookup(network_loss_factor, postcode)
\ No newline at end of file
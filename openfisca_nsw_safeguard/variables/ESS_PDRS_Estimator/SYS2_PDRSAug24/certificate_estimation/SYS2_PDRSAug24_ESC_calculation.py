@@ -4,6 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class SYS2_PDRSAug24_PDRS__regional_network_factor(Variable):
@@ -22,8 +23,7 @@ class SYS2_PDRSAug24_PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('SYS2_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
+        return postcode_lookup(rnf, postcode)
 
 
 class SYS2_PDRSAug24_deemed_activity_electricity_savings(Variable):
@@ -81,7 +81,7 @@ class SYS2_PDRSAug24_energy_savings(Variable):
         #regional network factor
         postcode = buildings('SYS2_PDRSAug24_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        regional_network_factor = rnf.calc(postcode)
+        regional_network_factor = postcode_lookup(rnf, postcode)
 
         #annual energy savings
         annual_energy_savings = deemed_electricity_savings * regional_network_factor
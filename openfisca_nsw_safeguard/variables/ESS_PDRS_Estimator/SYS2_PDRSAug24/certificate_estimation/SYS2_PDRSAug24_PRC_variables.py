@@ -5,6 +5,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class SYS2_PDRSAug24_input_power(Variable):
@@ -60,4 +61,4 @@ class SYS2_PDRSAug24_get_network_loss_factor_by_postcode(Variable):
         postcode = building('SYS2_PDRSAug24_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
\ No newline at end of file
+        return postcode_lookup(network_loss_factor, postcode)
\ No newline at end of file
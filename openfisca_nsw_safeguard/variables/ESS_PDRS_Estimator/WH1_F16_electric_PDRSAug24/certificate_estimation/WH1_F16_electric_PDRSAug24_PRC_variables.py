@@ -4,6 +4,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for WH1 PRC Calculation
@@ -84,7 +85,7 @@ class WH1_F16_electric_PDRSAug24_BCA_climate_zone_by_postcode(Variable):
         postcode = buildings('WH1_F16_electric_PDRSAug24_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
         BCA_climate_zone_to_check = np.select(
             [
                 climate_zone_int == 1,
@@ -122,7 +123,7 @@ class WH1_F16_electric_PDRSAug24_BCA_climate_zone_by_postcode_int(Variable):
         postcode = buildings('WH1_F16_electric_PDRSAug24_PDRS__postcode', period)
         # Returns an integer
         climate_zone = parameters(period).ESS.ESS_general.table_A26_BCA_climate_zone_by_postcode       
-        climate_zone_int = climate_zone.calc(postcode)
+        climate_zone_int = postcode_lookup(climate_zone, postcode)
 
         return climate_zone_int
     
@@ -153,7 +154,7 @@ class WH1_F16_electric_PDRSAug24_get_network_loss_factor_by_postcode(Variable):
         postcode = building('WH1_F16_electric_PDRSAug24_PDRS__postcode', period)
         network_loss_factor = parameters(period).PDRS.table_network_loss_factor_by_postcode
 
-        return network_loss_factor.calc(postcode)
+        return postcode_lookup(network_loss_factor, postcode)
 
 
 class WH1_F16_electric_PDRSAug24_annual_energy_savings_eligible(Variable):
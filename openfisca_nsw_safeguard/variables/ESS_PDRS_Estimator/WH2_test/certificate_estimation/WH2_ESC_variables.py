@@ -3,6 +3,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 """ Parameters for WH2_test ESC Calculation
@@ -87,7 +88,7 @@ class WH2_test_regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('WH2_test_PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)
+        return postcode_lookup(rnf, postcode)
 
 
 class WH2_test_replacement_activity(Variable):
@@ -6,6 +6,7 @@ import numpy as np
 
 from datetime import datetime as py_datetime
 from datetime import date
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class ESS__meets_overall_eligibility_requirements(Variable):
@@ -149,7 +150,7 @@ class ESS__activity_occurred_in_Metro_Levy_Area(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('ESS__postcode', period)
         metro_levy_areas = parameters(period).ESS.ESS_general.table_A25_metro_levy_area
-        return metro_levy_areas.calc(postcode)
+        return postcode_lookup(metro_levy_areas, postcode)
 
 
 class ESS__lighting_mercury_disposed_appropriately(Variable):
@@ -2,6 +2,7 @@ from openfisca_core.variables import Variable
 from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class ESS__regional_network_factor(Variable):
@@ -21,5 +22,4 @@ class ESS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('ESS__postcode', period)
         rnf = parameters(period).ESS.ESS_general.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
+        return postcode_lookup(rnf, postcode)
@@ -5,6 +5,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 from openfisca_core.variables import Variable
 from openfisca_nsw_safeguard.regulation_reference import PDRS_2022, ESS_2021
+from openfisca_nsw_safeguard.parameter_tables import compile_table
 
 
 class PDRS_AC_baseline_input_power(Variable):
@@ -79,8 +80,8 @@ class Air_Conditioner__baseline_AEER(Variable):
                                     installation_type == install_or_replacement.replacement,
                                     ],
                                     [
-                                        parameters(period).PDRS.AC.table_D16_2['AEER'][product_class][cooling_capacity],
-                                        parameters(period).PDRS.AC.table_D16_3['AEER'][product_class][cooling_capacity]
+                                        compile_table(parameters(period).PDRS.AC.table_D16_2['AEER']).lookup(product_class, cooling_capacity),
+                                        compile_table(parameters(period).PDRS.AC.table_D16_3['AEER']).lookup(product_class, cooling_capacity)
                                     ])
         return baseline_AEER
 
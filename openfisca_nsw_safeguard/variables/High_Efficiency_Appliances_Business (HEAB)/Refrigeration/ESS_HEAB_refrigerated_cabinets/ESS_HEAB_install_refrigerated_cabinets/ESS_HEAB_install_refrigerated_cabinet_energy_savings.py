@@ -6,6 +6,7 @@ from openfisca_nsw_base.entities import Building
 
 from openfisca_nsw_safeguard.regulation_reference import PDRS_2022
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import compile_table
 
 
 class ESS_HEAB_install_refrigerated_cabinet_electricity_savings(Variable):
@@ -25,7 +26,7 @@ class ESS_HEAB_install_refrigerated_cabinet_electricity_savings(Variable):
             'refrigerated_cabinet_product_class', period)
         duty_class = buildings(
             'refrigerated_cabinet_duty_class', period) 
-        baseline_EEI = parameters(period).ESS.HEAB.table_F1_1_1.baseline_EEI[product_class][duty_class]
+        baseline_EEI = compile_table(parameters(period).ESS.HEAB.table_F1_1_1.baseline_EEI).lookup(product_class, duty_class)
         product_EEI = buildings(
             'new_refrigerated_cabinet_EEI', period)
         total_display_area = buildings('new_refrigerated_cabinet_total_display_area', period)
@@ -35,7 +36,7 @@ class ESS_HEAB_install_refrigerated_cabinet_electricity_savings(Variable):
                                         '3_3m2_or_greater'
                                         )
 
-        adjustment_factor = parameters(period).ESS.HEAB.table_F1_1_1.adjustment_factor[product_class][duty_class]
+        adjustment_factor = compile_table(parameters(period).ESS.HEAB.table_F1_1_1.adjustment_factor).lookup(product_class, duty_class)
         product_lifetime = parameters(period).ESS.HEAB.table_F1_1_2.lifetime[product_class][total_display_area]
         energy_savings =    (
                                 total_energy_consumption *
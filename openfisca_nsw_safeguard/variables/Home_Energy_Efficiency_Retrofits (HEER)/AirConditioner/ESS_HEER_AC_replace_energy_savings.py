@@ -5,6 +5,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 from openfisca_core.variables import Variable
 from openfisca_nsw_safeguard.regulation_reference import PDRS_2022, ESS_2021
+from openfisca_nsw_safeguard.parameter_tables import compile_table
 
 
 class ESS_HEER_AC_replace_electricity_savings(Variable):
@@ -84,7 +85,7 @@ class ESS_HEER_AC_replace_reference_cooling_annual_energy_use(Variable):
         equivalent_cooling_hours = (
             parameters(period).ESS.HEER.table_D16_1['equivalent_cooling_hours'][climate_zone])
         baseline_cooling_AEER = (
-            parameters(period).ESS.HEER.table_D16_3['AEER'][product_type][cooling_capacity])
+            compile_table(parameters(period).ESS.HEER.table_D16_3['AEER']).lookup(product_type, cooling_capacity))
         return(
             (
                 AC_cooling_capacity *
@@ -156,7 +157,7 @@ class ESS_HEER_AC_replace_reference_heating_annual_energy_use(Variable):
         equivalent_heating_hours = (
             parameters(period).ESS.HEER.table_D16_1['equivalent_heating_hours'][climate_zone])
         baseline_heating_ACOP = (
-            parameters(period).ESS.HEER.table_D16_3['ACOP'][product_type][heating_capacity])
+            compile_table(parameters(period).ESS.HEER.table_D16_3['ACOP']).lookup(product_type, heating_capacity))
         return(
             (
                 AC_heating_capacity *
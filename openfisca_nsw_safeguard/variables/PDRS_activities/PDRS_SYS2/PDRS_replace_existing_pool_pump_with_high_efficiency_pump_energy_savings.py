@@ -4,7 +4,7 @@ from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 from openfisca_nsw_safeguard.regulation_reference import PDRS_2022, ESS_2021
 
-import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import compile_bins, compile_table
 
 class PDRS_replace_existing_pool_pump_with_high_efficiency_pump_peak_demand_savings(Variable):
     value_type = float
@@ -58,41 +58,10 @@ class PDRS_replace_existing_pool_pump_with_high_efficiency_pump_baseline_input_p
 
     def formula(buildings, period, parameters):
         new_pump_pool_volume = buildings('PDRS_new_pump_pool_volume', period)
-        pool_volume = np.select([
-                                    (new_pump_pool_volume < 20000),
-                                    (
-                                        (new_pump_pool_volume >= 20000) * 
-                                        (new_pump_pool_volume <= 30000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 30001) * 
-                                        (new_pump_pool_volume < 40000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 40001) * 
-                                        (new_pump_pool_volume < 50000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 50001) * 
-                                        (new_pump_pool_volume < 60000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 60001) * 
-                                        (new_pump_pool_volume < 70000)
-                                    ),
-                                    (new_pump_pool_volume >= 70001),
-        ],
-        [
-            'under_20000_L',
-            '20000_to_30000_L',
-            '30001_to_40000_L',
-            '40001_to_50000_L',
-            '50001_to_60000_L',
-            '60001_to_70000_L',
-            'over_70000_L',
-        ])
-        baseline_input_power = (
-            parameters(period).PDRS.pool_pumps.table_sys2_1.baseline_input_power[pool_volume])
+        pool_volume = compile_bins(parameters(period).PDRS.pool_pumps.table_sys2_bins.pool_volume)(
+            new_pump_pool_volume)
+        baseline_input_power = compile_table(
+            parameters(period).PDRS.pool_pumps.table_sys2_1.baseline_input_power).lookup(pool_volume)
         return baseline_input_power
 
 
@@ -108,44 +77,13 @@ class PDRS_replace_existing_pool_pump_with_high_efficiency_pump_input_power(Vari
 
     def formula(buildings, period, parameters):
         new_pump_pool_volume = buildings('PDRS_new_pump_pool_volume', period)
-        pool_volume = np.select([
-                                    (new_pump_pool_volume < 20000),
-                                    (
-                                        (new_pump_pool_volume >= 20000) * 
-                                        (new_pump_pool_volume <= 30000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 30001) * 
-                                        (new_pump_pool_volume <= 40000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 40001) * 
-                                        (new_pump_pool_volume <= 50000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 50001) * 
-                                        (new_pump_pool_volume <= 60000)
-                                    ),
-                                    (
-                                        (new_pump_pool_volume >= 60001) * 
-                                        (new_pump_pool_volume <= 70000)
-                                    ),
-                                    (new_pump_pool_volume >= 70001),
-        ],
-        [
-            'under_20000_L',
-            '20000_to_30000_L',
-            '30001_to_40000_L',
-            '40001_to_50000_L',
-            '50001_to_60000_L',
-            '60001_to_70000_L',
-            'over_70000_L',
-        ])
+        pool_volume = compile_bins(parameters(period).PDRS.pool_pumps.table_sys2_bins.pool_volume)(
+            new_pump_pool_volume)
         star_rating = buildings('ESS_and_PDRS_new_pump_star_rating', period)
         pump_type = buildings('ESS_and_PDRS_new_pool_pump_type', period)
-        input_power = (parameters(period).
-            PDRS.pool_pumps.table_sys2_2.input_power
-            [pool_volume][star_rating][pump_type])
+        input_power = compile_table(parameters(period).
+            PDRS.pool_pumps.table_sys2_2.input_power).lookup(
+            pool_volume, star_rating, pump_type)
         return input_power
 
 class PDRS_new_pump_pool_volume(Variable):
@@ -3,6 +3,7 @@ from openfisca_core.periods import ETERNITY
 from openfisca_core.indexed_enums import Enum
 from openfisca_nsw_base.entities import Building
 import numpy as np
+from openfisca_nsw_safeguard.parameter_tables import postcode_lookup
 
 
 class PDRS_number_of_peak_demand_reduction_certificates(Variable):
@@ -90,5 +91,4 @@ class PDRS__regional_network_factor(Variable):
     def formula(buildings, period, parameters):
         postcode = buildings('PDRS__postcode', period)
         rnf = parameters(period).PDRS.table_A24_regional_network_factor
-        return rnf.calc(postcode)  # This is a built in OpenFisca function that \
-        # is used to calculate a single value for regional network factor based on a zipcode provided
\ No newline at end of file
+        return postcode_lookup(rnf, postcode)
\ No newline at end of file
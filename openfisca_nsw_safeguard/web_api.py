@@ -0,0 +1,522 @@
+""" Web API of the package: OpenFisca's, plus the extensions below.
+
+    `openfisca serve` builds OpenFisca's web API around the tax and benefit
+    system. `create_app` builds the same API, then installs this package's
+    extensions on it. It is served with gunicorn:
+
+    Example::
+        OPENFISCA_NSW_SAFEGUARD_CALCULATE_CACHE=shared \\
+            gunicorn --workers 3 --bind 0.0.0.0:8000 'openfisca_nsw_safeguard.web_api:create_app()'
+
+    Extensions:
+
+    - the `/calculate` result cache, opt-in through
+      `OPENFISCA_NSW_SAFEGUARD_CALCULATE_CACHE`: `memory` keeps results in
+      each worker, `shared` also keeps them on disk, where every worker of
+      the server reads them. `..._CALCULATE_CACHE_SIZE` (1024 results by
+      default) and `..._CALCULATE_CACHE_TTL` (3600 seconds by default) bound
+      it. Responses tell whether they were cached in their `X-Cache` header,
+      and `/calculate/cache` returns the counters of the worker.
+    - the `/calculate` micro-batching, opt-in through
+      `OPENFISCA_NSW_SAFEGUARD_CALCULATE_BATCH_WINDOW`: concurrent requests
+      received within that many milliseconds are computed in a single
+      simulation (see `coalescer`), up to `..._CALCULATE_BATCH_SIZE` (500 by
+      default). It needs workers serving several threads, e.g. gunicorn's
+      `--threads 32`. `/calculate/batches` returns the counters of the
+      worker.
+    - calculation sessions, opt-in through `OPENFISCA_NSW_SAFEGUARD_SESSIONS`,
+      the number of sessions each worker keeps open: `POST /sessions` opens
+      a session for an `activity` (or `outputs`) at a `period`, with
+      `inputs`. `PATCH /sessions/<id>` sets changed `inputs` and returns
+      the outputs, recomputing only what depends on them (see `sessions`).
+      Sessions close after `..._SESSION_TTL` idle seconds (900 by default)
+      or on `DELETE /sessions/<id>`. They live in the worker that opened
+      them, so the server must run a single worker, e.g. with
+      `--workers 1 --threads 32`, or route sessions to their worker.
+    - `POST /sweep`, opt-in through `OPENFISCA_NSW_SAFEGUARD_SWEEP`:
+      computes outputs over axes of inputs in a single simulation (see
+      `sweep`), up to `..._SWEEP_MAX_ROWS` combinations (100000 by default).
+    - `POST /solve`, opt-in through `OPENFISCA_NSW_SAFEGUARD_SOLVE`:
+      searches for the least value of an input reaching a target output
+      (see `solver`).
+    - `GET /form-schemas/<activity>`, the questions and outputs of an
+      activity in one document (see `form_schema`), and `GET /form-schemas`,
+      the activities it is served for. They are compressed for clients
+      accepting gzip, and carry an ETag and a Last-Modified date, so that
+      clients revalidate them with conditional requests.
+    - `POST /profile`, opt-in through `OPENFISCA_NSW_SAFEGUARD_PROFILE`:
+      takes the body of a `/calculate` request, and returns the time spent
+      in each formula and parameter lookup of its calculations, and their
+      collapsed stacks for a flame graph (see `profiler`).
+    - `GET /metrics`, opt-in through `OPENFISCA_NSW_SAFEGUARD_METRICS`: the
+      request counts and latencies, rows computed, memory and cache
+      statistics of every worker of the server, in the text exposition
+      format of Prometheus (see `metrics`). Workers share their metrics
+      through files in the package cache, or in the directory
+      `OPENFISCA_NSW_SAFEGUARD_METRICS` names, when it is set to a path
+      rather than to 1.
+"""
+
+import datetime
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+from flask import abort, g, jsonify, make_response, request
+from openfisca_core.errors import PeriodMismatchError, SituationParsingError
+
+from openfisca_nsw_safeguard.caching import cache_directory, distribution_version, openfisca_core_version
+from openfisca_nsw_safeguard.coalescer import CalculationCoalescer
+from openfisca_nsw_safeguard.form_schema import load_form_schemas
+from openfisca_nsw_safeguard.metrics import Metrics, metrics_directory
+from openfisca_nsw_safeguard.profiler import Profile
+from openfisca_nsw_safeguard.result_cache import ResultCache
+from openfisca_nsw_safeguard.sessions import SessionError, SessionStore
+from openfisca_nsw_safeguard.solver import SolverError, solve
+from openfisca_nsw_safeguard.sweep import MAX_ROWS, SweepError, sweep
+
+log = logging.getLogger(__name__)
+
+CALCULATE_CACHE_ENV = 'OPENFISCA_NSW_SAFEGUARD_CALCULATE_CACHE'
+CALCULATE_CACHE_SIZE_ENV = 'OPENFISCA_NSW_SAFEGUARD_CALCULATE_CACHE_SIZE'
+CALCULATE_CACHE_TTL_ENV = 'OPENFISCA_NSW_SAFEGUARD_CALCULATE_CACHE_TTL'
+CALCULATE_BATCH_WINDOW_ENV = 'OPENFISCA_NSW_SAFEGUARD_CALCULATE_BATCH_WINDOW'
+CALCULATE_BATCH_SIZE_ENV = 'OPENFISCA_NSW_SAFEGUARD_CALCULATE_BATCH_SIZE'
+SESSIONS_ENV = 'OPENFISCA_NSW_SAFEGUARD_SESSIONS'
+SESSION_TTL_ENV = 'OPENFISCA_NSW_SAFEGUARD_SESSION_TTL'
+SWEEP_ENV = 'OPENFISCA_NSW_SAFEGUARD_SWEEP'
+SWEEP_MAX_ROWS_ENV = 'OPENFISCA_NSW_SAFEGUARD_SWEEP_MAX_ROWS'
+SOLVE_ENV = 'OPENFISCA_NSW_SAFEGUARD_SOLVE'
+PROFILE_ENV = 'OPENFISCA_NSW_SAFEGUARD_PROFILE'
+METRICS_ENV = 'OPENFISCA_NSW_SAFEGUARD_METRICS'
+
+
+def rules_version():
+    """ Identifies the rules results are computed with: the versions of this
+        package and of OpenFisca-Core, and the content of the parameter and
+        variable files.
+    """
+    from openfisca_nsw_safeguard import COUNTRY_DIR
+    from openfisca_nsw_safeguard.parameter_snapshot import parameters_hash
+    from openfisca_nsw_safeguard.variable_manifest import variables_hash
+
+    return ';'.join([
+        distribution_version('openfisca_nsw_safeguard'),
+        openfisca_core_version(),
+        parameters_hash(os.path.join(COUNTRY_DIR, 'parameters')),
+        variables_hash(os.path.join(COUNTRY_DIR, 'variables')),
+        ])
+
+
+def calculate_cache_from_environment():
+    """ The `/calculate` result cache configured by the environment, or None
+        if it is not enabled.
+    """
+    mode = os.environ.get(CALCULATE_CACHE_ENV, '').lower()
+    if mode in ('', '0', 'false', 'no'):
+        return None
+    if mode not in ('1', 'true', 'yes', 'memory', 'shared'):
+        raise ValueError("{} must be 'memory' or 'shared', not '{}'.".format(CALCULATE_CACHE_ENV, mode))
+    return ResultCache(
+        max_entries = int(os.environ.get(CALCULATE_CACHE_SIZE_ENV, 1024)),
+        ttl = float(os.environ.get(CALCULATE_CACHE_TTL_ENV, 3600)),
+        directory = cache_directory('results') if mode == 'shared' else None,
+        version = rules_version(),
+        )
+
+
+def calculate_coalescer_from_environment(tax_benefit_system):
+    """ The `/calculate` micro-batching configured by the environment, or
+        None if it is not enabled.
+    """
+    window = float(os.environ.get(CALCULATE_BATCH_WINDOW_ENV, 0))
+    if window <= 0:
+        return None
+    from openfisca_web_api import handlers
+
+    return CalculationCoalescer(
+        tax_benefit_system,
+        functools.partial(handlers.calculate, tax_benefit_system),
+        window = window / 1000,
+        max_batch = int(os.environ.get(CALCULATE_BATCH_SIZE_ENV, 500)),
+        )
+
+
+def session_store_from_environment(tax_benefit_system):
+    """ The calculation sessions configured by the environment, or None if
+        they are not enabled.
+    """
+    max_sessions = int(os.environ.get(SESSIONS_ENV, 0))
+    if max_sessions <= 0:
+        return None
+    return SessionStore(tax_benefit_system, max_sessions = max_sessions,
+        ttl = float(os.environ.get(SESSION_TTL_ENV, 900)))
+
+
+def install_sessions(app, sessions):
+    """ Serves the calculation sessions of `sessions` on `/sessions`.
+    """
+
+    def session_error(message, code = 400):
+        abort(make_response(jsonify({'error': message}), code))
+
+    def session_response(session, outputs, code = 200):
+        return jsonify({'id': session.id, 'outputs': outputs}), code
+
+    def request_body():
+        body = request.get_json(silent = True)
+        if not isinstance(body, dict):
+            session_error('The request body must be a JSON object.')
+        return body
+
+    def open_session():
+        body = request_body()
+        try:
+            session, outputs = sessions.open(
+                activity = body.get('activity'),
+                outputs = body.get('outputs'),
+                period = body.get('period'),
+                inputs = body.get('inputs'),
+                )
+        except SessionError as error:
+            session_error(str(error))
+        return session_response(session, outputs, 201)
+
+    def update_session(session_id):
+        session = sessions.get(session_id)
+        if session is None:
+            session_error("No session '{}' is open.".format(session_id), 404)
+        try:
+            outputs = session.update(request_body().get('inputs'))
+        except SessionError as error:
+            session_error(str(error))
+        return session_response(session, outputs)
+
+    def close_session(session_id):
+        if not sessions.close(session_id):
+            session_error("No session '{}' is open.".format(session_id), 404)
+        return '', 204
+
+    app.add_url_rule('/sessions', 'open_session', open_session, methods = ['POST'])
+    app.add_url_rule('/sessions', 'sessions', lambda: jsonify(sessions.stats()))
+    app.add_url_rule('/sessions/<session_id>', 'update_session', update_session, methods = ['PATCH'])
+    app.add_url_rule('/sessions/<session_id>', 'close_session', close_session, methods = ['DELETE'])
+
+
+def install_sweep(app, tax_benefit_system, max_rows = MAX_ROWS):
+    """ Serves sweeps of `tax_benefit_system` on `/sweep`.
+    """
+
+    def sweep_view():
+        body = request.get_json(silent = True)
+        if not isinstance(body, dict):
+            abort(make_response(jsonify({'error': 'The request body must be a JSON object.'}), 400))
+        try:
+            result = sweep(
+                tax_benefit_system,
+                outputs = body.get('outputs'),
+                axes = body.get('axes'),
+                inputs = body.get('inputs'),
+                period = body.get('period'),
+                max_rows = max_rows,
+                )
+        except SweepError as error:
+            abort(make_response(jsonify({'error': str(error)}), 400))
+        return jsonify(result)
+
+    app.add_url_rule('/sweep', 'sweep', sweep_view, methods = ['POST'])
+
+
+def install_solve(app, tax_benefit_system):
+    """ Serves inverse queries of `tax_benefit_system` on `/solve`.
+    """
+
+    def solve_view():
+        body = request.get_json(silent = True)
+        if not isinstance(body, dict):
+            abort(make_response(jsonify({'error': 'The request body must be a JSON object.'}), 400))
+        missing = [key for key in ('output', 'variable', 'target', 'low', 'high') if key not in body]
+        if missing:
+            abort(make_response(jsonify({'error': 'Missing {}.'.format(', '.join(missing))}), 400))
+        try:
+            result = solve(
+                tax_benefit_system,
+                body['output'],
+                body['variable'],
+                body['target'],
+                body['low'],
+                body['high'],
+                inputs = body.get('inputs'),
+                period = body.get('period'),
+                tolerance = body.get('tolerance'),
+                )
+        except (SolverError, TypeError) as error:
+            abort(make_response(jsonify({'error': str(error)}), 400))
+        return jsonify(result)
+
+    app.add_url_rule('/solve', 'solve', solve_view, methods = ['POST'])
+
+
+def sweeping_from_environment():
+    """ Whether the environment enables `/sweep`.
+    """
+    return os.environ.get(SWEEP_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def solving_from_environment():
+    """ Whether the environment enables `/solve`.
+    """
+    return os.environ.get(SOLVE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def profiling_from_environment():
+    """ Whether the environment enables `/profile`.
+    """
+    return os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def metrics_from_environment():
+    """ The metrics configured by the environment, or None if they are not
+        enabled.
+    """
+    value = os.environ.get(METRICS_ENV, '')
+    if value.lower() in ('', '0', 'false', 'no'):
+        return None
+    root = cache_directory('metrics') if value.lower() in ('1', 'true', 'yes') else value
+    return Metrics(directory = metrics_directory(root))
+
+
+def install_metrics(app, metrics, tax_benefit_system, calculate_cache = None, calculate_coalescer = None,
+        sessions = None):
+    """ Records the requests of `app` in `metrics`, along with the counters
+        of the other extensions, and serves them on `/metrics`.
+    """
+
+    def extension_metrics():
+        collected = []
+        if getattr(tax_benefit_system, 'parameters_load_time', None) is not None:
+            collected.append(('openfisca_parameters_load_seconds', {}, tax_benefit_system.parameters_load_time))
+        if calculate_cache is not None:
+            stats = calculate_cache.stats()
+            collected.append(('openfisca_result_cache_hits_total', {}, stats['hits']))
+            collected.append(('openfisca_result_cache_misses_total', {}, stats['misses']))
+        if calculate_coalescer is not None:
+            stats = calculate_coalescer.stats()
+            collected.append(('openfisca_calculate_batched_requests_total', {}, stats['requests']))
+            collected.append(('openfisca_calculate_batches_total', {}, stats['batches']))
+        if sessions is not None:
+            collected.append(('openfisca_sessions_open', {}, sessions.stats()['open']))
+        return collected
+
+    metrics.add_collector(extension_metrics)
+
+    metrics.start()
+
+    @app.before_request
+    def start_timer():
+        # Started again in each worker forked after the app was created, e.g. by `gunicorn --preload`
+        metrics.start()
+        g.metrics_start = time.perf_counter()
+        if request.endpoint == 'calculate':
+            # Read before the view computes them, as it fills the values asked for in the request
+            g.metrics_variables = requested_variables(request.get_json(silent = True))
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.increment('openfisca_http_requests_total', {'route': route, 'status': str(response.status_code)})
+        metrics.observe('openfisca_http_request_duration_seconds', duration, {'route': route})
+        if request.endpoint == 'calculate' and response.status_code == 200:
+            for variable, rows in g.pop('metrics_variables', {}).items():
+                labels = {'variable': variable}
+                metrics.increment('openfisca_calculate_variable_requests_total', labels)
+                metrics.increment('openfisca_calculate_rows_total', labels, rows)
+                metrics.observe('openfisca_calculate_variable_duration_seconds', duration, labels)
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', lambda: app.response_class(
+        metrics.exposition(), mimetype = 'text/plain', content_type = 'text/plain; version=0.0.4; charset=utf-8'))
+
+
+def requested_variables(input_data):
+    """ The variables a `/calculate` request asks for, and the number of
+        entities it asks them for.
+    """
+    counts = {}
+    for instances in (input_data.values() if isinstance(input_data, dict) else ()):
+        for instance in (instances.values() if isinstance(instances, dict) else ()):
+            for variable, values in (instance.items() if isinstance(instance, dict) else ()):
+                if isinstance(values, dict) and any(value is None for value in values.values()):
+                    counts[variable] = counts.get(variable, 0) + 1
+    return counts
+
+
+def install_profile(app, tax_benefit_system):
+    """ Serves the profiles of `/calculate` requests on `/profile`.
+    """
+    import dpath.util
+    from openfisca_core.simulation_builder import SimulationBuilder
+
+    def profile_view():
+        input_data = request.get_json(silent = True)
+        if not isinstance(input_data, dict):
+            abort(make_response(jsonify({'error': 'The request body must be a JSON object.'}), 400))
+        profile = Profile()
+        try:
+            simulation = SimulationBuilder().build_from_entities(tax_benefit_system, input_data)
+            profile.attach(simulation)
+            for path, _ in dpath.util.search(input_data, '*/*/*/*', afilter = lambda value: value is None, yielded = True):
+                _, _, variable_name, period = path.split('/')
+                simulation.calculate(variable_name, period)
+        except (SituationParsingError, PeriodMismatchError) as error:
+            abort(make_response(jsonify(error.error), error.code or 400))
+        limit = request.args.get('limit', type = int)
+        return jsonify(profile.to_dict(limit))
+
+    app.add_url_rule('/profile', 'profile', profile_view, methods = ['POST'])
+
+
+def precomputed_view(app, document, last_modified):
+    """ A view serving the JSON `document`, serialized and compressed once.
+        Requests whose ETag or date match get a 304 Not Modified.
+    """
+    body = json.dumps(document, sort_keys = True).encode('utf-8')
+    compressed = gzip.compress(body, mtime = 0)
+    etag = hashlib.sha256(body).hexdigest()[:32]
+
+    def view():
+        gzipped = request.accept_encodings['gzip'] > 0
+        response = app.response_class(compressed if gzipped else body, mimetype = 'application/json')
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        # Each encoding is a different representation, with its own ETag
+        response.set_etag(etag + ('-gzip' if gzipped else ''))
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    return view
+
+
+def install_form_schemas(app, schemas):
+    """ Serves the form schemas of the activities, as loaded by
+        `load_form_schemas`, on `/form-schemas/<activity>`.
+    """
+    last_modified = datetime.datetime.strptime(schemas['built'], '%Y-%m-%dT%H:%M:%S+00:00')
+    views = {
+        activity: precomputed_view(app, schema, last_modified)
+        for activity, schema in schemas['activities'].items()
+        }
+    index_view = precomputed_view(app, {'activities': sorted(views)}, last_modified)
+
+    def form_schema_view(activity):
+        view = views.get(activity)
+        if view is None:
+            abort(make_response(jsonify({'error': "No form schema for the activity '{}'.".format(activity)}), 404))
+        return view()
+
+    app.add_url_rule('/form-schemas', 'form_schemas', index_view)
+    app.add_url_rule('/form-schemas/<activity>', 'form_schema', form_schema_view)
+
+
+def install_calculate_coalescer(app, coalescer):
+    """ Computes the `/calculate` requests of `app` in batches with the
+        concurrent requests `coalescer` holds.
+    """
+    calculate = app.view_functions['calculate']
+
+    def coalesced_calculate():
+        input_data = request.get_json(silent = True)
+        if input_data is None:
+            # Left to the view, which rejects invalid JSON
+            return calculate()
+        try:
+            result = coalescer.calculate(input_data)
+        except (SituationParsingError, PeriodMismatchError) as error:
+            abort(make_response(jsonify(error.error), error.code or 400))
+        return jsonify(result)
+
+    app.view_functions['calculate'] = coalesced_calculate
+    app.add_url_rule('/calculate/batches', 'calculate_batches', lambda: jsonify(coalescer.stats()))
+
+
+def install_calculate_cache(app, cache):
+    """ Serves the `/calculate` requests of `app` from `cache` when it holds
+        their result, and caches the results of the others.
+    """
+    calculate = app.view_functions['calculate']
+
+    def cached_calculate():
+        key = cache.key(request.get_data())
+        if key is not None:
+            body = cache.get(key)
+            if body is not None:
+                return app.response_class(body, mimetype = 'application/json', headers = {'X-Cache': 'HIT'})
+        # Invalid requests are left to the view, which rejects them
+        response = make_response(calculate())
+        if key is not None and response.status_code == 200:
+            cache.set(key, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    app.view_functions['calculate'] = cached_calculate
+    app.add_url_rule('/calculate/cache', 'calculate_cache', lambda: jsonify(cache.stats()))
+
+
+def create_app(tax_benefit_system = None, calculate_cache = None, calculate_coalescer = None, sessions = None,
+        form_schemas = None, sweeping = None, solving = None, profiling = None, metrics = None, **options):
+    """ OpenFisca's web API for `tax_benefit_system`, a
+        `CountryTaxBenefitSystem` by default, with the extensions of this
+        package. `options` are passed on to OpenFisca's `create_app`.
+    """
+    from openfisca_web_api.app import create_app as create_openfisca_app
+
+    if tax_benefit_system is None:
+        from openfisca_nsw_safeguard import CountryTaxBenefitSystem
+
+        tax_benefit_system = CountryTaxBenefitSystem()
+    app = create_openfisca_app(tax_benefit_system, **options)
+    if calculate_coalescer is None:
+        calculate_coalescer = calculate_coalescer_from_environment(tax_benefit_system)
+    if calculate_coalescer is not None:
+        install_calculate_coalescer(app, calculate_coalescer)
+    # Installed last, so that cached results skip the batches
+    if calculate_cache is None:
+        calculate_cache = calculate_cache_from_environment()
+    if calculate_cache is not None:
+        install_calculate_cache(app, calculate_cache)
+    if sessions is None:
+        sessions = session_store_from_environment(tax_benefit_system)
+    if sessions is not None:
+        install_sessions(app, sessions)
+    if sweeping is None:
+        sweeping = sweeping_from_environment()
+    if sweeping:
+        install_sweep(app, tax_benefit_system, max_rows = int(os.environ.get(SWEEP_MAX_ROWS_ENV, MAX_ROWS)))
+    if solving is None:
+        solving = solving_from_environment()
+    if solving:
+        install_solve(app, tax_benefit_system)
+    if form_schemas is None:
+        from openfisca_nsw_safeguard import COUNTRY_DIR
+
+        form_schemas = load_form_schemas(tax_benefit_system, os.path.join(COUNTRY_DIR, 'variables'))
+    install_form_schemas(app, form_schemas)
+    if profiling is None:
+        profiling = profiling_from_environment()
+    if profiling:
+        install_profile(app, tax_benefit_system)
+    if metrics is None:
+        metrics = metrics_from_environment()
+    if metrics is not None:
+        install_metrics(app, metrics, tax_benefit_system, calculate_cache, calculate_coalescer, sessions)
+    return app